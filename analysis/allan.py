@@ -0,0 +1,174 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Allan, modified Allan and time deviation of PPS skew and RTT series.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@see NIST Special Publication 1065, Handbook of Frequency Stability Analysis
+@ingroup analysis
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import numpy as np
+
+# All the functions expect phase (time) data: a series x of time intervals
+# (skew) or RTT values taken every tau0 seconds. Results are given in the same
+# units as x (ADEV and MDEV are adimensional when x is in s and tau0 in s).
+
+def octave_factors(n, span=3) :
+    '''
+    Function to get the averaging factors m = 1, 2, 4, ... usable with n samples.
+
+    Args:
+        n (int) : Number of samples in the series.
+        span (int) : Samples needed per averaging factor (2 for ADEV, 3 for MDEV).
+
+    Returns:
+        A numpy array with the averaging factors.
+    '''
+    if n < span + 1 :
+        return np.array([], dtype=np.int64)
+    return 2 ** np.arange(int(np.log2((n - 1) // span)) + 1, dtype=np.int64)
+
+# ---------------------------------------------------------------------------- #
+
+def _factors(x, m_list, span) :
+    '''
+    Function to convert the input series and validate the averaging factors.
+    '''
+    x = np.asarray(x, dtype=np.float64)
+    if m_list is None :
+        m_list = octave_factors(len(x), span)
+    m_list = np.asarray(m_list, dtype=np.int64)
+    m_list = m_list[(m_list > 0) & (span * m_list < len(x))]
+
+    return x, m_list
+
+# ---------------------------------------------------------------------------- #
+
+def adev(x, tau0, m_list=None) :
+    '''
+    Function to compute the overlapping Allan deviation.
+
+    sigma^2(tau) = sum((x[i+2m] - 2x[i+m] + x[i])^2) / (2 tau^2 (N - 2m))
+
+    Each averaging factor is a single vectorized O(N) pass over x.
+
+    Args:
+        x (array) : Phase data.
+        tau0 (float) : Time between samples (in s).
+        m_list (array) : Averaging factors. By default, octave spaced.
+
+    Returns:
+        A tuple (taus, deviations) of numpy arrays.
+    '''
+    x, m_list = _factors(x, m_list, 2)
+    n = len(x)
+    dev = np.empty(len(m_list))
+
+    for k, m in enumerate(m_list.tolist()) :
+        d2 = x[2*m:] - 2 * x[m:n-m] + x[:n-2*m]
+        tau = m * tau0
+        dev[k] = np.sqrt(np.dot(d2, d2) / (2 * tau**2 * (n - 2*m)))
+
+    return m_list * tau0, dev
+
+# ---------------------------------------------------------------------------- #
+
+def mdev(x, tau0, m_list=None) :
+    '''
+    Function to compute the modified Allan deviation.
+
+    The inner sums of second differences are obtained from a single cumulative
+    sum of x, so every averaging factor costs O(N) regardless of m.
+
+    Args:
+        x (array) : Phase data.
+        tau0 (float) : Time between samples (in s).
+        m_list (array) : Averaging factors. By default, octave spaced.
+
+    Returns:
+        A tuple (taus, deviations) of numpy arrays.
+    '''
+    x, m_list = _factors(x, m_list, 3)
+    n = len(x)
+    s = np.concatenate(([0.0], np.cumsum(x)))
+    dev = np.empty(len(m_list))
+
+    for k, m in enumerate(m_list.tolist()) :
+        j = n - 3*m + 1
+        # sum(x[i+2m] - 2 x[i+m] + x[i]) for i in [j, j+m)
+        inner = s[3*m:3*m+j] - 3 * s[2*m:2*m+j] + 3 * s[m:m+j] - s[:j]
+        tau = m * tau0
+        dev[k] = np.sqrt(np.dot(inner, inner) / (2 * m**2 * tau**2 * j))
+
+    return m_list * tau0, dev
+
+# ---------------------------------------------------------------------------- #
+
+def tdev(x, tau0, m_list=None) :
+    '''
+    Function to compute the time deviation, TDEV = tau * MDEV / sqrt(3).
+
+    Args:
+        x (array) : Phase data.
+        tau0 (float) : Time between samples (in s).
+        m_list (array) : Averaging factors. By default, octave spaced.
+
+    Returns:
+        A tuple (taus, deviations) of numpy arrays, in the units of x.
+    '''
+    taus, dev = mdev(x, tau0, m_list)
+    return taus, taus * dev / np.sqrt(3)
+
+# ---------------------------------------------------------------------------- #
+
+def recommend_averaging(x, tau0) :
+    '''
+    Function to recommend the averaging time for a time interval measurement.
+
+    While white phase noise dominates, TDEV decreases with tau, so averaging
+    helps. Once flicker or random walk noise dominates it stops decreasing and
+    more samples don't improve the result. The recommended averaging time is
+    the one with the minimum TDEV.
+
+    Args:
+        x (array) : Phase data (i.e. the samples of a mean_time_interval call).
+        tau0 (float) : Time between samples (in s).
+
+    Returns:
+        A dict with keys: tau (s), n_samples (samples for mean_time_interval
+        with t_samples = tau0) and tdev (in units of x). None if the series is
+        too short.
+    '''
+    taus, dev = tdev(x, tau0)
+    if len(taus) == 0 :
+        return None
+
+    best = int(np.argmin(dev))
+
+    return {
+        'tau'       : float(taus[best]),
+        'n_samples' : int(round(taus[best] / tau0)),
+        'tdev'      : float(dev[best])
+    }
@@ -0,0 +1,196 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Columnar archive of the raw samples of calibration runs.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup analysis
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import os
+import json
+import datetime
+import threading
+import numpy as np
+
+## Writers lock by archive path, so sessions running in threads can share an archive
+_locks = {}
+_locks_guard = threading.Lock()
+
+class Sample_archive() :
+    '''
+    Append-only archive of the raw samples of calibration runs.
+
+    All the series (RTT values, skew values...) of all the runs are appended
+    to three column files in the archive directory:
+        - timestamps.f8 : Time stamps (clock.time()), little-endian float64.
+        - values.f8 : Values read, little-endian float64.
+        - accepted.u1 : 1 if the value was accepted, 0 if rejected as outlier.
+    The files have no header, so they can be opened with numpy.memmap and
+    thousands of runs are processed without loading them in memory.
+
+    Each run is a line in runs.jsonl with its kind ("fiber-latency",
+    "fiber-asymmetry" or "port-delay"), key, date, scalars (PHY delays,
+    written delays...) and the (offset, length) of each of its series in the
+    column files. The index line is written after the columns, so a run
+    interrupted while writing is never referenced.
+    '''
+
+    COLUMNS = (("timestamps", "timestamps.f8", "<f8"), ("values", "values.f8", "<f8"), \
+    ("accepted", "accepted.u1", "u1"))
+
+    def __init__(self, path) :
+        '''
+        Constructor
+
+        Args:
+            path (str) : Archive directory, it's created if it doesn't exist.
+        '''
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.index_file = os.path.join(path, "runs.jsonl")
+
+        real = os.path.realpath(path)
+        with _locks_guard :
+            if real not in _locks :
+                _locks[real] = threading.Lock()
+            self.lock = _locks[real]
+
+    # ------------------------------------------------------------------------ #
+
+    def add_run(self, kind, key, series, scalars={}, params={}) :
+        '''
+        Method to append a run to the archive.
+
+        Args:
+            kind (str) : Procedure of the run.
+            key (str) : Key of the result (i.e. "blue-wr1").
+            series (dict) : (timestamps, values, accepted) lists by series name.
+            scalars (dict) : Other float inputs of the run by name.
+            params (dict) : Parameters of the procedure.
+
+        Returns:
+            The id of the run.
+        '''
+        with self.lock :
+            # Offsets are taken from the file size, so data left by an
+            # interrupted write is skipped
+            offset = os.path.getsize(self._column("values")) // 8 \
+            if os.path.exists(self._column("values")) else 0
+
+            cols = {'timestamps' : [], 'values' : [], 'accepted' : []}
+            index = {}
+            for name in series :
+                ts, vals, acc = series[name]
+                index[name] = (offset, len(vals))
+                offset += len(vals)
+                cols['timestamps'].extend(ts)
+                cols['values'].extend(vals)
+                cols['accepted'].extend(acc)
+
+            for name, fname, dtype in self.COLUMNS :
+                with open(self._column(name), 'ab') as f :
+                    f.write(np.asarray(cols[name], dtype=dtype).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            run = len(self.runs())
+            entry = {'run' : run, 'kind' : kind, 'key' : key, \
+            'date' : datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), \
+            'series' : index, 'scalars' : scalars, 'params' : params}
+            with open(self.index_file, 'a', encoding='utf-8') as f :
+                f.write(json.dumps(entry) + "\n")
+
+        return run
+
+    # ------------------------------------------------------------------------ #
+
+    def _column(self, name) :
+        '''
+        Method to get the path of a column file.
+        '''
+        for col, fname, dtype in self.COLUMNS :
+            if col == name :
+                return os.path.join(self.path, fname)
+
+    # ------------------------------------------------------------------------ #
+
+    def runs(self, kind=None) :
+        '''
+        Method to get the index of the archived runs.
+
+        Args:
+            kind (str) : Only runs of this procedure, all by default.
+
+        Returns:
+            A list of dicts (see add_run) ordered by run id.
+        '''
+        if not os.path.exists(self.index_file) :
+            return []
+        runs = []
+        with open(self.index_file, 'r', encoding='utf-8') as f :
+            for line in f :
+                try :
+                    entry = json.loads(line)
+                except ValueError :
+                    # Index line interrupted while writing
+                    continue
+                if kind == None or entry['kind'] == kind :
+                    runs.append(entry)
+        return runs
+
+    # ------------------------------------------------------------------------ #
+
+    def columns(self) :
+        '''
+        Method to open the column files as read-only memory maps.
+
+        Returns:
+            A dict with timestamps, values and accepted arrays.
+        '''
+        cols = {}
+        for name, fname, dtype in self.COLUMNS :
+            path = self._column(name)
+            if not os.path.exists(path) or os.path.getsize(path) == 0 :
+                cols[name] = np.zeros(0, dtype=dtype)
+            else :
+                cols[name] = np.memmap(path, dtype=dtype, mode='r')
+        return cols
+
+    # ------------------------------------------------------------------------ #
+
+    def series(self, run, name) :
+        '''
+        Method to read a series of a run.
+
+        Args:
+            run (dict) : Run entry (see runs).
+            name (str) : Name of the series.
+
+        Returns:
+            A (timestamps, values, accepted) tuple of arrays.
+        '''
+        offset, length = run['series'][name]
+        cols = self.columns()
+        return tuple(np.array(cols[c][offset:offset+length]) for c in ("timestamps", "values", "accepted"))
@@ -0,0 +1,130 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Bootstrap confidence intervals of the mean of an acquisition.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup analysis
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import statistics
+import numpy as np
+
+# Resamples of the bootstrap by default
+DEFAULT_RESAMPLES = 2000
+# Coverage of the intervals by default
+DEFAULT_LEVEL = 0.95
+# Seed of the resampling by default, fixed so the decisions taken on the
+# intervals are the same for the same samples (i.e. when a run is replayed)
+DEFAULT_SEED = 0
+# Limit of resampled values held in memory at once
+_CHUNK = 1000000
+
+def resample_means(values, resamples=DEFAULT_RESAMPLES, seed=DEFAULT_SEED) :
+    '''
+    Function to compute the means of bootstrap resamples of values.
+
+    The resamples are drawn as a (resamples x n) matrix of indexes and reduced
+    in a single vectorized operation. Long series are processed in chunks of
+    resamples to bound the memory used.
+
+    Args:
+        values (array) : Samples.
+        resamples (int) : Number of resamples.
+        seed (int) : Seed of the random generator, None for a random one.
+
+    Returns:
+        A numpy array with the mean of each resample.
+    '''
+    x = np.asarray(values, dtype=np.float64)
+    n = len(x)
+    rng = np.random.default_rng(seed)
+    means = np.empty(resamples)
+    step = max(1, _CHUNK // max(n, 1))
+    for start in range(0, resamples, step) :
+        rows = min(step, resamples - start)
+        means[start:start+rows] = x[rng.integers(0, n, size=(rows, n))].mean(axis=1)
+    return means
+
+# ---------------------------------------------------------------------------- #
+
+def confidence_interval(values, accepted=None, level=DEFAULT_LEVEL, \
+resamples=DEFAULT_RESAMPLES, seed=DEFAULT_SEED) :
+    '''
+    Function to compute the bootstrap (percentile) confidence interval of the
+    mean of an acquisition.
+
+    Args:
+        values (list) : Samples read.
+        accepted (list) : For each value, False if it was rejected as outlier. \
+        By default, all the values are used.
+        level (float) : Coverage of the interval.
+        resamples (int) : Number of resamples.
+        seed (int) : Seed of the random generator, None for a random one.
+
+    Returns:
+        A list [low, high], None with less than 2 accepted values.
+    '''
+    x = np.asarray(values, dtype=np.float64)
+    if accepted is not None :
+        x = x[np.asarray(accepted, dtype=bool)]
+    if len(x) < 2 :
+        return None
+    means = resample_means(x, resamples, seed)
+    low, high = np.quantile(means, [(1 - level) / 2, (1 + level) / 2])
+    return [float(low), float(high)]
+
+# ---------------------------------------------------------------------------- #
+
+def normal_interval(value, stderr, level=DEFAULT_LEVEL) :
+    '''
+    Function to compute the confidence interval of a normal estimate (i.e.
+    of a trend fit).
+
+    Args:
+        value (float) : Estimate.
+        stderr (float) : Standard error of the estimate.
+        level (float) : Coverage of the interval.
+
+    Returns:
+        A list [low, high].
+    '''
+    z = statistics.NormalDist().inv_cdf((1 + level) / 2)
+    return [value - z * stderr, value + z * stderr]
+
+# ---------------------------------------------------------------------------- #
+
+def interval(values, accepted=None, level=DEFAULT_LEVEL) :
+    '''
+    Function to get the keys added to the statistics of an acquisition.
+
+    Args:
+        values (list) : Samples read.
+        accepted (list) : For each value, False if it was rejected as outlier.
+        level (float) : Coverage of the interval.
+
+    Returns:
+        A dict with keys: ci (see confidence_interval) and ci_level.
+    '''
+    return {'ci' : confidence_interval(values, accepted, level), 'ci_level' : level}
@@ -0,0 +1,100 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Drift-compensated estimators for timestamped samples.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup analysis
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import numpy as np
+
+def fit_trend(t, v, t_ref=None, degree=1) :
+    '''
+    Function to fit a polynomial trend to timestamped samples.
+
+    The model v(t) = p0 + p1 (t - t_ref) + ... is solved by least squares and
+    the value at the reference epoch (p0) is reported with its standard
+    uncertainty, taken from the covariance of the fit. With degree 0 it's the
+    plain mean and its standard error.
+
+    Args:
+        t (array) : Sample timestamps (in s).
+        v (array) : Sample values.
+        t_ref (float) : Reference epoch. By default, the mean of t, where the \
+        uncertainty of a linear fit is minimum.
+        degree (int) : Degree of the polynomial (1 for a linear drift).
+
+    Returns:
+        A dict with keys: value (at t_ref), stderr (of value), drift (first
+        order coefficient, units of v per s), drift_stderr, t_ref,
+        residual_std and n.
+
+    Raises:
+        ValueError if there are not enough samples for the fit.
+    '''
+    t = np.asarray(t, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    n = len(v)
+    if n != len(t) :
+        raise ValueError("fit_trend ERROR: t and v must have the same length.")
+    if n < degree + 2 :
+        raise ValueError("fit_trend ERROR: %d samples are not enough for degree %d." % (n, degree))
+
+    if t_ref is None :
+        t_ref = float(t.mean())
+
+    # Vandermonde matrix with columns (t-t_ref)^0, (t-t_ref)^1, ...
+    a = np.vander(t - t_ref, degree + 1, increasing=True)
+    coef, res, rank, sv = np.linalg.lstsq(a, v, rcond=None)
+
+    resid = v - a.dot(coef)
+    dof = n - (degree + 1)
+    s2 = np.dot(resid, resid) / dof
+    cov = s2 * np.linalg.pinv(a.T.dot(a))
+
+    return {
+        'value'        : float(coef[0]),
+        'stderr'       : float(np.sqrt(cov[0, 0])),
+        'drift'        : float(coef[1]) if degree > 0 else 0.0,
+        'drift_stderr' : float(np.sqrt(cov[1, 1])) if degree > 0 else 0.0,
+        't_ref'        : t_ref,
+        'residual_std' : float(np.sqrt(s2)),
+        'n'            : n
+    }
+
+# ---------------------------------------------------------------------------- #
+
+def drift_significant(fit, k=3.0) :
+    '''
+    Function to check if the fitted drift is significant.
+
+    Args:
+        fit (dict) : Result of fit_trend with degree >= 1.
+        k (float) : Coverage factor.
+
+    Returns:
+        True if |drift| > k * u(drift).
+    '''
+    return abs(fit['drift']) > k * fit['drift_stderr']
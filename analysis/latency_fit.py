@@ -0,0 +1,206 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Least-squares solution of the fiber latencies from several fiber combinations.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup analysis
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import numpy as np
+
+# Each measurement connects the WR devices through a combination of fibers
+# ("f1", "f2", "f1+f2", ...) and gives the delay of the link without the PHY
+# delays: delay = fixed + sum(latency of each fiber of the combination), where
+# fixed is the delay of the hardware that is not calibrated (the same for every
+# measurement). With f1, f2 and f1+f2 measured once, the solution is the exact
+# one of the classic procedure (delta1 = d3 - d2, delta2 = d3 - d1). More
+# combinations or repetitions give redundancy, that is used to detect
+# inconsistent measurements.
+
+def combination(name) :
+    '''
+    Function to get the fibers of a fiber combination.
+
+    Args:
+        name (str) : Combination, the names of the fibers joined by "+".
+
+    Returns:
+        A list with the names of the fibers.
+    '''
+    return [f.strip() for f in name.split("+")]
+
+# ---------------------------------------------------------------------------- #
+
+def design_matrix(combinations) :
+    '''
+    Function to build the design matrix of the latency model.
+
+    Args:
+        combinations (list) : Fiber combination of each measurement.
+
+    Returns:
+        A tuple (matrix, fibers): the matrix has a row per measurement, a first
+        column of ones (fixed delay) and a column per fiber, in the order of
+        fibers.
+    '''
+    fibers = []
+    for c in combinations :
+        for f in combination(c) :
+            if f not in fibers :
+                fibers.append(f)
+
+    used = np.array([[f in combination(c) for f in fibers] for c in combinations], dtype=np.float64)
+    used = used.reshape(len(combinations), len(fibers))
+    return np.hstack((np.ones((len(combinations), 1)), used)), fibers
+
+# ---------------------------------------------------------------------------- #
+
+def _fit(aw, dw, weighted) :
+    '''
+    Function to solve a whitened least-squares problem.
+
+    Returns:
+        A tuple (coefficients, inverse of the normal matrix, chi2, scale of
+        the covariance, leverages).
+    '''
+    coef = np.linalg.lstsq(aw, dw, rcond=None)[0]
+    inv = np.linalg.inv(aw.T.dot(aw))
+    rw = dw - aw.dot(coef)
+    chi2 = float(np.dot(rw, rw))
+    dof = len(dw) - aw.shape[1]
+
+    # Scale of the covariance: 1 with known weights, the residual variance
+    # with unknown ones
+    if weighted :
+        s2 = 1.0
+    else :
+        s2 = chi2 / dof if dof > 0 else 0.0
+    # Leverage of each measurement (diagonal of the hat matrix)
+    h = np.einsum("ij,jk,ik->i", aw, inv, aw)
+
+    return coef, inv, chi2, s2, h
+
+# ---------------------------------------------------------------------------- #
+
+def solve_latencies(combinations, delays, stderrs=None, threshold=3.0) :
+    '''
+    Function to solve the fiber latencies by weighted least squares.
+
+    The weights are 1/stderr^2. When the standard errors are not known (or
+    some is 0), equal weights are used and the scatter of the residuals gives
+    the uncertainty. Each residual is normalized by its own standard
+    deviation (studentized, leaving the measurement out when the scatter is
+    estimated). The measurement with the largest normalized residual above
+    threshold is flagged as inconsistent and left out, and the fit is
+    repeated until the rest are consistent. It needs redundancy: with as many
+    measurements as unknowns nothing can be flagged.
+
+    Args:
+        combinations (list) : Fiber combination of each measurement.
+        delays (list) : Measured delays (RTT minus PHY delays, in ps).
+        stderrs (list) : Standard errors of the delays or None.
+        threshold (float) : Limit of the normalized residuals.
+
+    Returns:
+        A dict with keys: latencies and stderr (dicts by fiber), fixed and
+        fixed_stderr (hardware delay), predicted (function of a combination),
+        residuals and normalized (by measurement, for the inconsistent ones
+        against the fit of the rest), chi2 and dof (of the consistent
+        measurements) and inconsistent (indexes of the measurements left out).
+
+    Raises:
+        ValueError if the combinations don't determine every latency.
+    '''
+    a, fibers = design_matrix(combinations)
+    d = np.asarray(delays, dtype=np.float64)
+    m, p = a.shape
+    if m != len(d) :
+        raise ValueError("solve_latencies ERROR: a delay is needed for each combination.")
+    if np.linalg.matrix_rank(a) < p :
+        raise ValueError("solve_latencies ERROR: the combinations %s don't determine the latency " \
+        "of every fiber and the fixed delay." % sorted(set(combinations)))
+
+    weighted = stderrs is not None and len(stderrs) == m and \
+    bool(np.all(np.asarray(stderrs, dtype=np.float64) > 0))
+    sigma = np.asarray(stderrs, dtype=np.float64) if weighted else np.ones(m)
+
+    # Whitened problem: rows divided by the standard error of the measurement
+    aw = a / sigma[:, None]
+    dw = d / sigma
+    active = np.ones(m, dtype=bool)
+
+    while True :
+        coef, inv, chi2, s2, h = _fit(aw[active], dw[active], weighted)
+        dof = int(active.sum()) - p
+        rw = dw - aw.dot(coef)
+        normalized = np.zeros(m)
+
+        idx = np.nonzero(active)[0]
+        if weighted :
+            var = np.clip(1 - h, 0, None)
+        elif dof > 1 :
+            # Scatter estimated without each measurement
+            s2_del = (chi2 - rw[idx]**2 / np.clip(1 - h, 1e-12, None)) / (dof - 1)
+            var = np.clip(1 - h, 0, None) * np.clip(s2_del, 0, None)
+        else :
+            var = np.zeros(len(idx))
+        spread = np.sqrt(var)
+        normalized[idx] = np.divide(rw[idx], spread, out=np.zeros(len(idx)), where=spread > 1e-9)
+
+        # Measurements left out, against the prediction of the fit
+        out = np.nonzero(~active)[0]
+        if len(out) > 0 :
+            pred = np.sqrt(s2 * (1 + np.einsum("ij,jk,ik->i", aw[out], inv, aw[out])))
+            normalized[out] = np.divide(rw[out], pred, out=np.zeros(len(out)), where=pred > 1e-9)
+
+        if dof <= 0 :
+            break
+        worst = idx[np.argmax(np.abs(normalized[idx]))]
+        if abs(normalized[worst]) <= threshold :
+            break
+        trial = active.copy()
+        trial[worst] = False
+        if np.linalg.matrix_rank(a[trial]) < p :
+            break
+        active = trial
+
+    u = np.sqrt(np.diag(s2 * inv))
+    latencies = dict(zip(fibers, coef[1:].tolist()))
+
+    def predicted(name) :
+        return float(coef[0] + sum(latencies[f] for f in combination(name)))
+
+    return {
+        'latencies'    : latencies,
+        'stderr'       : dict(zip(fibers, u[1:].tolist())),
+        'fixed'        : float(coef[0]),
+        'fixed_stderr' : float(u[0]),
+        'predicted'    : predicted,
+        'residuals'    : (d - a.dot(coef)).tolist(),
+        'normalized'   : normalized.tolist(),
+        'chi2'         : chi2,
+        'dof'          : dof,
+        'inconsistent' : [int(i) for i in np.nonzero(~active)[0]]
+    }
@@ -0,0 +1,317 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Streaming statistics with outlier rejection for time interval and RTT samples.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup analysis
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import bisect
+import collections
+import math
+
+class Online_stats() :
+    '''
+    Streaming statistics engine.
+
+    Accepted samples update a Welford accumulator (mean and variance), so the
+    memory used doesn't depend on the number of samples. The median and the
+    median absolute deviation (MAD) are computed over a sliding window of the
+    last samples, kept as a sorted list, and are used for robust clipping.
+
+    Clipping modes:
+    - None : every sample is accepted (except when max_dev is exceeded).
+    - "sigma" : reject x if |x - mean| > k * stddev.
+    - "mad" : reject x if |x - median| > k * 1.4826 * MAD. When more than half
+      of the window has the same value (MAD = 0), the mean absolute deviation
+      from the median (scaled by 1.2533) is used instead.
+
+    Clipping needs min_samples accepted samples. The samples accepted before
+    (warm-up) are screened again after each new sample until the window is
+    full, and the ones found to be outliers are removed from the mean and the
+    variance. Their keys (see add) are listed in revoked, so the caller can
+    update its own record of accepted samples.
+    '''
+
+    ## Scale factor from MAD to standard deviation for normal distributed data
+    MAD_SCALE = 1.4826
+    ## Scale factor from mean absolute deviation to standard deviation
+    MEANAD_SCALE = 1.2533
+
+    def __init__(self, clip="mad", k=5.0, window=31, min_samples=5, max_dev=None) :
+        '''
+        Constructor
+
+        Args:
+            clip (str) : Clipping mode: None, "sigma" or "mad".
+            k (float) : Clipping threshold in (robust) standard deviations.
+            window (int) : Number of recent samples used for median and MAD.
+            min_samples (int) : Samples needed before clipping is applied.
+            max_dev (float) : If set, reject any sample farther than max_dev \
+            from the running median. Same units as the samples.
+
+        Raises:
+            ValueError if clip is not a valid clipping mode.
+        '''
+        if clip not in (None, "sigma", "mad") :
+            raise ValueError("Online_stats ERROR: Unknown clipping mode %s." % clip)
+
+        self.clip = clip
+        self.k = k
+        self.window = window
+        self.min_samples = min_samples
+        self.max_dev = max_dev
+        self.reset()
+
+    # ------------------------------------------------------------------------ #
+
+    def reset(self) :
+        '''
+        Method to discard all the accumulated samples.
+        '''
+        ## Number of accepted samples
+        self.n = 0
+        ## Number of rejected samples
+        self.rejected = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        ## Keys of the warm-up samples rejected after being accepted
+        self.revoked = []
+        self._count = 0
+        self._pending = []
+        self._fifo = collections.deque()
+        self._sorted = []
+
+    # ------------------------------------------------------------------------ #
+
+    def median(self) :
+        '''
+        Method to get the median of the samples in the window.
+
+        Returns:
+            The running median, None if no samples were added.
+        '''
+        size = len(self._sorted)
+        if size == 0 :
+            return None
+        mid = size // 2
+        if size % 2 :
+            return self._sorted[mid]
+        return 0.5 * (self._sorted[mid-1] + self._sorted[mid])
+
+    # ------------------------------------------------------------------------ #
+
+    def mad(self) :
+        '''
+        Method to get the median absolute deviation of the samples in the window.
+
+        Returns:
+            The running MAD, None if no samples were added.
+        '''
+        med = self.median()
+        if med == None :
+            return None
+        dev = sorted(abs(x - med) for x in self._sorted)
+        mid = len(dev) // 2
+        if len(dev) % 2 :
+            return dev[mid]
+        return 0.5 * (dev[mid-1] + dev[mid])
+
+    # ------------------------------------------------------------------------ #
+
+    def stddev(self) :
+        '''
+        Method to get the sample standard deviation of the accepted samples.
+
+        Returns:
+            The standard deviation, 0 when less than 2 samples were accepted.
+        '''
+        if self.n < 2 :
+            return 0.0
+        return math.sqrt(self._m2 / (self.n - 1))
+
+    # ------------------------------------------------------------------------ #
+
+    def stderr(self) :
+        '''
+        Method to get the standard error of the mean.
+
+        Returns:
+            The standard error, 0 when less than 2 samples were accepted.
+        '''
+        if self.n < 2 :
+            return 0.0
+        return self.stddev() / math.sqrt(self.n)
+
+    # ------------------------------------------------------------------------ #
+
+    def _clipping(self) :
+        '''
+        Method to get the center and the scale of the clipping criteria.
+
+        Returns:
+            A tuple (center, scale), None if clipping is not applied.
+        '''
+        if self.n < self.min_samples :
+            return None
+
+        if self.clip == "sigma" :
+            return (self.mean, self.stddev())
+        elif self.clip == "mad" :
+            med = self.median()
+            scale = self.MAD_SCALE * self.mad()
+            if scale == 0 :
+                scale = self.MEANAD_SCALE * \
+                sum(abs(x - med) for x in self._sorted) / len(self._sorted)
+            return (med, scale)
+
+        return None
+
+    # ------------------------------------------------------------------------ #
+
+    def is_outlier(self, x) :
+        '''
+        Method to check a value against the clipping criteria.
+
+        Args:
+            x (float) : The value to check.
+
+        Returns:
+            True if x would be rejected by add.
+        '''
+        med = self.median()
+        if self.max_dev != None and med != None and abs(x - med) > self.max_dev :
+            return True
+
+        clipping = self._clipping()
+        if clipping == None :
+            return False
+        center, scale = clipping
+
+        # A null dispersion (i.e. constant values) can't be used to reject
+        if scale == 0 :
+            return False
+
+        return abs(x - center) > self.k * scale
+
+    # ------------------------------------------------------------------------ #
+
+    def _screen_warmup(self) :
+        '''
+        Method to check the warm-up samples against the clipping criteria.
+
+        The outliers are removed from the Welford accumulator and their keys
+        are added to revoked.
+        '''
+        clipping = self._clipping()
+        if clipping != None and clipping[1] != 0 :
+            center, scale = clipping
+            keep = []
+            for key, x in self._pending :
+                if abs(x - center) <= self.k * scale :
+                    keep.append((key, x))
+                    continue
+                # Inverse Welford update
+                self.n -= 1
+                self.rejected += 1
+                self.revoked.append(key)
+                if self.n == 0 :
+                    self.mean = 0.0
+                    self._m2 = 0.0
+                else :
+                    old = self.mean
+                    self.mean = old + (old - x) / self.n
+                    self._m2 -= (x - old) * (x - self.mean)
+            self._pending = keep
+
+        # The window is full, the warm-up samples are already screened
+        if len(self._fifo) >= self.window :
+            self._pending = []
+
+    # ------------------------------------------------------------------------ #
+
+    def add(self, x, key=None) :
+        '''
+        Method to add a new sample.
+
+        Every sample enters the median window, so a real step in the measured
+        value is followed after a few samples, but only the accepted ones update
+        the mean and the variance. A warm-up sample can still be rejected later
+        (see revoked).
+
+        Args:
+            x (float) : The new sample.
+            key : Identifier of the sample in revoked, the number of samples \
+            added before it by default.
+
+        Returns:
+            True if the sample was accepted, False if it was rejected.
+        '''
+        if key == None :
+            key = self._count
+        self._count += 1
+
+        reject = self.is_outlier(x)
+        warmup = self._clipping() == None
+
+        self._fifo.append(x)
+        bisect.insort(self._sorted, x)
+        if len(self._fifo) > self.window :
+            old = self._fifo.popleft()
+            del self._sorted[bisect.bisect_left(self._sorted, old)]
+
+        if reject :
+            self.rejected += 1
+            return False
+
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (x - self.mean)
+
+        if warmup and self.clip != None :
+            self._pending.append((key, x))
+        if len(self._pending) > 0 :
+            self._screen_warmup()
+
+        return key not in self.revoked
+
+    # ------------------------------------------------------------------------ #
+
+    def summary(self) :
+        '''
+        Method to get the statistics of the accepted samples.
+
+        Returns:
+            A dict with keys: mean, stddev, stderr, n (accepted samples) and
+            rejected (rejected samples).
+        '''
+        return {
+            'mean'     : self.mean,
+            'stddev'   : self.stddev(),
+            'stderr'   : self.stderr(),
+            'n'        : self.n,
+            'rejected' : self.rejected
+        }
@@ -0,0 +1,227 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Vectorized recomputation of archived calibration runs.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup analysis
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import numpy as np
+
+# User defined modules
+from analysis.latency_fit import solve_latencies
+
+def segment_stats(values, accepted, offsets, lengths, clip_k=None, iterations=3) :
+    '''
+    Function to compute the mean of many segments of a column in one pass.
+
+    The samples of all the segments are gathered and reduced with bincount,
+    so the cost doesn't depend on the number of segments but on the total
+    number of samples.
+
+    Args:
+        values (array) : Column with the values (a memmap is fine).
+        accepted (array) : Column with the accepted flags. If None, all the \
+        values are used.
+        offsets (array) : First sample of each segment.
+        lengths (array) : Number of samples of each segment.
+        clip_k (float) : If given, the recorded flags are ignored and samples \
+        further than clip_k standard deviations from the mean of their segment \
+        are rejected (iterated).
+        iterations (int) : Iterations of the clipping.
+
+    Returns:
+        A dict with mean, stderr and n arrays (one value per segment).
+    '''
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    n_seg = len(lengths)
+    if n_seg == 0 :
+        return {'mean' : np.zeros(0), 'stderr' : np.zeros(0), 'n' : np.zeros(0)}
+
+    # Index of every sample of every segment in the column
+    seg = np.repeat(np.arange(n_seg), lengths)
+    starts = np.cumsum(lengths) - lengths
+    idx = np.arange(lengths.sum()) - np.repeat(starts - offsets, lengths)
+
+    v = np.asarray(values[idx], dtype=np.float64)
+    if accepted is None or clip_k != None :
+        mask = np.ones(len(v), dtype=np.float64)
+    else :
+        mask = np.asarray(accepted[idx], dtype=np.float64)
+
+    def reduce(mask) :
+        n = np.bincount(seg, weights=mask, minlength=n_seg)
+        with np.errstate(invalid='ignore', divide='ignore') :
+            mean = np.bincount(seg, weights=v*mask, minlength=n_seg) / n
+            dev = v - mean[seg]
+            var = np.bincount(seg, weights=mask*dev*dev, minlength=n_seg) / (n - 1)
+        return n, mean, np.sqrt(var), dev
+
+    n, mean, std, dev = reduce(mask)
+    if clip_k != None :
+        for i in range(iterations) :
+            new = (np.abs(dev) <= clip_k * np.nan_to_num(std, nan=np.inf)[seg]).astype(np.float64)
+            if np.array_equal(new, mask) :
+                break
+            mask = new
+            n, mean, std, dev = reduce(mask)
+
+    with np.errstate(invalid='ignore', divide='ignore') :
+        stderr = std / np.sqrt(n)
+    return {'mean' : mean, 'stderr' : stderr, 'n' : n}
+
+# ---------------------------------------------------------------------------- #
+
+def latency_steps(run) :
+    '''
+    Function to get the RTT measurements of an archived fiber latency run.
+
+    Args:
+        run (dict) : The run, as returned by Sample_archive.runs.
+
+    Returns:
+        A list of tuples (fiber combination, step name, series name) in the
+        order of the fit. The series is the last one measured again when the
+        step was inconsistent.
+    '''
+    params = run['params']
+    steps = []
+    for n in range(params.get('repeat', 1)) :
+        for fiber in params.get('fibers', ["f1", "f2", "f1+f2"]) :
+            name = "rtt-%s" % fiber if n == 0 else "rtt-%s-%d" % (fiber, n)
+            redo = [int(s[len(name)+6:]) for s in run['series'] if s.startswith(name + "-redo-")]
+            steps.append((fiber, name, name if len(redo) == 0 else "%s-redo-%d" % (name, max(redo))))
+
+    return steps
+
+# ---------------------------------------------------------------------------- #
+
+def recompute(archive, delta1=None, delta2=None, clip_k=None) :
+    '''
+    Function to recompute the results of all the runs in a Sample_archive.
+
+    Every series of every run is reduced in a single segment_stats call and
+    the results of each procedure are computed with array operations, as
+    WR_calibration does for a single run:
+        - fiber-latency : delta1 and delta2, solved by weighted least squares \
+        over the fiber combinations of the run (see analysis.latency_fit), \
+        with the threshold used in the run.
+        - fiber-asymmetry : alpha_n, with the given delta2 or the one used in \
+        the run.
+        - port-delay : coarse delays, with the given delta1 or the one used in \
+        the run, and final delays, the last iteration delays corrected by its \
+        skew (as the Fixed_step strategy does). The iterations themselves depend \
+        on the hardware and can't be recomputed.
+    Runs with missing series (i.e. steps restored from a checkpoint) are skipped.
+
+    Args:
+        archive (Sample_archive) : The archive.
+        delta1 (float) : New fiber latency delta1 (in ps).
+        delta2 (float) : New fiber latency delta2 (in ps).
+        clip_k (float) : New outlier clipping (see segment_stats), the recorded \
+        flags are used by default.
+
+    Returns:
+        A dict by procedure. Each item is a dict of arrays (one value per run)
+        with keys run, key and the results of the procedure.
+    '''
+    required = {
+        'fiber-latency' : lambda run : [series for fiber, name, series in latency_steps(run)],
+        'fiber-asymmetry' : lambda run : ["skew-f1", "skew-f2"],
+        'port-delay' : lambda run : ["rtt-coarse", "skew-%d" % (run['scalars']['iterations'] - 1)],
+    }
+
+    # Segments of the runs of each procedure, in the order of required
+    runs = {}
+    offsets = []
+    lengths = []
+    for kind in required :
+        runs[kind] = []
+        for run in archive.runs(kind) :
+            try :
+                names = required[kind](run)
+                segs = [run['series'][name] for name in names]
+            except KeyError :
+                continue
+            runs[kind].append(run)
+            for offset, length in segs :
+                offsets.append(offset)
+                lengths.append(length)
+
+    cols = archive.columns()
+    stats = segment_stats(cols['values'], cols['accepted'], offsets, lengths, clip_k)
+    means = stats['mean']
+
+    results = {}
+    pos = 0
+
+    # Fiber latency -------------------------------------------
+    lat = runs['fiber-latency']
+    delta = np.zeros((len(lat), 2))
+    for i, run in enumerate(lat) :
+        steps = latency_steps(run)
+        m = means[pos:pos+len(steps)]
+        u = np.nan_to_num(stats['stderr'][pos:pos+len(steps)])
+        pos += len(steps)
+        # The PHY delays of each measurement, or of the fiber in older runs
+        sc = run['scalars']
+        rx = np.array([sc.get("rx-master-%s" % name, sc.get("rx-master-%s" % fiber)) + \
+        sc.get("rx-slave-%s" % name, sc.get("rx-slave-%s" % fiber)) for fiber, name, series in steps])
+        fit = solve_latencies([fiber for fiber, name, series in steps], m - rx, u, \
+        run['params'].get('threshold', 3.0))
+        delta[i] = [fit['latencies']['f1'], fit['latencies']['f2']]
+    results['fiber-latency'] = {'run' : np.array([run['run'] for run in lat], dtype=np.int64), \
+    'key' : [run['key'] for run in lat], 'delta1' : delta[:,0], 'delta2' : delta[:,1]}
+
+    # Fiber asymmetry -----------------------------------------
+    asym = runs['fiber-asymmetry']
+    skew = means[pos:pos+2*len(asym)].reshape(-1, 2) * 1e12
+    pos += 2*len(asym)
+    sign = np.array([-1.0 if run['params'].get('sfp') == "blue" else 1.0 for run in asym])
+    skew = skew * sign[:,None]
+    d2 = np.array([run['scalars']['delta2'] if delta2 == None else delta2 for run in asym])
+    dif = skew[:,1] - skew[:,0]
+    alpha = (2 * dif) / (0.5 * d2 - dif)
+    alpha_n = 2**40 * (((alpha + 1) / (alpha + 2)) - 0.5)
+    alpha_n = alpha_n * -sign
+    results['fiber-asymmetry'] = {'run' : np.array([run['run'] for run in asym], dtype=np.int64), \
+    'key' : [run['key'] for run in asym], 'alpha_n' : alpha_n}
+
+    # Port delays ---------------------------------------------
+    port = runs['port-delay']
+    m = means[pos:pos+2*len(port)].reshape(-1, 2)
+    sc = [run['scalars'] for run in port]
+    d1 = np.array([s['delta1'] if delta1 == None else delta1 for s in sc])
+    phy = np.array([s['dtxm'] + s['drxm'] + s['bitslide'] for s in sc])
+    last = [s['iterations'] - 1 for s in sc]
+    dtxs = np.array([s['dtxs-%d' % i] for s, i in zip(sc, last)])
+    drxs = np.array([s['drxs-%d' % i] for s, i in zip(sc, last)])
+    skew = m[:,1] * 1e12
+    results['port-delay'] = {'run' : np.array([run['run'] for run in port], dtype=np.int64), \
+    'key' : [run['key'] for run in port], 'coarse' : 0.5 * (m[:,0] - phy - d1), \
+    'dtxs' : dtxs - skew, 'drxs' : drxs + skew}
+
+    return results
@@ -0,0 +1,179 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Sequential sampling controller for the acquisition loops.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup analysis
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import math
+
+# User modules
+from main import clock
+
+class Sampling_controller() :
+    '''
+    Sequential sampling controller.
+
+    It decides, after each sample, if an acquisition loop should take another
+    one. The loop stops when the standard error of the mean reaches the target
+    uncertainty, when the time budget is exhausted or when max_samples values
+    were read, whatever happens first. The target is only met with a known
+    uncertainty: values without dispersion (i.e. quantized) need the
+    resolution of the values. Without target and budget it behaves as
+    the classic fixed number of samples.
+
+    Usage:
+        sampler.start()
+        while sampler.keep_going(stats) :
+            stats.add(read_value())
+        report = sampler.report(stats)
+    '''
+
+    def __init__(self, target=None, budget=None, min_samples=3, max_samples=None, scale=1, \
+    resolution=0) :
+        '''
+        Constructor
+
+        Args:
+            target (float) : Target standard error of the mean (in ps).
+            budget (float) : Time budget for the acquisition (in s).
+            min_samples (int) : Accepted samples needed before checking the target.
+            max_samples (int) : Maximum number of values read (accepted + rejected).
+            scale (float) : Factor to convert sample units to ps (1e12 for values in s).
+            resolution (float) : Quantization step of the values (in ps), 0 if \
+            unknown. The uncertainty is never taken below resolution / sqrt(12).
+
+        Raises:
+            ValueError if no stop condition is given.
+        '''
+        if target == None and budget == None and max_samples == None :
+            raise ValueError("Sampling_controller ERROR: A target, a budget or max_samples is needed.")
+
+        self.target = target
+        self.budget = budget
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.scale = scale
+        self.resolution = resolution
+        self.reason = None
+        self.t_start = None
+
+    # ------------------------------------------------------------------------ #
+
+    def start(self) :
+        '''
+        Method to start the time budget count.
+        '''
+        self.reason = None
+        self.t_start = clock.monotonic()
+
+    # ------------------------------------------------------------------------ #
+
+    def elapsed(self) :
+        '''
+        Method to get the time since start was called (in s).
+        '''
+        if self.t_start == None :
+            return 0
+        return clock.monotonic() - self.t_start
+
+    # ------------------------------------------------------------------------ #
+
+    def uncertainty(self, stats) :
+        '''
+        Method to get the uncertainty achieved by an acquisition.
+
+        The standard error of the mean is combined with the quantization
+        floor, resolution / sqrt(12).
+
+        Args:
+            stats (Online_stats) : Statistics of the acquisition.
+
+        Returns:
+            The uncertainty (in ps), None with less than min_samples accepted
+            samples or when the values have no dispersion and the resolution
+            is unknown.
+        '''
+        if stats.n < self.min_samples :
+            return None
+        u = stats.stderr() * self.scale
+        if u == 0 and self.resolution == 0 :
+            return None
+        return math.sqrt(u**2 + self.resolution**2 / 12.0)
+
+    # ------------------------------------------------------------------------ #
+
+    def keep_going(self, stats) :
+        '''
+        Method to decide if another sample is needed.
+
+        Args:
+            stats (Online_stats) : Statistics of the current acquisition.
+
+        Returns:
+            True if the loop should take another sample.
+        '''
+        if self.t_start == None :
+            self.start()
+
+        u = None if self.target == None else self.uncertainty(stats)
+        if u != None and u <= self.target :
+            self.reason = "target"
+        elif self.max_samples != None and stats.n + stats.rejected >= self.max_samples :
+            self.reason = "max-samples"
+        elif self.budget != None and self.elapsed() >= self.budget :
+            self.reason = "budget"
+        else :
+            return True
+
+        return False
+
+    # ------------------------------------------------------------------------ #
+
+    def report(self, stats) :
+        '''
+        Method to report what the acquisition achieved.
+
+        Args:
+            stats (Online_stats) : Statistics of the finished acquisition.
+
+        Returns:
+            A dict with keys: elapsed (s), reason (why sampling stopped), target
+            (ps), target_met (True, False or None if no target was given) and
+            achieved (see uncertainty).
+        '''
+        u = self.uncertainty(stats)
+        met = None
+        if self.target != None :
+            met = u != None and u <= self.target
+
+        return {
+            'elapsed'    : self.elapsed(),
+            'reason'     : self.reason,
+            'target'     : self.target,
+            'target_met' : met,
+            'achieved'   : u
+        }
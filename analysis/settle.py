@@ -0,0 +1,194 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Detection of the settling of the WR servo from its status records.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup analysis
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import numpy as np
+
+# Fields of the status records tested by default (see WR_Device.get_status)
+DEF_FIELDS = ("setp", "cko", "mu", "crtt", "asym")
+
+def sliding_stability(t, values, window, tolerance, t_crit=3.0) :
+    '''
+    Function to test the stationarity of every window of a series of records.
+
+    A linear trend is fitted to each field in each window of window records,
+    all of them at once. A window is not stable when any field drifts more
+    than its tolerance along the window and the drift is significant (its t
+    statistic is above t_crit), so the noise alone doesn't make a window
+    unstable.
+
+    Args:
+        t (array) : Time of each record (in s).
+        values (array) : Matrix with a row per record and a column per field.
+        window (int) : Records of each window.
+        tolerance (array) : Drift accepted along a window for each field.
+        t_crit (float) : Limit of the t statistic of the trend.
+
+    Returns:
+        A boolean numpy array with, for each record, whether the window that
+        ends with it is stable (False for the first window-1 records).
+    '''
+    t = np.asarray(t, dtype=np.float64)
+    x = np.asarray(values, dtype=np.float64).reshape(len(t), -1)
+    n = len(t)
+    stable = np.zeros(n, dtype=bool)
+    if window < 3 or n < window :
+        return stable
+
+    # Windows: (positions, window) for t and (positions, window, fields) for x
+    tw = np.lib.stride_tricks.sliding_window_view(t, window)
+    xw = np.lib.stride_tricks.sliding_window_view(x, window, axis=0).transpose(0, 2, 1)
+
+    dt = tw - tw.mean(axis=1, keepdims=True)
+    dx = xw - xw.mean(axis=1, keepdims=True)
+    sxx = np.sum(dt * dt, axis=1)[:, None]
+    sxx = np.where(sxx > 0, sxx, np.inf)
+    slope = np.einsum("pw,pwf->pf", dt, dx) / sxx
+
+    resid = dx - slope[:, None, :] * dt[:, :, None]
+    s2 = np.sum(resid * resid, axis=1) / (window - 2)
+    slope_err = np.sqrt(s2 / sxx)
+    drift = np.abs(slope) * (tw[:, -1] - tw[:, 0])[:, None]
+    significant = np.abs(slope) > t_crit * slope_err
+
+    moving = (drift > np.asarray(tolerance, dtype=np.float64)) & significant
+    stable[window-1:] = ~np.any(moving, axis=1)
+    return stable
+
+# ---------------------------------------------------------------------------- #
+
+class Settle_detector() :
+    '''
+    Detector of the settling of the servo of a WR slave.
+
+    It takes the successive status records of the slave and decides that the
+    link is stable when the last window records are in TRACK PHASE and none
+    of the fields (setpoint, clock offset, mu, cable round-trip and
+    asymmetry by default) is moving (see sliding_stability). It also keeps
+    when the servo was moving, to flag the samples taken meanwhile.
+    '''
+
+    def __init__(self, window=8, tolerance=5.0, fields=DEF_FIELDS, t_crit=3.0) :
+        '''
+        Constructor
+
+        Args:
+            window (int) : Records needed to decide (at least 3).
+            tolerance (float) : Drift accepted along a window (in ps), a dict \
+            by field or a value for all of them.
+            fields (tuple) : Fields of the status records tested.
+            t_crit (float) : Limit of the t statistic of the trend.
+
+        Raises:
+            ValueError if window is less than 3.
+        '''
+        if window < 3 :
+            raise ValueError("Settle_detector ERROR: the window must have at least 3 records.")
+
+        ## Records needed to decide
+        self.window = window
+        ## Fields of the status records tested
+        self.fields = tuple(fields)
+        ## Drift accepted along a window for each field
+        self.tolerance = np.array([tolerance.get(f, 5.0) if isinstance(tolerance, dict) \
+        else tolerance for f in self.fields], dtype=np.float64)
+        ## Limit of the t statistic of the trend
+        self.t_crit = t_crit
+        self.reset()
+
+    # ------------------------------------------------------------------------ #
+
+    def reset(self) :
+        '''
+        Method to forget the records, i.e. after a change of the link.
+        '''
+        ## Time of each record
+        self.times = []
+        ## Values of the fields of each record
+        self.values = []
+        ## For each record, True if it was in TRACK PHASE
+        self.tracking = []
+        ## For each record, True if the link was stable
+        self.states = []
+
+    # ------------------------------------------------------------------------ #
+
+    def add(self, status, t) :
+        '''
+        Method to add a status record.
+
+        Args:
+            status (dict) : Status of the slave (see WR_Device.get_status). \
+            Missing fields are taken as 0.
+            t (float) : Time of the record (clock.time()).
+
+        Returns:
+            True if the link is stable.
+        '''
+        self.times.append(t)
+        self.values.append([float(status.get(f, 0)) for f in self.fields])
+        self.tracking.append(status.get('ss') == "TRACK_PHASE")
+
+        stable = False
+        if len(self.times) >= self.window and all(self.tracking[-self.window:]) :
+            stable = bool(sliding_stability(self.times[-self.window:], self.values[-self.window:], \
+            self.window, self.tolerance, self.t_crit)[-1])
+        self.states.append(stable)
+        return stable
+
+    # ------------------------------------------------------------------------ #
+
+    @property
+    def stable(self) :
+        '''
+        True if the link was stable in the last record.
+        '''
+        return len(self.states) > 0 and self.states[-1]
+
+    # ------------------------------------------------------------------------ #
+
+    def moving(self, timestamps) :
+        '''
+        Method to flag the samples taken while the servo was moving.
+
+        The state of a sample is the one of the last record before it. The
+        samples before the first record are not flagged.
+
+        Args:
+            timestamps (list) : Time of each sample (clock.time()).
+
+        Returns:
+            A list with, for each sample, True if the servo was moving.
+        '''
+        if len(self.times) == 0 :
+            return [False] * len(timestamps)
+        pos = np.searchsorted(np.asarray(self.times), np.asarray(timestamps, dtype=np.float64), \
+        side="right") - 1
+        states = np.asarray(self.states, dtype=bool)
+        return np.where(pos >= 0, ~states[np.clip(pos, 0, None)], False).tolist()
@@ -0,0 +1,177 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Propagation of the measurement uncertainty to the calibration constants.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup analysis
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import numpy as np
+
+# Draws of the Monte Carlo propagation by default
+DEFAULT_DRAWS = 1000000
+
+# The formulas of the calibration procedures accept scalars or numpy arrays
+# (one value per draw), so the same code computes the constants and propagates
+# their uncertainty. All the values are in ps.
+
+def asymmetry(skew_f1, skew_f2, delta2) :
+    '''
+    Function to compute the fiber asymmetry parameter.
+
+    alpha = 2 dif / (delta2 / 2 - dif), with dif = skew_f2 - skew_f1
+    alpha_n = 2^40 ((alpha + 1) / (alpha + 2) - 1/2)
+
+    Args:
+        skew_f1 (float) : Mean skew master to slave with f1.
+        skew_f2 (float) : Mean skew master to slave with f2.
+        delta2 (float) : Latency of f2 (see analysis.latency_fit).
+
+    Returns:
+        alpha_n, the value written in the SFP database of the slave.
+    '''
+    dif = skew_f2 - skew_f1
+    alpha = (2 * dif) / (0.5 * delta2 - dif)
+    return 2**40 * ((alpha + 1) / (alpha + 2) - 0.5)
+
+# ---------------------------------------------------------------------------- #
+
+def port_delay(dtxs, skew, alpha_n, alpha_ref, delta1) :
+    '''
+    Function to compute the Tx delay of a port from its last skew measurement.
+
+    The skew is measured against the master to slave delay that the link
+    computes with the alpha_n written in the SFP database (alpha_ref). If the
+    fiber asymmetry is alpha_n, that delay is off by
+    delta1 (alpha_n - alpha_ref) / 2^40.
+
+    Args:
+        dtxs (float) : Tx delay of the last iteration.
+        skew (float) : Mean skew of the last iteration.
+        alpha_n (float) : Fiber asymmetry parameter.
+        alpha_ref (float) : Fiber asymmetry parameter used by the link.
+        delta1 (float) : Latency of f1.
+
+    Returns:
+        The Tx delay (the Rx delay moves the opposite way).
+    '''
+    return dtxs - skew - delta1 * (alpha_n - alpha_ref) / 2**40
+
+# ---------------------------------------------------------------------------- #
+
+def linearized(func, values, stderrs) :
+    '''
+    Function to propagate independent uncertainties to the result of func
+    with the first order (linear) approximation.
+
+    u(f)^2 = sum((df/dx_i)^2 u(x_i)^2)
+
+    The derivatives are computed by central differences in a single vectorized
+    call of func, with steps proportional to the uncertainties.
+
+    Args:
+        func (callable) : Function of len(values) arguments that accepts arrays.
+        values (list) : Values (best estimates) of the arguments.
+        stderrs (list) : Standard uncertainties of the arguments (0 for exact \
+        values).
+
+    Returns:
+        A dict with keys: value and stderr.
+    '''
+    x = np.asarray(values, dtype=np.float64)
+    u = np.asarray(stderrs, dtype=np.float64)
+    k = len(x)
+    h = np.where(u > 0, u * 1e-3, 0.0)
+
+    # Column 0 is the nominal point, columns 2i+1 and 2i+2 move argument i
+    points = np.repeat(x[:, None], 2 * k + 1, axis=1)
+    idx = np.arange(k)
+    points[idx, 2 * idx + 1] += h
+    points[idx, 2 * idx + 2] -= h
+    f = np.asarray(func(*points), dtype=np.float64)
+
+    steps = np.where(h > 0, 2 * h, 1.0)
+    grad = (f[1::2] - f[2::2]) / steps
+    return {'value' : float(f[0]), 'stderr' : float(np.sqrt(np.sum((grad * u)**2)))}
+
+# ---------------------------------------------------------------------------- #
+
+def monte_carlo(func, values, stderrs, draws=DEFAULT_DRAWS, seed=None, level=0.95) :
+    '''
+    Function to propagate independent normal uncertainties to the result of
+    func by Monte Carlo.
+
+    All the draws are evaluated in a single vectorized call of func, so one
+    million draws take a few tens of ms. Unlike linearized, it shows the bias
+    and asymmetry of non linear formulas.
+
+    Args:
+        func (callable) : Function of len(values) arguments that accepts arrays.
+        values (list) : Values (best estimates) of the arguments.
+        stderrs (list) : Standard uncertainties of the arguments.
+        draws (int) : Number of draws.
+        seed (int) : Seed of the random generator.
+        level (float) : Coverage of the interval.
+
+    Returns:
+        A dict with keys: value (func of values), mean and stderr (of the
+        draws), low and high (limits of the probabilistically symmetric
+        interval with the given coverage) and draws.
+    '''
+    x = np.asarray(values, dtype=np.float64)
+    u = np.asarray(stderrs, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    samples = x[:, None] + u[:, None] * rng.standard_normal((len(x), int(draws)))
+    f = np.asarray(func(*samples), dtype=np.float64)
+    low, high = np.quantile(f, [(1 - level) / 2, (1 + level) / 2])
+    return {
+        'value'  : float(func(*x)),
+        'mean'   : float(f.mean()),
+        'stderr' : float(f.std(ddof=1)),
+        'low'    : float(low),
+        'high'   : float(high),
+        'draws'  : int(draws)
+    }
+
+# ---------------------------------------------------------------------------- #
+
+def propagate(func, values, stderrs, draws=0, seed=None) :
+    '''
+    Function to propagate uncertainties with the selected method.
+
+    Args:
+        func (callable) : Function of len(values) arguments that accepts arrays.
+        values (list) : Values (best estimates) of the arguments.
+        stderrs (list) : Standard uncertainties of the arguments.
+        draws (int) : Draws of the Monte Carlo propagation, 0 for the linear \
+        propagation.
+        seed (int) : Seed of the random generator.
+
+    Returns:
+        A dict with at least keys: value and stderr.
+    '''
+    if draws > 0 :
+        return monte_carlo(func, values, stderrs, draws, seed)
+    return linearized(func, values, stderrs)
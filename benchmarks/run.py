@@ -0,0 +1,296 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+End-to-end benchmarks of the calibration procedures on simulated hardware.
+
+Run it from the root folder of the package:
+
+    python3 -m benchmarks.run [--cases fiber_latency,trigger_level] [--check]
+
+Each case runs a procedure with the real drivers on a simulation.sim_world
+bench under a virtual clock. The wall time, the simulated time, the device and
+instrument transactions and the error against the simulated ground truth are
+printed and appended to a JSON history, kept by default in the user cache
+folder ($XDG_CACHE_HOME/wrcalibration/benchmarks.json). With --check, the exit
+status is 1 when a case is worse than in the previous run with the same seed.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup benchmarks
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+# User modules
+from main import io_trace
+from simulation.sim_world import Sim_device, Sim_world
+from calibration.wrcalibration import WR_calibration
+from wr_devices.wr_device import WR_interfaces
+
+## Available cases, in run order
+CASES = ("fiber_latency", "fiber_asymmetry", "calibrate_device_port", "trigger_level")
+
+## Allowed relative increase of the simulated time, transactions and errors
+TOLERANCE = 0.1
+
+## Allowed relative increase of the wall time (it depends on the host)
+WALL_TOLERANCE = 0.5
+
+## Wall time increases below this value (in s) are not compared
+WALL_FLOOR = 0.05
+
+## Errors below this value (in the unit of the result) are not compared
+ERROR_FLOOR = 1.0
+
+def build_world(seed) :
+    '''
+    Function to build the simulated bench used by all the cases.
+
+    A reference pair (master with a violet SFP in ttyUSB0, slave with a blue
+    SFP in ttyUSB1), a device under calibration with a blue SFP in ttyUSB2 and
+    a calibrator. The FCA3103 is usbtmc0.
+
+    Args:
+        seed (int) : Seed of the simulated noise.
+
+    Returns:
+        The Sim_world.
+    '''
+    world = Sim_world(seed)
+    world.add_device(0, Sim_device("master", 221000, 223500, 0, "AXGE-3454-0531"), "master")
+    world.add_device(1, Sim_device("slave", 219800, 224300, 8000, "AXGE-1254-0531"), "slave")
+    world.add_device(2, Sim_device("dut", 222900, 220400, 16000, "AXGE-1254-0531"), "dut")
+    world.set_calibrator(Sim_device("calibrator", 220500, 222700, 0, "AXGE-3454-0531"))
+    return world
+
+# ---------------------------------------------------------------------------- #
+
+def build_calibration(world, ttys) :
+    '''
+    Function to build a WR_calibration for the simulated bench.
+
+    Args:
+        world (Sim_world) : The simulated bench.
+        ttys (list) : Serial ports of the WR devices to add.
+
+    Returns:
+        The WR_calibration.
+    '''
+    cal = WR_calibration()
+    for tty in ttys :
+        cal.add_wr_device("wr_len", [WR_interfaces.usb, tty])
+    cal.add_meas_instr("FCA3103", [0, 1, 2])
+    cal.add_fiber_switch("sim_switch", [("f1", "f2", "f1+f2"), world.on_route])
+    cal.instr.trig_level = [world.v_trigger] * 2
+    return cal
+
+# ---------------------------------------------------------------------------- #
+
+def case_fiber_latency(world, truth) :
+    cal = build_calibration(world, [0, 1])
+    cal.fiber_latency()
+    return {'delta1' : (cal.cfg_dict['fiber-latency']['delta1'], truth['delta1']), \
+    'delta2' : (cal.cfg_dict['fiber-latency']['delta2'], truth['delta2'])}
+
+# ---------------------------------------------------------------------------- #
+
+def case_fiber_asymmetry(world, truth) :
+    cal = build_calibration(world, [0, 1])
+    cal.cfg_dict['fiber-latency']['delta1'] = truth['delta1']
+    cal.cfg_dict['fiber-latency']['delta2'] = truth['delta2']
+    cal.fiber_asymmetry()
+    return {'alpha_n' : (cal.cfg_dict['fiber-asymmetry']['blue-wr1'], truth['alpha_n'])}
+
+# ---------------------------------------------------------------------------- #
+
+def case_calibrate_device_port(world, truth) :
+    cal = build_calibration(world, [2])
+    cal.cfg_dict['fiber-latency']['delta1'] = truth['delta1']
+    cal.cfg_dict['fiber-latency']['delta2'] = truth['delta2']
+    cal.cfg_dict['fiber-asymmetry']['blue-wr1'] = truth['alpha_n']
+    cal.calibrate_device_port(10)
+    dtxs, drxs = cal.cfg_dict['port-delay']['blue-wr1']
+    return {'dtxs' : (dtxs, truth['dtxs']), 'drxs' : (drxs, truth['drxs'])}
+
+# ---------------------------------------------------------------------------- #
+
+def case_trigger_level(world, truth) :
+    cal = build_calibration(world, [])
+    cal.instr.trigger_level()
+    return {'v_trigger' : (cal.instr.trig_level[0], truth['v_trigger'])}
+
+# ---------------------------------------------------------------------------- #
+
+def run_case(name, seed, verbose=False) :
+    '''
+    Function to run a case on a new simulated bench.
+
+    Args:
+        name (str) : Name of the case (see CASES).
+        seed (int) : Seed of the simulated noise.
+        verbose (bool) : When False, the output of the procedure is hidden.
+
+    Returns:
+        A dict with wall_time, sim_time (in s), transactions (by kind) and
+        results (value, truth and error by result name).
+    '''
+    world = build_world(seed)
+    io_trace.start_simulation(world)
+    out = sys.stdout if verbose else io.StringIO()
+    try :
+        start = world.clock.monotonic()
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(out) :
+            results = globals()["case_%s" % name](world, world.truth())
+        wall = time.perf_counter() - t0
+    finally :
+        io_trace.stop()
+
+    return {'wall_time' : wall, 'sim_time' : world.clock.monotonic() - start, \
+    'transactions' : dict(world.transactions), \
+    'results' : {k : {'value' : v, 'truth' : t, 'error' : v - t} for k, (v, t) in results.items()}}
+
+# ---------------------------------------------------------------------------- #
+
+def regressions(cur, prev) :
+    '''
+    Function to compare the results of a case with a previous run.
+
+    Args:
+        cur (dict) : Results of the case (see run_case).
+        prev (dict) : Results of the same case in the previous run.
+
+    Returns:
+        A list of str, one for each regression.
+    '''
+    worse = lambda new, old, tol : new > old * (1 + tol)
+    reg = []
+    if worse(cur['wall_time'], prev['wall_time'], WALL_TOLERANCE) and \
+    cur['wall_time'] - prev['wall_time'] > WALL_FLOOR :
+        reg.append("wall time %.3f s (was %.3f s)" % (cur['wall_time'], prev['wall_time']))
+    if worse(cur['sim_time'], prev['sim_time'], TOLERANCE) :
+        reg.append("simulated time %.0f s (was %.0f s)" % (cur['sim_time'], prev['sim_time']))
+    for kind, n in cur['transactions'].items() :
+        old = prev['transactions'].get(kind, 0)
+        if worse(n, old, TOLERANCE) :
+            reg.append("%s transactions %d (was %d)" % (kind, n, old))
+    for key, res in cur['results'].items() :
+        if key not in prev['results'] :
+            continue
+        err = abs(res['error'])
+        old = abs(prev['results'][key]['error'])
+        if err > ERROR_FLOOR and worse(err, old, TOLERANCE) :
+            reg.append("%s error %g (was %g)" % (key, err, old))
+    return reg
+
+# ---------------------------------------------------------------------------- #
+
+def git_revision() :
+    '''
+    Function to get the current git revision of the package, or None.
+    '''
+    try :
+        out = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], \
+        cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL)
+        return bytes.decode(out).strip()
+    except (OSError, subprocess.CalledProcessError) :
+        return None
+
+# ---------------------------------------------------------------------------- #
+
+def default_history() :
+    '''
+    Path of the default history file, outside of the source tree.
+    '''
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache, "wrcalibration", "benchmarks.json")
+
+# ---------------------------------------------------------------------------- #
+
+def main(argv=None) :
+    parser = argparse.ArgumentParser(description="Calibration benchmarks on simulated hardware.")
+    parser.add_argument("--cases", default=",".join(CASES), \
+    help="Comma separated cases to run (default: all).")
+    parser.add_argument("--repeat", type=int, default=1, \
+    help="Runs of each case, the fastest wall time is kept.")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the simulated noise.")
+    parser.add_argument("--history", default=default_history(), \
+    help="JSON file where the results are appended (default: %(default)s).")
+    parser.add_argument("--check", action="store_true", \
+    help="Exit with status 1 when a case is worse than in the previous run.")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the procedures.")
+    args = parser.parse_args(argv)
+
+    cases = [c.strip() for c in args.cases.split(",") if c.strip() != ""]
+    for c in cases :
+        if c not in CASES :
+            parser.error("unknown case %s (available: %s)" % (c, ", ".join(CASES)))
+
+    history = []
+    if os.path.exists(args.history) :
+        with open(args.history, "r") as f :
+            history = json.load(f)
+    prev = {}
+    for entry in history :
+        if entry['seed'] == args.seed :
+            prev.update(entry['cases'])
+
+    results = {}
+    failed = False
+    for name in cases :
+        runs = [run_case(name, args.seed, args.verbose) for _ in range(max(1, args.repeat))]
+        cur = runs[0]
+        cur['wall_time'] = min(r['wall_time'] for r in runs)
+        results[name] = cur
+
+        print("%-22s wall %8.3f s  sim %9.0f s  %s" % (name, cur['wall_time'], cur['sim_time'], \
+        "  ".join("%s %d" % kv for kv in sorted(cur['transactions'].items()))))
+        for key, res in cur['results'].items() :
+            print("%24s %-10s = %-14.6g truth %-14.6g error %g" % \
+            ("", key, res['value'], res['truth'], res['error']))
+
+        if name in prev :
+            for r in regressions(cur, prev[name]) :
+                print("%24s REGRESSION: %s" % ("", r))
+                failed = True
+
+    history.append({'date' : datetime.datetime.now().isoformat(timespec="seconds"), \
+    'revision' : git_revision(), 'seed' : args.seed, 'cases' : results})
+    folder = os.path.dirname(os.path.abspath(args.history))
+    if not os.path.isdir(folder) :
+        os.makedirs(folder)
+    with open(args.history, "w") as f :
+        json.dump(history, f, indent=1)
+
+    return 1 if args.check and failed else 0
+
+if __name__ == "__main__" :
+    sys.exit(main())
@@ -0,0 +1,178 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Checkpoint storage for resumable calibration procedures.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup calibration
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import json
+import os
+import tempfile
+
+class Checkpoint() :
+    '''
+    Checkpoint storage for resumable calibration procedures.
+
+    Each procedure of WR_calibration uses its own section, identified by a
+    name, with the parameters the procedure was called with and the results of
+    the steps already completed. Every time a step is stored the whole file is
+    rewritten atomically (written to a temporary file and renamed), so a crash
+    never leaves a corrupted checkpoint.
+
+    Step results must be serializable to JSON (numbers, strings, lists and
+    dicts with str keys). Tuples are restored as lists.
+    '''
+
+    def __init__(self, path) :
+        '''
+        Constructor
+
+        If the file exists, the stored sections are loaded.
+
+        Args:
+            path (str) : Path to the checkpoint file.
+        '''
+        self.path = path
+        self.sections = {}
+        if os.path.exists(path) :
+            with open(path, 'r', encoding='utf-8') as cp :
+                self.sections = json.load(cp)
+
+    # ------------------------------------------------------------------------ #
+
+    def save(self) :
+        '''
+        Method to write the checkpoint file atomically.
+        '''
+        folder = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(prefix=".checkpoint-", dir=folder)
+        try :
+            with os.fdopen(fd, 'w', encoding='utf-8') as out :
+                json.dump(self.sections, out, indent=1)
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp, self.path)
+        except :
+            os.unlink(tmp)
+            raise
+
+    # ------------------------------------------------------------------------ #
+
+    def begin(self, section, params) :
+        '''
+        Method to start (or resume) a section.
+
+        If the section exists but it was started with other parameters, the
+        stored steps are discarded.
+
+        Args:
+            section (str) : Section name.
+            params (dict) : Parameters of the procedure.
+
+        Returns:
+            List of step names already completed.
+        '''
+        # Compare the parameters as they would be stored
+        params = json.loads(json.dumps(params))
+        stored = self.sections.get(section)
+        if stored == None or stored['params'] != params :
+            self.sections[section] = {'params' : params, 'steps' : {}, 'order' : []}
+            self.save()
+
+        return list(self.sections[section]['order'])
+
+    # ------------------------------------------------------------------------ #
+
+    def done(self, section, step) :
+        '''
+        Method to check if a step was completed.
+
+        Args:
+            section (str) : Section name.
+            step (str) : Step name.
+
+        Returns:
+            True if the step result is stored.
+        '''
+        return section in self.sections and step in self.sections[section]['steps']
+
+    # ------------------------------------------------------------------------ #
+
+    def get(self, section, step) :
+        '''
+        Method to get the stored result of a step.
+
+        Args:
+            section (str) : Section name.
+            step (str) : Step name.
+
+        Returns:
+            The stored result.
+        '''
+        return self.sections[section]['steps'][step]
+
+    # ------------------------------------------------------------------------ #
+
+    def store(self, section, step, result) :
+        '''
+        Method to store the result of a completed step.
+
+        Args:
+            section (str) : Section name.
+            step (str) : Step name.
+            result : The step result.
+        '''
+        self.sections[section]['steps'][step] = result
+        self.sections[section]['order'].append(step)
+        self.save()
+
+    # ------------------------------------------------------------------------ #
+
+    def discard(self, section, step) :
+        '''
+        Method to remove the stored result of a step, so it runs again.
+
+        Args:
+            section (str) : Section name.
+            step (str) : Step name.
+        '''
+        if self.done(section, step) :
+            del self.sections[section]['steps'][step]
+            self.sections[section]['order'].remove(step)
+            self.save()
+
+    # ------------------------------------------------------------------------ #
+
+    def finish(self, section) :
+        '''
+        Method to remove a section when its procedure is completed.
+
+        Args:
+            section (str) : Section name.
+        '''
+        if section in self.sections :
+            del self.sections[section]
+            self.save()
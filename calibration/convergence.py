@@ -0,0 +1,251 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Convergence strategies for the port delay iteration of calibrate_device_port.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup calibration
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import abc
+
+class Convergence_strategy() :
+    '''
+    Convergence strategy API
+
+    calibrate_device_port measures the skew between the PPS of the WR
+    calibrator and the device for the current delays (dtxs, drxs), and a
+    strategy decides the correction c to apply for the next iteration:
+    dtxs = dtxs - c, drxs = drxs + c.
+
+    The strategy also chooses the number of samples of each iteration: while
+    the skew is far from the target a coarse estimate is enough, the full
+    number of samples is only used when the port is close to convergence.
+    calibrate_device_port only stops after a full measurement within error.
+    '''
+    __metaclass__ = abc.ABCMeta
+
+    def __init__(self, coarse_fraction=0.25, coarse_factor=10) :
+        '''
+        Constructor
+
+        Args:
+            coarse_fraction (float) : Fraction of n_samples used in coarse iterations.
+            coarse_factor (float) : A skew bigger than coarse_factor * error is \
+            measured with coarse iterations.
+        '''
+        self.coarse_fraction = coarse_fraction
+        self.coarse_factor = coarse_factor
+        self.reset()
+
+    # ------------------------------------------------------------------------ #
+
+    def reset(self) :
+        '''
+        Method to forget previous iterations.
+        '''
+        ## List of (dtxs, skew, stderr) of the previous iterations
+        self.history = []
+
+    # ------------------------------------------------------------------------ #
+
+    def n_samples(self, n_samples, error) :
+        '''
+        Method to choose the number of samples for the next iteration.
+
+        The first iteration and those following a skew bigger than
+        coarse_factor * error are coarse.
+
+        Args:
+            n_samples (int) : Number of samples of a full iteration.
+            error (float) : The minimal time difference accepted (in ps).
+
+        Returns:
+            The number of samples.
+        '''
+        coarse = max(3, int(n_samples * self.coarse_fraction))
+        if coarse >= n_samples :
+            return n_samples
+        if len(self.history) == 0 or abs(self.history[-1][1]) > self.coarse_factor * error :
+            return coarse
+
+        return n_samples
+
+    # ------------------------------------------------------------------------ #
+
+    def update(self, dtxs, skew, stderr=0) :
+        '''
+        Method to get the correction after an iteration.
+
+        Args:
+            dtxs (float) : Tx delay used in the iteration (in ps).
+            skew (float) : Measured skew (in ps).
+            stderr (float) : Standard error of the skew (in ps).
+
+        Returns:
+            The correction c (in ps): dtxs -= c and drxs += c.
+        '''
+        self.history.append((dtxs, skew, stderr))
+        return self.correction()
+
+    # ------------------------------------------------------------------------ #
+
+    @abc.abstractmethod
+    def correction(self) :
+        '''
+        Abstract method to calculate the correction from self.history.
+        '''
+
+# ---------------------------------------------------------------------------- #
+
+class Fixed_step(Convergence_strategy) :
+    '''
+    The classic iteration: the correction is the measured skew.
+
+    It assumes that the skew changes 1 ps for each ps of correction. By
+    default every iteration uses the full number of samples.
+    '''
+
+    def __init__(self, coarse_fraction=1.0, coarse_factor=10) :
+        '''
+        Constructor
+
+        Args:
+            coarse_fraction (float) : Fraction of n_samples used in coarse iterations.
+            coarse_factor (float) : A skew bigger than coarse_factor * error is \
+            measured with coarse iterations.
+        '''
+        Convergence_strategy.__init__(self, coarse_fraction, coarse_factor)
+
+    # ------------------------------------------------------------------------ #
+
+    def correction(self) :
+        '''
+        Method to calculate the correction: the last skew.
+        '''
+        return self.history[-1][1]
+
+# ---------------------------------------------------------------------------- #
+
+class Damped_secant(Convergence_strategy) :
+    '''
+    Damped secant iteration.
+
+    The slope of the skew response to the delays is estimated from the last
+    two iterations and a Newton step is applied. The slope is limited to a
+    sane range and, when the last two delays are too close to estimate it, the
+    previous slope is kept (1 at the beginning). The step is damped only while
+    the slope is the nominal one, once a slope is measured the full step is
+    applied.
+    '''
+
+    def __init__(self, damping=0.7, slope_range=(0.25, 4.0), min_dx=1.0, \
+    coarse_fraction=0.25, coarse_factor=10) :
+        '''
+        Constructor
+
+        Args:
+            damping (float) : Fraction of the Newton step applied before a \
+            slope is measured (0 < damping <= 1).
+            slope_range (tuple) : Minimum and maximum accepted slope.
+            min_dx (float) : Minimum delay change (ps) to estimate the slope.
+            coarse_fraction (float) : Fraction of n_samples used in coarse iterations.
+            coarse_factor (float) : A skew bigger than coarse_factor * error is \
+            measured with coarse iterations.
+        '''
+        self.damping = damping
+        self.slope_range = slope_range
+        self.min_dx = min_dx
+        Convergence_strategy.__init__(self, coarse_fraction, coarse_factor)
+
+    # ------------------------------------------------------------------------ #
+
+    def reset(self) :
+        '''
+        Method to forget previous iterations.
+        '''
+        Convergence_strategy.reset(self)
+        self.slope = 1.0
+        ## True when the slope was estimated from the iterations
+        self.measured = False
+
+    # ------------------------------------------------------------------------ #
+
+    def correction(self) :
+        '''
+        Method to calculate the correction with a damped secant step.
+        '''
+        if len(self.history) >= 2 :
+            x0, s0, e0 = self.history[-2]
+            x1, s1, e1 = self.history[-1]
+            if abs(x1 - x0) >= self.min_dx :
+                slope = (s1 - s0) / (x1 - x0)
+                if self.slope_range[0] <= slope <= self.slope_range[1] :
+                    self.slope = slope
+                    self.measured = True
+
+        damping = 1.0 if self.measured else self.damping
+        return damping * self.history[-1][1] / self.slope
+
+# ---------------------------------------------------------------------------- #
+
+class Response_fit(Damped_secant) :
+    '''
+    Iteration based on a fitted response model.
+
+    A straight line skew = slope * (dtxs - dtxs0) is fitted by weighted least
+    squares (weights 1/stderr^2) to all the previous iterations, and the
+    correction moves dtxs to the root of the line. It uses every measurement,
+    so it's less sensitive to the noise of a single iteration than the
+    secant. With a single iteration it behaves as Damped_secant, and the
+    step is damped in the same way.
+    '''
+
+    def correction(self) :
+        '''
+        Method to calculate the correction from the fitted response.
+        '''
+        if len(self.history) < 2 :
+            return Damped_secant.correction(self)
+
+        # Equal weights when no uncertainty is known
+        w = [1.0 / e**2 if e > 0 else 1.0 for x, s, e in self.history]
+        sw = sum(w)
+        mx = sum(wi * x for wi, (x, s, e) in zip(w, self.history)) / sw
+        ms = sum(wi * s for wi, (x, s, e) in zip(w, self.history)) / sw
+        sxx = sum(wi * (x - mx)**2 for wi, (x, s, e) in zip(w, self.history))
+        sxs = sum(wi * (x - mx) * (s - ms) for wi, (x, s, e) in zip(w, self.history))
+
+        if sxx > 0 :
+            slope = sxs / sxx
+            if self.slope_range[0] <= slope <= self.slope_range[1] :
+                self.slope = slope
+                self.measured = True
+
+        # Root of the line: dtxs0 = mx - ms / slope
+        x_last = self.history[-1][0]
+        root = mx - ms / self.slope
+
+        damping = 1.0 if self.measured else self.damping
+        return damping * (x_last - root)
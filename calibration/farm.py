@@ -0,0 +1,689 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Calibration farm: a coordinator with a queue of DUT jobs and bench agents.
+
+The coordinator holds a queue of jobs, each one a DUT with the ports to
+calibrate, and dispatches them to the agents connected to it. An agent runs a
+bench (a main.batch bench file: switch, instrument, reference and the dut slot
+where the DUTs are connected) in a Calibration_session. Agents announce their
+capabilities (instrument, channels, switch and interfaces) and only get jobs
+whose requirements they match. A failed job (or a job whose agent is lost) is
+queued again, preferably for another agent, up to a number of retries, and a
+job that no connected agent matches fails after a timeout. The results of
+every job are collected by the coordinator. A DUT sent again is always
+measured again, its previous results in the agent are discarded.
+
+Coordinator and agents talk JSON lines over a Unix socket (a path) or TCP
+(host:port), so a farm can be tested on one machine with simulated benches.
+
+Usage (from the root folder of the package):
+
+    python3 -m calibration.farm coordinator [--jobs queue.json] [--results results.jsonl]
+    python3 -m calibration.farm agent bench.json [--name rig1]
+    python3 -m calibration.farm submit dut.json
+    python3 -m calibration.farm status
+
+A job is a dict like:
+
+    {"serial" : "LEN-0001", "name" : "wr_len", "ports" : [1, 2], "sfp" : "blue",
+     "error" : 10, "sampling" : {"n_samples" : 20},
+     "requires" : {"instrument" : "FCA3103", "channels" : 2, "switch" : true}}
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup calibration
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import argparse
+import datetime
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+# User defined modules
+from main.wrcexceptions import JobError
+from main import registry
+from main import metrics
+
+## Default address of the coordinator
+DEF_ADDRESS = "/tmp/wrcalibration-farm.sock"
+
+## Seconds an idle agent waits before asking again for a job
+POLL_DELAY = 2.0
+
+## Seconds a queued job waits for a connected agent matching its requirements
+MATCH_TIMEOUT = 300.0
+
+def parse_address(address) :
+    '''
+    Function to get the socket family and address of a farm address.
+
+    Args:
+        address (str) : A Unix socket path or host:port.
+
+    Returns:
+        A (family, address) tuple.
+    '''
+    if ":" in address and not address.startswith("/") :
+        host, port = address.rsplit(":", 1)
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address
+
+# ---------------------------------------------------------------------------- #
+
+def send(stream, msg) :
+    '''
+    Function to send a message (a JSON line).
+    '''
+    stream.write(str.encode(json.dumps(msg) + "\n"))
+    stream.flush()
+
+# ---------------------------------------------------------------------------- #
+
+def receive(stream) :
+    '''
+    Function to receive a message (a JSON line).
+
+    Raises:
+        ConnectionError if the other side closed the connection.
+    '''
+    line = stream.readline()
+    if not line :
+        raise ConnectionError("Connection closed.")
+    return json.loads(bytes.decode(line))
+
+# ---------------------------------------------------------------------------- #
+
+def matches(capabilities, requires) :
+    '''
+    Function to check if a bench can run a job.
+
+    Args:
+        capabilities (dict) : Capabilities of the bench: instrument (str), \
+        channels (int), switch (str or None) and interfaces (list).
+        requires (dict) : Requirements of the job: instrument, channels (the \
+        minimum), switch (True, False or a switch name) and interface.
+
+    Returns:
+        True if every requirement is met.
+    '''
+    for key, value in requires.items() :
+        have = capabilities.get(key)
+        if key == "channels" :
+            ok = have != None and have >= value
+        elif key == "switch" and isinstance(value, bool) :
+            ok = (have != None) == value
+        elif key == "interface" :
+            ok = value in capabilities.get("interfaces", [])
+        else :
+            ok = have == value
+        if not ok :
+            return False
+    return True
+
+# ---------------------------------------------------------------------------- #
+
+class Farm_coordinator() :
+    '''
+    Coordinator of a calibration farm.
+
+    It holds the job queue and serves the agents (one thread per connection).
+    Jobs can be added with add_job or by a client (submit). The state of every
+    job is: queued, running, done or failed. A job that no connected agent
+    matches for match_timeout seconds fails.
+    '''
+
+    def __init__(self, address=DEF_ADDRESS, retries=2, results=None, store=None, \
+    match_timeout=MATCH_TIMEOUT) :
+        '''
+        Constructor
+
+        Args:
+            address (str) : Unix socket path or host:port to listen on.
+            retries (int) : How many times a failed job is queued again.
+            results (str) : JSON lines file where the result of each job is appended.
+            store (Results_store) : Where the port delays are stored, if given.
+            match_timeout (float) : Time (in s) a queued job waits for a \
+            connected agent matching its requirements.
+        '''
+        self.address = address
+        self.retries = retries
+        self.match_timeout = match_timeout
+        self.results_path = results
+        self.store = store
+        ## Jobs by id
+        self.jobs = {}
+        ## Job ids in queue order
+        self.order = []
+        ## Connected agents: capabilities and running job, by name
+        self.agents = {}
+        ## Results of the finished jobs
+        self.results = []
+        ## When set, agents are asked to stop instead of getting jobs
+        self.draining = False
+        self.cond = threading.Condition()
+        self.server = None
+        self.thread = None
+
+    # ------------------------------------------------------------------------ #
+
+    def add_job(self, job) :
+        '''
+        Method to add a job to the queue.
+
+        Args:
+            job (dict) : The job, with at least the DUT serial.
+
+        Returns:
+            The job id.
+
+        Raises:
+            JobError if the job has no serial.
+        '''
+        if not isinstance(job, dict) or "serial" not in job :
+            raise JobError("A farm job needs the DUT serial.")
+
+        with self.cond :
+            jid = "%d-%s" % (len(self.jobs) + 1, job['serial'])
+            self.jobs[jid] = {'id' : jid, 'job' : job, 'state' : "queued", 'attempts' : 0, \
+            'tried' : [], 'agent' : None, 'errors' : [], 'matched' : time.monotonic()}
+            self.order.append(jid)
+            self.cond.notify_all()
+        return jid
+
+    # ------------------------------------------------------------------------ #
+
+    def _next_job(self, agent) :
+        '''
+        Method to take the next job for an agent (call it with cond held).
+        '''
+        caps = self.agents[agent]['capabilities']
+        for jid in self.order :
+            entry = self.jobs[jid]
+            requires = entry['job'].get("requires", {})
+            if entry['state'] != "queued" or not matches(caps, requires) :
+                continue
+            # A retried job goes to another capable agent, if there's one
+            if agent in entry['tried'] and any(a not in entry['tried'] and \
+            matches(self.agents[a]['capabilities'], requires) for a in self.agents) :
+                continue
+            entry['state'] = "running"
+            entry['agent'] = agent
+            entry['attempts'] += 1
+            entry['tried'].append(agent)
+            self.agents[agent]['job'] = jid
+            return entry
+        return None
+
+    # ------------------------------------------------------------------------ #
+
+    def _expire(self) :
+        '''
+        Method to fail the queued jobs that no connected agent has matched for
+        match_timeout seconds (call it with cond held).
+        '''
+        now = time.monotonic()
+        for jid in self.order :
+            entry = self.jobs[jid]
+            if entry['state'] != "queued" :
+                continue
+            requires = entry['job'].get("requires", {})
+            if any(matches(a['capabilities'], requires) for a in self.agents.values()) :
+                entry['matched'] = now
+            elif now - entry['matched'] >= self.match_timeout :
+                entry['errors'].append("no agent matches %s" % requires)
+                entry['state'] = "failed"
+                self._record(entry, None, None)
+
+    # ------------------------------------------------------------------------ #
+
+    def _finish(self, jid, agent, status, result, message) :
+        '''
+        Method to record the end of a job attempt (call it with cond held).
+        '''
+        entry = self.jobs[jid]
+        self.agents.get(agent, {})['job'] = None
+        if status != "ok" :
+            entry['errors'].append("%s: %s" % (agent, message))
+            if entry['attempts'] <= self.retries :
+                entry['state'] = "queued"
+                entry['agent'] = None
+                entry['matched'] = time.monotonic()
+                metrics.JOB_RETRIES.inc()
+                self.cond.notify_all()
+                return
+        entry['state'] = "done" if status == "ok" else "failed"
+        self._record(entry, agent, result)
+
+    # ------------------------------------------------------------------------ #
+
+    def _record(self, entry, agent, result) :
+        '''
+        Method to collect the result of a finished job (call it with cond held).
+        '''
+        record = {'id' : entry['id'], 'serial' : entry['job']['serial'], 'agent' : agent, \
+        'status' : entry['state'], 'attempts' : entry['attempts'], 'errors' : entry['errors'], \
+        'result' : result, 'date' : datetime.datetime.now().isoformat(timespec="seconds")}
+        self.results.append(record)
+        if self.results_path != None :
+            with open(self.results_path, 'a', encoding='utf-8') as out :
+                out.write(json.dumps(record) + "\n")
+        if self.store != None and entry['state'] == "done" :
+            for p in result['ports'].values() :
+                self.store.add_port_delay(entry['job']['serial'], p['port'], p['sfp'], p['dtxs'], \
+                p['drxs'], p.get("sfp_serial"), result.get("fiber_set"), u_dtxs=p.get("u_dtxs"), \
+                u_drxs=p.get("u_drxs"))
+        self.cond.notify_all()
+
+    # ------------------------------------------------------------------------ #
+
+    def _serve(self, rfile, wfile) :
+        '''
+        Method to serve a connection (an agent or a client).
+        '''
+        agent = None
+        try :
+            while True :
+                msg = receive(rfile)
+                op = msg.get("op")
+                with self.cond :
+                    if op == "hello" :
+                        if msg['agent'] in self.agents :
+                            send(wfile, {'op' : "error", 'message' : "Agent %s already connected." \
+                            % msg['agent']})
+                            return
+                        agent = msg['agent']
+                        self.agents[agent] = {'capabilities' : msg['capabilities'], 'job' : None}
+                        reply = {'op' : "welcome"}
+                    elif op == "get" and agent != None :
+                        self._expire()
+                        entry = None if self.draining else self._next_job(agent)
+                        if entry != None :
+                            reply = {'op' : "job", 'id' : entry['id'], 'job' : entry['job'], \
+                            'attempt' : entry['attempts']}
+                        elif self.draining :
+                            reply = {'op' : "stop"}
+                        else :
+                            reply = {'op' : "wait", 'delay' : POLL_DELAY}
+                    elif op == "result" and agent != None :
+                        self._finish(msg['id'], agent, msg['status'], msg.get("result"), \
+                        msg.get("message", ""))
+                        reply = {'op' : "ack"}
+                    elif op == "submit" :
+                        try :
+                            reply = {'op' : "queued", 'id' : self.add_job(msg.get("job"))}
+                        except JobError as e :
+                            reply = {'op' : "error", 'message' : str(e)}
+                    elif op == "status" :
+                        reply = {'op' : "status", 'status' : self.status()}
+                    else :
+                        reply = {'op' : "error", 'message' : "Unknown operation %s." % op}
+                send(wfile, reply)
+        except (ConnectionError, OSError, ValueError) :
+            pass
+        finally :
+            if agent != None :
+                with self.cond :
+                    jid = self.agents.pop(agent)['job']
+                    if jid != None :
+                        self._finish(jid, agent, "error", None, "agent lost")
+                    self.cond.notify_all()
+
+    # ------------------------------------------------------------------------ #
+
+    def status(self) :
+        '''
+        Method to get the state of the jobs and agents.
+
+        Returns:
+            A dict with jobs (id, serial, state, attempts and agent) and agents
+            (name, capabilities and running job).
+        '''
+        with self.cond :
+            return {
+                'jobs' : [{'id' : j['id'], 'serial' : j['job']['serial'], 'state' : j['state'], \
+                'attempts' : j['attempts'], 'agent' : j['agent']} for j in \
+                (self.jobs[jid] for jid in self.order)],
+                'agents' : [{'name' : a, 'capabilities' : v['capabilities'], 'job' : v['job']} \
+                for a, v in self.agents.items()]
+            }
+
+    # ------------------------------------------------------------------------ #
+
+    def start(self) :
+        '''
+        Method to start serving in a background thread.
+        '''
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler) :
+            def handle(self) :
+                coordinator._serve(self.rfile, self.wfile)
+
+        family, address = parse_address(self.address)
+        if family == socket.AF_UNIX :
+            if os.path.exists(address) :
+                os.unlink(address)
+            self.server = socketserver.ThreadingUnixStreamServer(address, Handler)
+        else :
+            socketserver.ThreadingTCPServer.allow_reuse_address = True
+            self.server = socketserver.ThreadingTCPServer(address, Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="farm-coordinator", \
+        daemon=True)
+        self.thread.start()
+
+    # ------------------------------------------------------------------------ #
+
+    def wait(self, timeout=None) :
+        '''
+        Method to wait until every job is done or failed.
+
+        Args:
+            timeout (float) : Maximum time to wait (in s), None to wait forever.
+
+        Returns:
+            True if every job finished.
+        '''
+        end = None if timeout == None else time.monotonic() + timeout
+        with self.cond :
+            while True :
+                self._expire()
+                if not any(j['state'] in ("queued", "running") for j in self.jobs.values()) :
+                    break
+                left = None if end == None else end - time.monotonic()
+                if left != None and left <= 0 :
+                    return False
+                self.cond.wait(left if left != None else 1.0)
+        return True
+
+    # ------------------------------------------------------------------------ #
+
+    def stop(self, grace=10.0) :
+        '''
+        Method to ask the agents to stop and close the server.
+
+        Args:
+            grace (float) : Time (in s) given to the agents to disconnect.
+        '''
+        end = time.monotonic() + grace
+        with self.cond :
+            self.draining = True
+            while len(self.agents) > 0 and time.monotonic() < end :
+                self.cond.wait(end - time.monotonic())
+        if self.server != None :
+            self.server.shutdown()
+            self.server.server_close()
+            family, address = parse_address(self.address)
+            if family == socket.AF_UNIX and os.path.exists(address) :
+                os.unlink(address)
+
+# ---------------------------------------------------------------------------- #
+
+def connect(address, timeout=30.0) :
+    '''
+    Function to connect to a coordinator, retrying until timeout (in s).
+
+    Returns:
+        A (socket, stream) tuple.
+    '''
+    family, addr = parse_address(address)
+    end = time.monotonic() + timeout
+    while True :
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try :
+            sock.connect(addr)
+            return sock, sock.makefile('rwb')
+        except OSError :
+            sock.close()
+            if time.monotonic() >= end :
+                raise
+            time.sleep(0.5)
+
+# ---------------------------------------------------------------------------- #
+
+class Farm_agent() :
+    '''
+    Agent of a calibration farm, it runs the jobs of a bench.
+
+    The bench is a main.batch bench file. Its reference tasks (fiber latency,
+    trigger level and asymmetry) run once when the agent starts, and each job
+    adds the port tasks of its DUT, connected to the dut slot of the bench.
+    '''
+
+    def __init__(self, address, bench, name=None, out=None) :
+        '''
+        Constructor
+
+        Args:
+            address (str) : Address of the coordinator.
+            bench (dict) : The bench (see main.batch.load_job with bench=True).
+            name (str) : Agent name, by default the bench name.
+            out (file) : Where the progress is shown.
+        '''
+        from main.batch import Batch_runner
+
+        self.address = address
+        self.bench = bench
+        self.name = name if name != None else bench['name']
+        self.runner = Batch_runner(bench, out=out, label="%s " % self.name)
+        self.base_tasks = list(self.runner.tasks)
+        self.log = None
+
+    # ------------------------------------------------------------------------ #
+
+    def capabilities(self) :
+        '''
+        Method to get the capabilities of the bench.
+
+        The channel count is read from the instrument plugin metadata, so the
+        instrument module is not imported.
+        '''
+        instr = self.bench['instrument'].get("name", "FCA3103")
+        try :
+            channels = registry.registry().get("meas_instr", instr).meta['channels']
+        except Exception :
+            channels = None
+        return {
+            'instrument' : instr,
+            'channels'   : channels,
+            'switch'     : self.bench['switch']['name'],
+            'interfaces' : [self.bench['dut'].get("interface", "usb")]
+        }
+
+    # ------------------------------------------------------------------------ #
+
+    def execute(self, job) :
+        '''
+        Method to calibrate the ports of a job DUT.
+
+        Returns:
+            A (status, result, message) tuple.
+        '''
+        dut = dict(self.bench['dut'])
+        for key in ("serial", "ports", "sfp", "error", "sampling") :
+            if key in job :
+                dut[key] = job[key]
+        if "name" in job :
+            dut['name'] = job['name']
+
+        self.runner.tasks = list(self.base_tasks)
+        names = self.runner.add_dut(dut)
+        # A DUT calibrated before (i.e. sent again to recalibrate it) is measured again
+        self.runner.forget(names)
+        self.runner.run(self.log)
+
+        failed = [n for n in self.runner.tasks if n[0] not in self.runner.results]
+        if len(failed) > 0 :
+            return "error", None, "; ".join("%s %s" % (n[0], self.runner.errors.get(n[0], \
+            "not run")) for n in failed)
+
+        sfp = dut.get("sfp", "blue")
+        cal = self.runner.session.calibration
+        ports = {}
+        for name, port in zip(names, dut.get("ports", [1])) :
+            key = "%s-wr%d" % (sfp, port)
+            dtxs, drxs = self.runner.results[name]
+            u_dtxs, u_drxs = cal.uncertainty['port-delay'].get(key, (None, None))
+            ports[key] = {'port' : port, 'sfp' : sfp, 'dtxs' : dtxs, 'drxs' : drxs, \
+            'u_dtxs' : u_dtxs, 'u_drxs' : u_drxs, 'sfp_serial' : cal.sfp_sn[sfp]}
+        return "ok", {'ports' : ports, 'fiber_set' : self.bench['fiber_set']}, ""
+
+    # ------------------------------------------------------------------------ #
+
+    def run(self, connect_timeout=30.0) :
+        '''
+        Method to serve jobs until the coordinator asks to stop.
+
+        Returns:
+            The number of jobs that failed in this agent.
+        '''
+        failed = 0
+        sock, stream = connect(self.address, connect_timeout)
+        with open(self.bench['log'], 'a', encoding='utf-8') as self.log :
+            try :
+                send(stream, {'op' : "hello", 'agent' : self.name, \
+                'capabilities' : self.capabilities()})
+                reply = receive(stream)
+                if reply['op'] != "welcome" :
+                    raise JobError(reply.get("message", "Rejected by the coordinator."))
+
+                # The reference runs before taking any job
+                self.runner.run(self.log)
+
+                while True :
+                    send(stream, {'op' : "get"})
+                    reply = receive(stream)
+                    if reply['op'] == "stop" :
+                        break
+                    if reply['op'] == "wait" :
+                        time.sleep(reply['delay'])
+                        continue
+
+                    status, result, message = self.execute(reply['job'])
+                    failed += status != "ok"
+                    send(stream, {'op' : "result", 'id' : reply['id'], 'status' : status, \
+                    'result' : result, 'message' : message})
+                    receive(stream)
+            finally :
+                stream.close()
+                sock.close()
+        return failed
+
+# ---------------------------------------------------------------------------- #
+
+def request(address, msg) :
+    '''
+    Function to send a request to a coordinator and get the reply.
+    '''
+    sock, stream = connect(address, 5.0)
+    try :
+        send(stream, msg)
+        return receive(stream)
+    finally :
+        stream.close()
+        sock.close()
+
+# ---------------------------------------------------------------------------- #
+
+def main(argv=None) :
+    parser = argparse.ArgumentParser(description="Calibration farm.")
+    parser.add_argument("--address", default=DEF_ADDRESS, help="Unix socket path or host:port.")
+    parser.add_argument("--metrics-port", type=int, \
+    help="Serve the metrics of the coordinator or agent on this local port.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("coordinator", help="Run the coordinator.")
+    p.add_argument("--jobs", help="JSON file with a list of jobs to queue.")
+    p.add_argument("--retries", type=int, default=2, help="Retries of a failed job.")
+    p.add_argument("--results", default="farm-results.jsonl", help="JSON lines results file.")
+    p.add_argument("--store", help="Results store for the port delays.")
+    p.add_argument("--match-timeout", type=float, default=MATCH_TIMEOUT, \
+    help="Seconds a job waits for a connected agent matching its requirements.")
+    p.add_argument("--exit-when-done", action="store_true", \
+    help="Stop the agents and exit when the queue is empty.")
+    p = sub.add_parser("agent", help="Run an agent for a bench.")
+    p.add_argument("bench", help="Bench file (main.batch job with a dut slot).")
+    p.add_argument("--name", help="Agent name, by default the bench name.")
+    p = sub.add_parser("submit", help="Queue the jobs of a JSON file (a job or a list).")
+    p.add_argument("jobs")
+    sub.add_parser("status", help="Show the state of the farm.")
+    args = parser.parse_args(argv)
+
+    if args.metrics_port != None and args.command in ("coordinator", "agent") :
+        metrics.start_server(args.metrics_port)
+
+    try :
+        if args.command == "coordinator" :
+            store = None
+            if args.store != None :
+                from calibration.results_store import Results_store
+                store = Results_store(args.store)
+            coordinator = Farm_coordinator(args.address, args.retries, args.results, store, \
+            args.match_timeout)
+            if args.jobs != None :
+                with open(args.jobs, 'r', encoding='utf-8') as f :
+                    for job in json.load(f) :
+                        coordinator.add_job(job)
+            coordinator.start()
+            print("Coordinator listening on %s" % args.address)
+            try :
+                while not (coordinator.wait(1.0) and args.exit_when_done) :
+                    pass
+            except KeyboardInterrupt :
+                pass
+            coordinator.stop()
+            failed = [r for r in coordinator.results if r['status'] != "done"]
+            print("%d jobs done, %d failed." % (len(coordinator.results) - len(failed), len(failed)))
+            return 1 if len(failed) > 0 else 0
+
+        if args.command == "agent" :
+            from main.batch import load_job
+            agent = Farm_agent(args.address, load_job(args.bench, bench=True), args.name)
+            return 1 if agent.run() > 0 else 0
+
+        if args.command == "submit" :
+            with open(args.jobs, 'r', encoding='utf-8') as f :
+                jobs = json.load(f)
+            for job in jobs if isinstance(jobs, list) else [jobs] :
+                reply = request(args.address, {'op' : "submit", 'job' : job})
+                print(reply.get("id", reply.get("message")))
+            return 0
+
+        status = request(args.address, {'op' : "status"})['status']
+        for a in status['agents'] :
+            print("agent %-12s %-30s job %s" % (a['name'], a['capabilities'], a['job']))
+        for j in status['jobs'] :
+            print("job   %-20s %-8s attempts %d agent %s" % (j['id'], j['state'], j['attempts'], j['agent']))
+        return 0
+
+    except (JobError, OSError, ValueError) as e :
+        print("farm ERROR: %s" % e, file=sys.stderr)
+        return 2
+
+if __name__ == "__main__" :
+    sys.exit(main())
@@ -0,0 +1,524 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+SQLite store for calibration results with indexed history.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup calibration
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import datetime
+import sqlite3
+
+class Results_store() :
+    '''
+    SQLite store for calibration results.
+
+    Fiber references (latency and asymmetry) are keyed by fiber set and SFP,
+    port delays by device serial, port and SFP. Every result has a date and a
+    valid flag, so old or wrong results are kept for drift analysis but are
+    not returned by the "latest" lookups.
+
+    The database uses WAL journaling and a connection per operation, so it
+    can be read from other threads or processes while a calibration is
+    writing to it. Values are stored as REAL, without rounding, with their
+    standard uncertainty (u_* columns, NULL when unknown).
+    '''
+
+    ## Date format, sortable as text
+    DATE_FMT = "%Y-%m-%d %H:%M:%S"
+
+    SCHEMA = [
+        '''CREATE TABLE IF NOT EXISTS fiber_latency (
+            id INTEGER PRIMARY KEY, date TEXT NOT NULL, fiber_set TEXT NOT NULL,
+            sfp_pair TEXT, delta1 REAL NOT NULL, delta2 REAL NOT NULL,
+            valid INTEGER NOT NULL DEFAULT 1, delay_ref REAL,
+            u_delta1 REAL, u_delta2 REAL)''',
+        '''CREATE TABLE IF NOT EXISTS fiber_asymmetry (
+            id INTEGER PRIMARY KEY, date TEXT NOT NULL, fiber_set TEXT NOT NULL,
+            port INTEGER NOT NULL, sfp TEXT NOT NULL, sfp_serial TEXT,
+            alpha_n REAL NOT NULL, valid INTEGER NOT NULL DEFAULT 1, u_alpha_n REAL)''',
+        '''CREATE TABLE IF NOT EXISTS port_delay (
+            id INTEGER PRIMARY KEY, date TEXT NOT NULL, device_serial TEXT NOT NULL,
+            port INTEGER NOT NULL, sfp TEXT NOT NULL, sfp_serial TEXT, fiber_set TEXT,
+            dtxs REAL NOT NULL, drxs REAL NOT NULL, valid INTEGER NOT NULL DEFAULT 1,
+            u_dtxs REAL, u_drxs REAL)''',
+        # Latest valid fiber reference for a fiber set
+        '''CREATE INDEX IF NOT EXISTS fiber_latency_ref
+            ON fiber_latency (fiber_set, valid, date)''',
+        '''CREATE INDEX IF NOT EXISTS fiber_asymmetry_ref
+            ON fiber_asymmetry (fiber_set, sfp, port, valid, date)''',
+        # Latest port delays and history of a device
+        '''CREATE INDEX IF NOT EXISTS port_delay_device
+            ON port_delay (device_serial, port, sfp, valid, date)''',
+        '''CREATE INDEX IF NOT EXISTS port_delay_history
+            ON port_delay (device_serial, date)''',
+    ]
+
+    ## Columns added after the first version of the schema, by table
+    ADDED_COLUMNS = {
+        'fiber_latency'   : ["delay_ref", "u_delta1", "u_delta2"],
+        'fiber_asymmetry' : ["u_alpha_n"],
+        'port_delay'      : ["u_dtxs", "u_drxs"],
+    }
+
+    def __init__(self, path) :
+        '''
+        Constructor
+
+        The database and its tables are created if they don't exist.
+
+        Args:
+            path (str) : Path to the SQLite database file.
+        '''
+        self.path = path
+        with self._connect() as db :
+            db.execute("PRAGMA journal_mode=WAL")
+            for sql in self.SCHEMA :
+                db.execute(sql)
+            # Databases created before these columns were added
+            for table, added in self.ADDED_COLUMNS.items() :
+                cols = [row['name'] for row in db.execute("PRAGMA table_info(%s)" % table)]
+                for col in added :
+                    if col not in cols :
+                        db.execute("ALTER TABLE %s ADD COLUMN %s REAL" % (table, col))
+
+    # ------------------------------------------------------------------------ #
+
+    def _connect(self) :
+        '''
+        Method to open a connection to the database.
+
+        Used as context manager, it commits on success and rolls back on error.
+        '''
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        return _Connection(db)
+
+    # ------------------------------------------------------------------------ #
+
+    def _now(self, date=None) :
+        '''
+        Method to format a date, now if date is None.
+        '''
+        if date == None :
+            date = datetime.datetime.now()
+        return date.strftime(self.DATE_FMT)
+
+    # ------------------------------------------------------------------------ #
+
+    def add_fiber_latency(self, delta1, delta2, fiber_set="default", sfp_pair=None, date=None, \
+    delay_ref=None, u_delta1=None, u_delta2=None) :
+        '''
+        Method to store a fiber latency measurement.
+
+        Args:
+            delta1 (float) : Latency of fiber f1 (in ps).
+            delta2 (float) : Latency of fiber f2 (in ps).
+            fiber_set (str) : Identifier of the fibers used (i.e. "f1:A12,f2:B3").
+            sfp_pair (str) : Serial numbers of the SFPs used.
+            date (datetime) : Date of the measurement, now by default.
+            delay_ref (float) : Delay measured with f1+f2 (in ps), used to \
+            verify that the fibers didn't change.
+            u_delta1 (float) : Standard uncertainty of delta1 (in ps).
+            u_delta2 (float) : Standard uncertainty of delta2 (in ps).
+
+        Returns:
+            The id of the new record.
+        '''
+        with self._connect() as db :
+            cur = db.execute("INSERT INTO fiber_latency (date, fiber_set, sfp_pair, delta1, delta2, "\
+            "delay_ref, u_delta1, u_delta2) VALUES (?,?,?,?,?,?,?,?)", (self._now(date), fiber_set, \
+            sfp_pair, delta1, delta2, delay_ref, u_delta1, u_delta2))
+            return cur.lastrowid
+
+    # ------------------------------------------------------------------------ #
+
+    def add_fiber_asymmetry(self, alpha_n, port, sfp, fiber_set="default", sfp_serial=None, date=None, \
+    u_alpha_n=None) :
+        '''
+        Method to store a fiber asymmetry measurement.
+
+        Args:
+            alpha_n (float) : Fiber asymmetry value.
+            port (int) : Port used.
+            sfp (str) : SFP used in the slave ("blue" or "violet").
+            fiber_set (str) : Identifier of the fibers used.
+            sfp_serial (str) : Serial number of the SFP.
+            date (datetime) : Date of the measurement, now by default.
+            u_alpha_n (float) : Standard uncertainty of alpha_n.
+
+        Returns:
+            The id of the new record.
+        '''
+        with self._connect() as db :
+            cur = db.execute("INSERT INTO fiber_asymmetry (date, fiber_set, port, sfp, sfp_serial, alpha_n, "\
+            "u_alpha_n) VALUES (?,?,?,?,?,?,?)", (self._now(date), fiber_set, port, sfp, sfp_serial, \
+            alpha_n, u_alpha_n))
+            return cur.lastrowid
+
+    # ------------------------------------------------------------------------ #
+
+    def add_port_delay(self, device_serial, port, sfp, dtxs, drxs, sfp_serial=None, \
+    fiber_set=None, date=None, u_dtxs=None, u_drxs=None) :
+        '''
+        Method to store the delays of a calibrated port.
+
+        Args:
+            device_serial (str) : Serial number (or any unique name) of the device.
+            port (int) : Calibrated port.
+            sfp (str) : SFP used ("blue" or "violet").
+            dtxs (float) : Tx delay (in ps).
+            drxs (float) : Rx delay (in ps).
+            sfp_serial (str) : Serial number of the SFP.
+            fiber_set (str) : Identifier of the fiber reference used.
+            date (datetime) : Date of the calibration, now by default.
+            u_dtxs (float) : Standard uncertainty of dtxs (in ps).
+            u_drxs (float) : Standard uncertainty of drxs (in ps).
+
+        Returns:
+            The id of the new record.
+        '''
+        with self._connect() as db :
+            cur = db.execute("INSERT INTO port_delay (date, device_serial, port, sfp, sfp_serial, "\
+            "fiber_set, dtxs, drxs, u_dtxs, u_drxs) VALUES (?,?,?,?,?,?,?,?,?,?)", (self._now(date), \
+            device_serial, port, sfp, sfp_serial, fiber_set, dtxs, drxs, u_dtxs, u_drxs))
+            return cur.lastrowid
+
+    # ------------------------------------------------------------------------ #
+
+    def invalidate(self, table, record_id) :
+        '''
+        Method to mark a result as not valid.
+
+        Args:
+            table (str) : "fiber_latency", "fiber_asymmetry" or "port_delay".
+            record_id (int) : Id of the record.
+
+        Raises:
+            ValueError if table is not valid.
+        '''
+        if table not in ("fiber_latency", "fiber_asymmetry", "port_delay") :
+            raise ValueError("Results_store ERROR: Unknown table %s." % table)
+        with self._connect() as db :
+            db.execute("UPDATE %s SET valid = 0 WHERE id = ?" % table, (record_id,))
+
+    # ------------------------------------------------------------------------ #
+
+    def latest_fiber_reference(self, fiber_set="default", sfp_pair=None, since=None) :
+        '''
+        Method to get the latest valid fiber reference.
+
+        Args:
+            fiber_set (str) : Identifier of the fibers.
+            sfp_pair (str) : Only results measured with this SFP pair: the \
+            latencies with the pair ("blue/violet" serial numbers) and the \
+            asymmetries with the SFP of the pair of their color.
+            since (datetime) : Only results measured after this date.
+
+        Returns:
+            A dict with keys: id, date, sfp_pair, delta1, delta2, delay_ref,
+            asymmetry (a dict with the latest alpha_n by "sfp-wrN" key, only
+            those measured after the latency) and uncertainty (the standard
+            uncertainty of the known values, with the keys of a
+            WR_calibration.uncertainty dict). None if there is no valid
+            latency for the fiber set.
+        '''
+        since = self._now(since) if since != None else ""
+        sql = "SELECT * FROM fiber_latency WHERE fiber_set = ? AND valid = 1 AND date >= ?"
+        args = [fiber_set, since]
+        if sfp_pair != None :
+            sql += " AND sfp_pair = ?"
+            args.append(sfp_pair)
+
+        with self._connect() as db :
+            lat = db.execute(sql + " ORDER BY date DESC, id DESC LIMIT 1", args).fetchone()
+            if lat == None :
+                return None
+
+            # Asymmetries are computed with delta2, older ones are not valid
+            asym = {}
+            unc = {'fiber-latency' : {}, 'fiber-asymmetry' : {}}
+            for name in ("delta1", "delta2") :
+                if lat["u_" + name] != None :
+                    unc['fiber-latency'][name] = lat["u_" + name]
+            rows = db.execute("SELECT sfp, port, sfp_serial, alpha_n, u_alpha_n, date FROM fiber_asymmetry "\
+            "WHERE fiber_set = ? AND valid = 1 AND date >= ? ORDER BY date, id", \
+            (fiber_set, max(since, lat['date'])))
+            serials = None if sfp_pair == None else dict(zip(("blue", "violet"), sfp_pair.split("/")))
+            for row in rows :
+                if serials != None and row['sfp_serial'] != serials.get(row['sfp']) :
+                    continue
+                # Later rows overwrite the older ones
+                key = "%s-wr%d" % (row['sfp'], row['port'])
+                asym[key] = row['alpha_n']
+                unc['fiber-asymmetry'].pop(key, None)
+                if row['u_alpha_n'] != None :
+                    unc['fiber-asymmetry'][key] = row['u_alpha_n']
+
+        return {'id' : lat['id'], 'date' : lat['date'], 'sfp_pair' : lat['sfp_pair'], \
+        'delta1' : lat['delta1'], 'delta2' : lat['delta2'], 'delay_ref' : lat['delay_ref'], \
+        'asymmetry' : asym, 'uncertainty' : unc}
+
+    # ------------------------------------------------------------------------ #
+
+    def latest_port_delays(self, device_serial, uncertainty=None) :
+        '''
+        Method to get the latest valid delays of every port of a device.
+
+        Args:
+            device_serial (str) : Serial number of the device.
+            uncertainty (dict) : If given, the (u_dtxs, u_drxs) standard \
+            uncertainties of the delays are added to it with the same keys \
+            (only the known ones).
+
+        Returns:
+            A dict with "sfp-wrN" keys and (dtxs, drxs) values.
+        '''
+        delays = {}
+        unc = {}
+        with self._connect() as db :
+            rows = db.execute("SELECT sfp, port, dtxs, drxs, u_dtxs, u_drxs FROM port_delay "\
+            "WHERE device_serial = ? AND valid = 1 ORDER BY date, id", (device_serial,))
+            for row in rows :
+                key = "%s-wr%d" % (row['sfp'], row['port'])
+                delays[key] = (row['dtxs'], row['drxs'])
+                unc.pop(key, None)
+                if row['u_dtxs'] != None and row['u_drxs'] != None :
+                    unc[key] = (row['u_dtxs'], row['u_drxs'])
+
+        if uncertainty != None :
+            uncertainty.update(unc)
+        return delays
+
+    # ------------------------------------------------------------------------ #
+
+    def history(self, device_serial, port=None, sfp=None) :
+        '''
+        Method to get every calibration of a device, for drift analysis.
+
+        Args:
+            device_serial (str) : Serial number of the device.
+            port (int) : Only this port, all by default.
+            sfp (str) : Only this SFP, all by default.
+
+        Returns:
+            A list of dicts (one per calibration) ordered by date.
+        '''
+        sql = "SELECT * FROM port_delay WHERE device_serial = ?"
+        args = [device_serial]
+        if port != None :
+            sql += " AND port = ?"
+            args.append(port)
+        if sfp != None :
+            sql += " AND sfp = ?"
+            args.append(sfp)
+        sql += " ORDER BY date, id"
+
+        with self._connect() as db :
+            return [dict(row) for row in db.execute(sql, args)]
+
+    # ------------------------------------------------------------------------ #
+
+    def import_legacy(self, cfg_file, device_serial=None, fiber_set="default") :
+        '''
+        Method to import a configuration file written by WR_calibration.write_config.
+
+        The date is taken from the file header. Port delays are only imported
+        if device_serial is given. The uncertainties (u-* sections) are
+        imported if the file has them.
+
+        Args:
+            cfg_file (str) : Path to the configuration file.
+            device_serial (str) : Serial number of the device of the port delays.
+            fiber_set (str) : Identifier of the fibers used.
+        '''
+        cfg = {'fiber-latency' : {}, 'fiber-asymmetry' : {}, 'port-delay' : {}}
+        unc = {'fiber-latency' : {}, 'fiber-asymmetry' : {}, 'port-delay' : {}}
+        date = None
+        section = None
+        with open(cfg_file, 'r', encoding='utf-8') as f :
+            for line in f :
+                line = line.strip()
+                if line.startswith('#') :
+                    try :
+                        date = datetime.datetime.strptime(line[1:], "%H:%M %y%m%d")
+                    except ValueError :
+                        pass
+                    continue
+                if line.startswith('@') :
+                    section = line[1:]
+                    continue
+                if section in cfg :
+                    values = cfg[section]
+                elif section != None and section[2:] in unc :
+                    values = unc[section[2:]]
+                else :
+                    continue
+                for item in line.split() :
+                    k, v = item.split(":", 1)
+                    if section.endswith('port-delay') :
+                        values[k] = tuple(float(i) for i in v.split(","))
+                    else :
+                        values[k] = float(v)
+
+        self.store_config(cfg, device_serial, fiber_set, date, uncertainty=unc)
+
+    # ------------------------------------------------------------------------ #
+
+    def export_legacy(self, out_file, device_serial=None, fiber_set="default") :
+        '''
+        Method to export the latest results in the write_config file format.
+
+        Args:
+            out_file (str) : The name for the output file.
+            device_serial (str) : Serial number of the device of the port delays.
+            fiber_set (str) : Identifier of the fibers used.
+        '''
+        unc = {}
+        cfg = self.load_config(device_serial, fiber_set, uncertainty=unc)
+        with open(out_file, 'w', encoding='utf-8') as out :
+            out.write(datetime.datetime.now().strftime("#%H:%M %y%m%d\n"))
+            out.write("@fiber-latency\n")
+            out.write("delta1:%.1f delta2:%.1f\n" % \
+            (cfg['fiber-latency']['delta1'],cfg['fiber-latency']['delta2']))
+            out.write("@fiber-asymmetry\n")
+            for key in cfg['fiber-asymmetry'] :
+                out.write("%s:%d " % (key,cfg['fiber-asymmetry'][key]))
+            out.write("\n")
+            out.write("@port-delay\n")
+            for key in cfg['port-delay'] :
+                out.write("%s:%d,%d " % (key,cfg['port-delay'][key][0],cfg['port-delay'][key][1]))
+            out.write('\n')
+            out.write("@u-fiber-latency\n")
+            out.write(" ".join("%s:%.2f" % (k, v) for k, v in unc['fiber-latency'].items()) + "\n")
+            out.write("@u-fiber-asymmetry\n")
+            out.write(" ".join("%s:%.1f" % (k, v) for k, v in unc['fiber-asymmetry'].items()) + "\n")
+            out.write("@u-port-delay\n")
+            out.write(" ".join("%s:%.2f,%.2f" % (k, v[0], v[1]) for k, v in unc['port-delay'].items()) + "\n")
+
+    # ------------------------------------------------------------------------ #
+
+    def store_config(self, cfg_dict, device_serial=None, fiber_set="default", date=None, \
+    sfp_sn=None, fiber_reference=True, uncertainty=None) :
+        '''
+        Method to store the cfg_dict of a WR_calibration.
+
+        Port delays are only stored if device_serial is given.
+
+        Args:
+            cfg_dict (dict) : Configuration with fiber-latency, fiber-asymmetry \
+            and port-delay keys.
+            device_serial (str) : Serial number of the device of the port delays.
+            fiber_set (str) : Identifier of the fibers used.
+            date (datetime) : Date of the results, now by default.
+            sfp_sn (dict) : Serial numbers of the SFPs used by color ("blue" \
+            and "violet"), unknown by default.
+            fiber_reference (bool) : If False, the fiber latency and asymmetry \
+            values are not stored (i.e. they were taken from this store).
+            uncertainty (dict) : Standard uncertainty of the values, with the \
+            keys of cfg_dict (see WR_calibration.uncertainty). Unknown by default.
+        '''
+        sfp_sn = {} if sfp_sn == None else sfp_sn
+        unc = {} if uncertainty == None else uncertainty
+        u_lat = unc.get('fiber-latency', {})
+        u_asym = unc.get('fiber-asymmetry', {})
+        u_port = unc.get('port-delay', {})
+        sfp_pair = None
+        if "blue" in sfp_sn and "violet" in sfp_sn :
+            sfp_pair = "%s/%s" % (sfp_sn["blue"], sfp_sn["violet"])
+
+        lat = cfg_dict.get('fiber-latency', {})
+        if fiber_reference and lat.get('delta1', 0) != 0 :
+            self.add_fiber_latency(lat['delta1'], lat['delta2'], fiber_set, sfp_pair, date=date, \
+            u_delta1=u_lat.get('delta1'), u_delta2=u_lat.get('delta2'))
+
+        asymmetry = cfg_dict.get('fiber-asymmetry', {}) if fiber_reference else {}
+        for key, alpha_n in asymmetry.items() :
+            sfp, port = key.split("-wr")
+            self.add_fiber_asymmetry(alpha_n, int(port), sfp, fiber_set, sfp_sn.get(sfp), date=date, \
+            u_alpha_n=u_asym.get(key))
+
+        if device_serial != None :
+            for key, delays in cfg_dict.get('port-delay', {}).items() :
+                sfp, port = key.split("-wr")
+                u_delays = u_port.get(key, (None, None))
+                self.add_port_delay(device_serial, int(port), sfp, delays[0], delays[1], \
+                sfp_sn.get(sfp), fiber_set=fiber_set, date=date, u_dtxs=u_delays[0], \
+                u_drxs=u_delays[1])
+
+    # ------------------------------------------------------------------------ #
+
+    def load_config(self, device_serial=None, fiber_set="default", sfp_pair=None, uncertainty=None) :
+        '''
+        Method to build a WR_calibration cfg_dict with the latest valid results.
+
+        Args:
+            device_serial (str) : Serial number of the device of the port delays.
+            fiber_set (str) : Identifier of the fibers used.
+            sfp_pair (str) : Only fiber references measured with this SFP pair \
+            (see latest_fiber_reference), any by default.
+            uncertainty (dict) : If given, it's filled with the standard \
+            uncertainty of the known values, with the keys of the result.
+
+        Returns:
+            A dict with fiber-latency, fiber-asymmetry and port-delay keys.
+        '''
+        cfg = {'fiber-latency' : {'delta1' : 0, 'delta2' : 0}, 'fiber-asymmetry' : {}, 'port-delay' : {}}
+        unc = {'fiber-latency' : {}, 'fiber-asymmetry' : {}, 'port-delay' : {}}
+        ref = self.latest_fiber_reference(fiber_set, sfp_pair)
+        if ref != None :
+            cfg['fiber-latency']['delta1'] = ref['delta1']
+            cfg['fiber-latency']['delta2'] = ref['delta2']
+            cfg['fiber-asymmetry'] = ref['asymmetry']
+            unc.update(ref['uncertainty'])
+        if device_serial != None :
+            cfg['port-delay'] = self.latest_port_delays(device_serial, unc['port-delay'])
+
+        if uncertainty != None :
+            uncertainty.update(unc)
+        return cfg
+
+# ---------------------------------------------------------------------------- #
+
+class _Connection() :
+    '''
+    Context manager that commits or rolls back and always closes a connection.
+    '''
+
+    def __init__(self, db) :
+        self.db = db
+
+    def __enter__(self) :
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb) :
+        try :
+            if exc_type == None :
+                self.db.commit()
+            else :
+                self.db.rollback()
+        finally :
+            self.db.close()
+        return False
@@ -0,0 +1,247 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Scheduler for port calibrations of several WR devices in parallel.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup calibration
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import copy
+import concurrent.futures
+
+# User defined modules
+from calibration.wrcalibration import *
+from main                      import clock
+
+class Port_scheduler() :
+    '''
+    Scheduler for port calibrations of several WR devices in parallel.
+
+    Each port calibration (calibrate_device_port) needs a measurement channel
+    (an instrument with its master and slave inputs) and a calibrator link (the
+    fiber switch that connects the WR calibrator to the device). Channels and
+    links are wired to a device, so every device under test (DUT) must be
+    mapped to the channel that gets its PPS and to the link of its fibers, and
+    a channel or link can't be mapped to several DUTs. The DUTs are calibrated
+    in parallel, each one with its own WR_calibration session, and the ports
+    of a DUT one after the other because a WR device can only have one port in
+    slave mode.
+
+    The fiber latency and asymmetry values must be known in advance, they are
+    copied from a reference configuration to every session.
+    '''
+
+    def __init__(self, reference, channels, links) :
+        '''
+        Constructor
+
+        Args:
+            reference (dict) : cfg_dict of a WR_calibration with valid fiber \
+            latency and asymmetry values.
+            channels (list) : Measurement channels, each one a list [name, params] \
+            for add_meas_instr (params is [port,master_chan,slave_chan]).
+            links (list) : Calibrator links, each one a list [name, params] for \
+            add_fiber_switch or None for an operator.
+
+        Raises:
+            ValueError if no channels or links are given.
+        '''
+        if len(channels) == 0 or len(links) == 0 :
+            raise ValueError("Port_scheduler ERROR: At least one channel and one link are needed.")
+
+        self.reference = reference
+        self.channels = channels
+        self.links = links
+        self.jobs = {}
+        ## (channel, link) indexes of each DUT, by job key
+        self.wiring = {}
+        self.results = []
+        self.show_dbg = False
+
+    # ------------------------------------------------------------------------ #
+
+    def add_job(self, dut, device_params, channel=None, link=None, port=1, sfp="blue", \
+    error=10, **kwargs) :
+        '''
+        Method to add a port calibration.
+
+        Args:
+            dut (str) : Name of the WR device module in wr_devices (i.e. "wr_len").
+            device_params (list) : Parameters for add_wr_device: [interface,port].
+            channel (int) : Index in channels of the one wired to the DUT PPS.
+            link (int) : Index in links of the one wired to the DUT ports.
+            port (int) : The port to calibrate.
+            sfp (str) : The sfp used in the DUT.
+            error (float) : The minimal time difference accepted (in ps).
+            kwargs : Other arguments for calibrate_device_port (n_samples, \
+            t_samples, target, budget).
+
+        Raises:
+            ValueError if the channel or the link are not given or valid, or if \
+            they don't match the wiring of the DUT in other jobs.
+        '''
+        key = (dut, tuple(device_params))
+
+        if channel == None or link == None :
+            raise ValueError("Port_scheduler ERROR: The channel and the link wired to %s%s are needed." % \
+            (dut, list(device_params)))
+        if not (0 <= channel < len(self.channels) and 0 <= link < len(self.links)) :
+            raise ValueError("Port_scheduler ERROR: Channel %d or link %d doesn't exist." % (channel, link))
+        if self.wiring.get(key, (channel, link)) != (channel, link) :
+            raise ValueError("Port_scheduler ERROR: %s%s is wired to channel %d and link %d." % \
+            ((dut, list(device_params)) + self.wiring[key]))
+        for other, (chan, lnk) in self.wiring.items() :
+            if other != key and (chan == channel or lnk == link) :
+                raise ValueError("Port_scheduler ERROR: Channel %d or link %d is wired to %s%s." % \
+                (channel, link, other[0], list(other[1])))
+
+        self.wiring[key] = (channel, link)
+        self.jobs.setdefault(key, []).append({'port' : port, 'sfp' : sfp, \
+        'error' : error, 'kwargs' : kwargs})
+
+    # ------------------------------------------------------------------------ #
+
+    def _session(self, name, device_params) :
+        '''
+        Method to open a calibration session for a DUT.
+        '''
+        session = WR_calibration()
+        session.cfg_dict = copy.deepcopy(self.reference)
+        session.cfg_dict['port-delay'] = {}
+        session.add_wr_device(name, device_params)
+        if self.show_dbg :
+            session.enable_dbg()
+
+        return session
+
+    # ------------------------------------------------------------------------ #
+
+    def _run_dut(self, key, job_list, instr, switch) :
+        '''
+        Method to calibrate all the ports of a DUT.
+
+        Args:
+            key (tuple) : The job key of the DUT.
+            job_list (list) : Port calibrations of the DUT.
+            instr (Calibration_instrument) : The channel wired to the DUT.
+            switch (Fiber_switch) : The link wired to the DUT.
+        '''
+        name, device_params = key
+        rows = []
+        try :
+            session = self._session(name, list(device_params))
+        except Exception as e :
+            for job in job_list :
+                rows.append(self._row(key, job, None, "error", str(e), 0))
+            return rows
+
+        session.instr = instr
+        session.switch = switch
+        for job in job_list :
+            start = clock.monotonic()
+            try :
+                session.calibrate_device_port(job['error'], port=job['port'], \
+                sfp=job['sfp'], **job['kwargs'])
+                delays = session.cfg_dict['port-delay']["%s-wr%d" % (job['sfp'],job['port'])]
+                rows.append(self._row(key, job, delays, "ok", "", clock.monotonic()-start))
+            except Exception as e :
+                rows.append(self._row(key, job, None, "error", str(e), clock.monotonic()-start))
+
+        session.remove_wr_devices()
+
+        return rows
+
+    # ------------------------------------------------------------------------ #
+
+    def _row(self, key, job, delays, status, msg, elapsed) :
+        '''
+        Method to build a row of the result table.
+        '''
+        return {
+            'dut'     : "%s%s" % (key[0], list(key[1])),
+            'port'    : job['port'],
+            'sfp'     : job['sfp'],
+            'dtxs'    : delays[0] if delays != None else None,
+            'drxs'    : delays[1] if delays != None else None,
+            'status'  : status,
+            'message' : msg,
+            'elapsed' : elapsed
+        }
+
+    # ------------------------------------------------------------------------ #
+
+    def run(self) :
+        '''
+        Method to run all the port calibrations.
+
+        Returns:
+            The result table: a list of dicts with keys dut, port, sfp, dtxs,
+            drxs, status ("ok" or "error"), message and elapsed (s).
+        '''
+        # Open every channel and link once
+        channels = []
+        links = []
+        loader = WR_calibration()
+        try :
+            for name, params in self.channels :
+                loader.add_meas_instr(name, params)
+                channels.append(loader.instr)
+            for link in self.links :
+                if link == None :
+                    loader.switch = None
+                    loader._get_switch()
+                else :
+                    loader.add_fiber_switch(link[0], link[1])
+                links.append(loader.switch)
+
+            self.results = []
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(self.jobs))) as executor :
+                futures = [executor.submit(self._run_dut, key, job_list, \
+                channels[self.wiring[key][0]], links[self.wiring[key][1]]) \
+                for key, job_list in self.jobs.items()]
+                for future in futures :
+                    self.results.extend(future.result())
+
+        finally :
+            for res in channels + links :
+                res.close()
+
+        return self.results
+
+    # ------------------------------------------------------------------------ #
+
+    def show_results(self) :
+        '''
+        Method to print the result table.
+        '''
+        print("%-30s %4s %-6s %12s %12s %-6s %8s" % \
+        ("DUT", "Port", "SFP", "dTx", "dRx", "Status", "Time(s)"))
+        for row in self.results :
+            if row['status'] == "ok" :
+                print("%-30s %4d %-6s %12.1f %12.1f %-6s %8.0f" % (row['dut'], row['port'], \
+                row['sfp'], row['dtxs'], row['drxs'], row['status'], row['elapsed']))
+            else :
+                print("%-30s %4d %-6s %12s %12s %-6s %8.0f %s" % (row['dut'], row['port'], \
+                row['sfp'], "-", "-", row['status'], row['elapsed'], row['message']))
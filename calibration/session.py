@@ -0,0 +1,190 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Calibration sessions, to run several rigs in the same process.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup calibration
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import concurrent.futures
+import contextlib
+import sys
+import threading
+
+# User defined modules
+from calibration.wrcalibration import *
+
+class Session_output() :
+    '''
+    Replacement of sys.stdout that writes to the output of the session running
+    in the current thread.
+
+    The procedures print their progress, and contextlib.redirect_stdout is not
+    usable with several sessions in parallel (it replaces sys.stdout for every
+    thread). Threads not running a session write to the original stdout.
+    '''
+
+    def __init__(self, default) :
+        '''
+        Constructor
+
+        Args:
+            default (file) : Output of the threads not running a session.
+        '''
+        self.default = default
+        self.local = threading.local()
+
+    # ------------------------------------------------------------------------ #
+
+    def current(self) :
+        '''
+        Method to get the output of the current thread.
+        '''
+        return getattr(self.local, "out", None) or self.default
+
+    # ------------------------------------------------------------------------ #
+
+    @contextlib.contextmanager
+    def redirect(self, out) :
+        '''
+        Context manager to write the output of the current thread to out.
+        '''
+        prev = getattr(self.local, "out", None)
+        self.local.out = out
+        try :
+            yield out
+        finally :
+            self.local.out = prev
+
+    # ------------------------------------------------------------------------ #
+
+    def write(self, text) :
+        return self.current().write(text)
+
+    # ------------------------------------------------------------------------ #
+
+    def flush(self) :
+        self.current().flush()
+
+    # ------------------------------------------------------------------------ #
+
+    def __getattr__(self, attr) :
+        return getattr(self.current(), attr)
+
+# ---------------------------------------------------------------------------- #
+
+_output_lock = threading.Lock()
+
+def session_output() :
+    '''
+    Function to install (once) and get the Session_output of the process.
+    '''
+    with _output_lock :
+        if not isinstance(sys.stdout, Session_output) :
+            sys.stdout = Session_output(sys.stdout)
+        return sys.stdout
+
+# ---------------------------------------------------------------------------- #
+
+class Calibration_session() :
+    '''
+    A calibration session: one rig, with its own WR_calibration (devices,
+    instrument, switch and results), a worker thread and an output.
+
+    The work of a session runs in its worker thread, one task after the other
+    (a rig can only run a procedure at a time), while the sessions of other
+    rigs run in parallel. The output of the procedures of a session goes to
+    its own file.
+
+    Example:
+        rig1 = Calibration_session("rig1", open("rig1.log", "w"))
+        rig1.submit(lambda cal : cal.add_wr_device("wr_len", [WR_interfaces.usb, 0]))
+        ...
+        future = rig1.submit(lambda cal : cal.fiber_latency())
+        future.result()
+    '''
+
+    def __init__(self, name, out=None) :
+        '''
+        Constructor
+
+        Args:
+            name (str) : Name of the session (i.e. the rig name).
+            out (file) : Output of the procedures, by default the output of \
+            the process.
+        '''
+        self.name = name
+        self.out = out
+        self.calibration = WR_calibration()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, \
+        thread_name_prefix="session-%s" % name)
+
+    # ------------------------------------------------------------------------ #
+
+    def redirect(self) :
+        '''
+        Method to route the output of the current thread to the session output.
+
+        Returns:
+            A context manager.
+        '''
+        if self.out == None :
+            return contextlib.nullcontext()
+        return session_output().redirect(self.out)
+
+    # ------------------------------------------------------------------------ #
+
+    def run(self, func, *args, **kwargs) :
+        '''
+        Method to run a task in the current thread with the session output.
+
+        Args:
+            func (callable) : Called as func(calibration, *args, **kwargs).
+
+        Returns:
+            The result of func.
+        '''
+        with self.redirect() :
+            return func(self.calibration, *args, **kwargs)
+
+    # ------------------------------------------------------------------------ #
+
+    def submit(self, func, *args, **kwargs) :
+        '''
+        Method to queue a task in the session worker (see run).
+
+        Returns:
+            A concurrent.futures.Future with the result of func.
+        '''
+        return self.executor.submit(self.run, func, *args, **kwargs)
+
+    # ------------------------------------------------------------------------ #
+
+    def close(self) :
+        '''
+        Method to wait for the queued tasks and release the WR devices.
+        '''
+        self.submit(lambda cal : cal.remove_wr_devices()).result()
+        self.executor.shutdown(wait=True)
@@ -29,12 +29,19 @@ Main class for WR Calibration procedure.
 #                                   Import                                    --
 #-------------------------------------------------------------------------------
 # Import system modules
-import importlib
-import time
 import datetime
+import concurrent.futures
 
 # User defined modules
-from main.wrcexceptions import *
+from main.wrcexceptions      import *
+from analysis.online_stats   import *
+from analysis.sampling       import *
+from calibration.checkpoint  import *
+from calibration.convergence import *
+from main                    import clock
+from main                    import tracing
+from main                    import registry
+from main                    import metrics
 
 
 
@@ -44,24 +51,99 @@ class WR_calibration() :
 
 
     '''
-    ## Dictionary to store calibration parameters
-    cfg_dict = {}
-
-    ## List to handle connected WR devices
-    devices = []
-
-    ## Measurement instrument
-    instr = None
-
-    ## Debug output, not handle it directly! Use the methods.
-    show_dbg = False
-
-    fibers = ["f1","f2","f1+f2"]
+    ## Default serial numbers of the SFPs by color
+    DEF_SFP_SN = {"blue" : "AXGE-1254-0531", "violet" : "AXGE-3454-0531"}
+    ## Default fibers of the reference measurements
+    DEF_FIBERS = ("f1","f2","f1+f2")
+
+    ## Accepted samples needed before checking the target uncertainty
+    adaptive_min_samples = 5
+    ## Upper limit of values read in a single adaptive acquisition
+    adaptive_max_samples = 200
+    ## Resolution (in ps) of the values in adaptive acquisitions, 0 if unknown
+    adaptive_resolution = 0
+    ## Largest skew (in ps) expected between the PPS signals when measuring fiber asymmetry
+    max_asymmetry_skew = 1e6
 
     def __init__(self):
         '''
         Constructor
+
+        All the state is kept in the instance, so several sessions (i.e. one
+        for each rig, see calibration.session) can run in the same process.
         '''
+        ## Dictionary to store calibration parameters
+        self.cfg_dict = {}
+        ## List to handle connected WR devices
+        self.devices = []
+        ## Measurement instrument
+        self.instr = None
+        ## Fiber switch, an operator is asked for each change when it's not set
+        self.switch = None
+        ## Fibers of the reference measurements
+        self.fibers = list(self.DEF_FIBERS)
+        ## Serial numbers of the SFPs by color
+        self.sfp_sn = dict(self.DEF_SFP_SN)
+
+        ## Checkpoint of the procedures, not handle it directly! Use the methods.
+        self.checkpoint = None
+        ## How many times a failed step is retried
+        self.retries = 0
+
+        ## Archive of the raw samples of the runs, not handle it directly! Use the methods.
+        self.archive = None
+
+        ## Results store used as cache of fiber references, not handle it directly! Use the methods.
+        self.fiber_cache = None
+        ## Settings of the fiber reference cache (see enable_fiber_cache)
+        self.cache_settings = {}
+        ## Id of the cached fiber reference verified in this session
+        self.verified_ref = None
+
+        ## Debug output, not handle it directly! Use the methods.
+        self.show_dbg = False
+
+        ## Executor for the concurrent orchestration mode, not handle it directly! Use the methods.
+        self.executor = None
+        ## Slave status polled during the last instrument acquisition (concurrent mode)
+        self.monitor = {}
+
+        ## Statistics of the last RTT averaging (see Online_stats.summary)
+        self.rtt_stats = {}
+        ## RTT values read in the last RTT averaging
+        self.rtt_samples = []
+        ## Time stamps (clock.time()) of the values in rtt_samples
+        self.rtt_timestamps = []
+        ## For each value in rtt_samples, False if it was rejected as outlier
+        self.rtt_accepted = []
+
+        ## Estimator for RTT and skew acquisitions, not handle it directly! Use the methods.
+        self.estimator = "mean"
+        ## Reference epoch (clock.time()) for the "trend" estimator, None for the end of each acquisition
+        self.ref_epoch = None
+
+        ## Iterations of the last port calibrations, by port key (see calibrate_device_port)
+        self.convergence_trace = {}
+
+        ## Standard uncertainty of the measured constants, with the keys of cfg_dict
+        self.uncertainty = {'fiber-latency' : {}, 'fiber-asymmetry' : {}, 'port-delay' : {}}
+        ## Monte Carlo draws for the uncertainty propagation, 0 for the linear one
+        self.uncertainty_draws = 0
+        ## Least-squares solution of the last fiber latency measurement (see analysis.latency_fit)
+        self.latency_fit = {}
+        ## Skews acquired during the last fiber latency measurement (concurrent mode), by fiber
+        self.latency_skews = {}
+
+        ## Detector of the servo settling, not handle it directly! Use the methods.
+        self.settle = None
+        ## Settings of the settle detection (see enable_settle_detection)
+        self.settle_settings = {}
+
+        ## Per-channel results of the last multi-channel skew measurement (see measure_skews)
+        self.channel_skews = []
+        ## Fiber asymmetry of each slave of the multi-channel measurements, by port key
+        self.channel_asymmetry = {}
+
         self.cfg_dict['fiber-latency'] = {}
         self.cfg_dict['fiber-latency']['delta1'] = 0
         self.cfg_dict['fiber-latency']['delta2'] = 0
@@ -82,6 +164,8 @@ class WR_calibration() :
             device.show_dbg = True
         if self.instr != None :
             self.instr.show_dbg = True
+        if self.switch != None :
+            self.switch.show_dbg = True
 
     # ------------------------------------------------------------------------ #
 
@@ -96,6 +180,227 @@ class WR_calibration() :
             device.show_dbg = False
         if self.instr != None :
             self.instr.show_dbg = False
+        if self.switch != None :
+            self.switch.show_dbg = False
+
+    # ------------------------------------------------------------------------ #
+
+    def enable_concurrency(self, max_workers=2) :
+        '''
+        Enable the concurrent orchestration mode.
+
+        In this mode the instrument acquisitions run in a worker thread while the
+        WR slave device is polled (RTT, PHY delays and servo state) from the
+        calling thread, and RTT values are sampled on a fixed-rate schedule so
+        the serial I/O overlaps with the time between samples. Measured values
+        are computed exactly as in the sequential mode.
+
+        Args:
+            max_workers (int) : Number of worker threads.
+        '''
+        if self.executor == None :
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    # ------------------------------------------------------------------------ #
+
+    def disable_concurrency(self) :
+        '''
+        Disable the concurrent orchestration mode.
+
+        Pending acquisitions are waited before shutting down the worker threads.
+        '''
+        if self.executor != None :
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    # ------------------------------------------------------------------------ #
+
+    def set_estimator(self, estimator="mean", ref_epoch=None) :
+        '''
+        Method to select the estimator used for RTT and skew acquisitions.
+
+        - "mean" : arithmetic mean of the accepted samples.
+        - "trend" : a linear drift is fitted to the timestamped samples and the
+        value at the reference epoch is used. This removes the bias of a slow
+        thermal drift, so drifting measurements don't need to be repeated.
+
+        Args:
+            estimator (str) : "mean" or "trend".
+            ref_epoch (float) : Reference epoch (clock.time()) for the "trend" \
+            estimator. If None, each acquisition is referred to its last sample, \
+            the closest one to the current state of the link.
+
+        Raises:
+            ValueError if estimator is not valid.
+        '''
+        if estimator not in ("mean", "trend") :
+            raise ValueError("Unknown estimator %s." % estimator)
+
+        self.estimator = estimator
+        self.ref_epoch = ref_epoch
+
+    # ------------------------------------------------------------------------ #
+
+    def set_uncertainty_method(self, draws=0) :
+        '''
+        Method to select how the uncertainty of the acquisitions is propagated
+        to the calibration constants (see analysis.uncertainty).
+
+        The standard uncertainty of each measured constant is stored in
+        uncertainty, with the keys of cfg_dict, and it's kept with the values
+        in results stores and configuration files. Port delays get the
+        uncertainty of the last skew measurement and of the fiber reference.
+
+        Args:
+            draws (int) : Draws of the Monte Carlo propagation (i.e. 1000000), \
+            0 for the linear propagation.
+
+        Raises:
+            ValueError if draws is negative.
+        '''
+        if draws < 0 :
+            raise ValueError("The number of draws can't be negative.")
+
+        self.uncertainty_draws = int(draws)
+
+    # ------------------------------------------------------------------------ #
+
+    def enable_settle_detection(self, window=8, tolerance=5.0, poll=1.0, timeout=600) :
+        '''
+        Method to wait until the link is stable, not only in TRACK PHASE,
+        before sampling.
+
+        The status records of the slave (setpoint, clock offset, mu, cable
+        round-trip and asymmetry) are polled and tested with a
+        Settle_detector, so sampling starts as soon as the servo stops moving.
+        The RTT values read while the servo moves are discarded (the
+        acquisition fails if it keeps moving for longer than timeout) and, in
+        concurrent mode, the skew samples taken meanwhile are counted in
+        monitor. Devices that
+        don't give status records (WR_Device.get_status) only wait for
+        TRACK PHASE.
+
+        Args:
+            window (int) : Status records tested at once.
+            tolerance (float) : Drift accepted along a window (in ps), a dict \
+            by field or a value for all of them.
+            poll (float) : Time between status records (in s).
+            timeout (float) : Time waiting for a stable link (in s), after it \
+            sampling starts with a warning. RTT averaging fails when the servo \
+            moves longer than this.
+        '''
+        # It needs NumPy, so it's imported on use
+        from analysis.settle import Settle_detector
+
+        self.settle = Settle_detector(window, tolerance)
+        self.settle_settings = {'poll' : poll, 'timeout' : timeout}
+
+    # ------------------------------------------------------------------------ #
+
+    def disable_settle_detection(self) :
+        '''
+        Method to wait only for TRACK PHASE before sampling.
+        '''
+        self.settle = None
+        self.settle_settings = {}
+
+    # ------------------------------------------------------------------------ #
+
+    def enable_checkpoint(self, path, retries=1) :
+        '''
+        Enable checkpointing of the procedures.
+
+        The result of each completed measurement step of fiber_latency,
+        fiber_asymmetry and calibrate_device_port is stored in the file path.
+        If a procedure fails, calling it again with the same parameters resumes
+        it from the last completed step, even from a new Python session. The
+        hardware setup (SFP database, fiber switch route) is always done again,
+        as the devices could have been restarted. A failed step is retried up
+        to retries times before raising the error.
+
+        Args:
+            path (str) : Path to the checkpoint file.
+            retries (int) : How many times a failed step is retried.
+        '''
+        self.checkpoint = Checkpoint(path)
+        self.retries = retries
+
+    # ------------------------------------------------------------------------ #
+
+    def disable_checkpoint(self) :
+        '''
+        Disable checkpointing of the procedures.
+
+        The checkpoint file is kept, so it could be enabled again later.
+        '''
+        self.checkpoint = None
+        self.retries = 0
+
+    # ------------------------------------------------------------------------ #
+
+    def enable_archive(self, path) :
+        '''
+        Enable archiving of the raw samples of each run.
+
+        The RTT and skew samples, PHY delays and written delays of each run of
+        fiber_latency, fiber_asymmetry and calibrate_device_port are appended to
+        a Sample_archive. The results can be recomputed later with other
+        parameters (see analysis.recompute) without measuring again.
+
+        Args:
+            path (str) : Archive directory.
+        '''
+        from analysis.archive import Sample_archive
+        self.archive = Sample_archive(path)
+
+    # ------------------------------------------------------------------------ #
+
+    def disable_archive(self) :
+        '''
+        Disable archiving of the raw samples.
+        '''
+        self.archive = None
+
+    # ------------------------------------------------------------------------ #
+
+    def enable_fiber_cache(self, store, fiber_set="default", validity=7, verify=0, tolerance=50) :
+        '''
+        Enable the cache of fiber references.
+
+        Fiber latency and asymmetry results are stored in store, keyed by the
+        fiber set, the SFP pair and the port. While a cached result is valid
+        (measured less than validity days ago), fiber_latency and fiber_asymmetry
+        load it instead of measuring, and calibrate_device_port loads it when
+        cfg_dict has no fiber reference.
+
+        When verify is not 0, before using a cached reference the round-trip
+        delay with f1+f2 is measured with verify samples and compared with the
+        one measured with the reference. If it differs more than tolerance
+        the fibers are measured again. calibrate_device_port can't verify the
+        reference, it only has the device under calibration.
+
+        Args:
+            store (Results_store) : The results database.
+            fiber_set (str) : Identifier of the fibers (i.e. "f1:A12,f2:B3").
+            validity (float) : Validity period of cached results (in days).
+            verify (int) : Samples of the verification measurement, 0 to disable it.
+            tolerance (float) : Maximum difference (in ps) allowed in the \
+            verification measurement.
+        '''
+        self.fiber_cache = store
+        self.cache_settings = {'fiber_set' : fiber_set, 'validity' : validity, \
+        'verify' : verify, 'tolerance' : tolerance}
+        self.verified_ref = None
+
+    # ------------------------------------------------------------------------ #
+
+    def disable_fiber_cache(self) :
+        '''
+        Disable the cache of fiber references.
+        '''
+        self.fiber_cache = None
+        self.cache_settings = {}
+        self.verified_ref = None
 
     # ------------------------------------------------------------------------ #
 
@@ -104,11 +409,11 @@ class WR_calibration() :
         Method to add a WR device (not calibrated).
 
         This method use the param name to load a concrete WR device controller \
-        from module wr_devices.
+        from module wr_devices (or from a plugin, see main.registry).
 
         Args:
             name (str) : The name param must be the name of a WR device file \
-            located in the folder wr_devices.
+            located in the folder wr_devices or of a registered plugin.
             device_params (list) : This variable will be passed to WR device constructor. \
             It is expected that device_params contains 2 items : [interface,port]
 
@@ -116,12 +421,8 @@ class WR_calibration() :
             DeviceNotFound if name is not a valid WR device name in wr_devices module.
         '''
         try :
-            module = "wr_devices.%s" % name
-            if self.show_dbg :
-                print("wrcalibration : %s imported" % (module))
-            wr_device = importlib.import_module(module)
-            name = getattr(wr_device,"__wrdevice__")
-            class_ = getattr(wr_device,name)
+            class_ = registry.registry().load("wr_device", name)
+            self._dbg("wrcalibration : %s imported" % (class_.__module__))
             self.devices.append(class_(device_params[0],device_params[1]))
 
         except ImportError as ierr :
@@ -133,8 +434,7 @@ class WR_calibration() :
         '''
         Method to remove all attached WR Devices.
         '''
-        if self.show_dbg :
-            print("%d devices removed." % len(self.devices))
+        self._dbg("%d devices removed." % len(self.devices))
         for d in self.devices :
             d.close()
 
@@ -148,11 +448,11 @@ class WR_calibration() :
         Method to add a Measurement instrument.
 
         This method use the param name to load a concrete Calibration Instrument \
-        controller from module calibration.
+        controller from module measurement (or from a plugin, see main.registry).
 
         Args:
             name (str) : The name param must be the name of a Calibration Instrument \
-            controller located in the folder calibration.
+            controller located in the folder measurement or of a registered plugin.
             device_params (list) : This variable will be passed to Calibration \
             Instrument constructor. It is expected that device_params contains \
             3 items : [port,master_chan,slave_chan]
@@ -161,17 +461,56 @@ class WR_calibration() :
             DeviceNotFound if name is not a valid WR device name in wr_devices module.
         '''
         try :
-            module = "measurement.%s" % name
-            wr_device = importlib.import_module(module)
-            name = getattr(wr_device,"__meas_instr__")
-            class_ = getattr(wr_device,name)
+            class_ = registry.registry().load("meas_instr", name)
             self.instr = class_(device_params[0])
+            if len(device_params) > 2 :
+                self.instr.master_chan = device_params[1]
+                self.instr.slave_chan = device_params[2]
+
+        except ImportError as ierr :
+            raise DeviceNotFound(ierr.msg)
+
+    # ------------------------------------------------------------------------ #
+
+    def add_fiber_switch(self, name, switch_params=[]) :
+        '''
+        Method to add a fiber switch.
+
+        This method use the param name to load a concrete Fiber switch \
+        controller from module fiber_switches (or from a plugin, see
+        main.registry). Without a fiber switch, an
+        operator is asked for each fiber or PPS cabling change.
+
+        Args:
+            name (str) : The name param must be the name of a Fiber switch \
+            controller located in the folder fiber_switches.
+            switch_params (list) : This variable will be passed to the Fiber \
+            switch constructor.
+
+        Raises:
+            DeviceNotFound if name is not a valid Fiber switch name in fiber_switches module.
+        '''
+        try :
+            class_ = registry.registry().load("fiber_switch", name)
+            self.switch = class_(*switch_params)
+            self.switch.show_dbg = self.show_dbg
 
         except ImportError as ierr :
             raise DeviceNotFound(ierr.msg)
 
     # ------------------------------------------------------------------------ #
 
+    def _get_switch(self) :
+        '''
+        Method to get the fiber switch, an Interactive_switch if none was added.
+        '''
+        if self.switch == None :
+            self.add_fiber_switch("interactive_switch")
+
+        return self.switch
+
+    # ------------------------------------------------------------------------ #
+
     def read_config(self, cfg_file) :
         '''
         Method to load a stored calibration configuration from a file.
@@ -179,7 +518,9 @@ class WR_calibration() :
         This method loads all configuration in the file cfg_file. So any configuration
         in memory will be overwrited. If you want to preserve some measured values
         before read a configuration file you can comment lines in the file with
-        "#" or store them to a file using "write_config".
+        "#" or store them to a file using "write_config". The uncertainties of
+        the values are read from the u-* sections, values without them have an
+        unknown uncertainty.
 
         Args:
             cfg_file(str) : Path to a configuration file.
@@ -197,6 +538,9 @@ class WR_calibration() :
                     if key == 'fiber-latency'   : flag = 1
                     if key == 'fiber-asymmetry' : flag = 2
                     if key == 'port-delay'      : flag = 3
+                    if key == 'u-fiber-latency'   : flag = 4
+                    if key == 'u-fiber-asymmetry' : flag = 5
+                    if key == 'u-port-delay'      : flag = 6
                     continue
 
                 if flag == 1 :
@@ -205,6 +549,7 @@ class WR_calibration() :
                     delta2 = float( line.split(" ")[1].split(":")[1][:-1] )
                     self.cfg_dict['fiber-latency']['delta1'] = delta1
                     self.cfg_dict['fiber-latency']['delta2'] = delta2
+                    self.uncertainty['fiber-latency'] = {}
 
                 if flag == 2 :
                     for i in line.split(" ") :
@@ -215,6 +560,7 @@ class WR_calibration() :
                             v = v[:-1]
                             flag = 0
                         self.cfg_dict['fiber-asymmetry'][k] = float(v)
+                        self.uncertainty['fiber-asymmetry'].pop(k, None)
 
                 if flag == 3 :
                     for i in line.split(" ") :
@@ -226,6 +572,18 @@ class WR_calibration() :
                             drxs = drxs[:-1]
                             flag = 0
                         self.cfg_dict['port-delay'][k] = (float(dtxs), float(drxs))
+                        self.uncertainty['port-delay'].pop(k, None)
+
+                if flag >= 4 :
+                    section = ('fiber-latency', 'fiber-asymmetry', 'port-delay')[flag - 4]
+                    for i in line.split() :
+                        k, v = i.split(":")
+                        if section == 'port-delay' :
+                            v = tuple(float(u) for u in v.split(","))
+                        else :
+                            v = float(v)
+                        self.uncertainty[section][k] = v
+                    flag = 0
 
         print("Configuration loaded.")
 
@@ -278,11 +636,769 @@ class WR_calibration() :
                 out.write("%s:%d,%d " % (key,self.cfg_dict['port-delay'][key][0],\
                 self.cfg_dict['port-delay'][key][1]))
             out.write('\n')
+
+            # Standard uncertainties, ignored by older versions
+            out.write("@u-fiber-latency\n")
+            out.write(" ".join("%s:%.2f" % (k, v) for k, v in \
+            self.uncertainty['fiber-latency'].items()) + "\n")
+            out.write("@u-fiber-asymmetry\n")
+            out.write(" ".join("%s:%.1f" % (k, v) for k, v in \
+            self.uncertainty['fiber-asymmetry'].items()) + "\n")
+            out.write("@u-port-delay\n")
+            out.write(" ".join("%s:%.2f,%.2f" % (k, v[0], v[1]) for k, v in \
+            self.uncertainty['port-delay'].items()) + "\n")
         print("Configuration stored in ./%s" % out_file)
 
     # ------------------------------------------------------------------------ #
 
-    def fiber_latency(self, n_samples=10, t_samples=5) :
+    def store_results(self, store, device_serial=None, fiber_set="default", fiber_reference=True) :
+        '''
+        Method to store the calibration configuration in a results store.
+
+        Args:
+            store (Results_store) : The results database.
+            device_serial (str) : Serial number of the calibrated device. Port
+            delays are only stored if it is given.
+            fiber_set (str) : Identifier of the fibers used.
+            fiber_reference (bool) : If False, only the port delays are stored.
+        '''
+        store.store_config(self.cfg_dict, device_serial, fiber_set, sfp_sn=self.sfp_sn, \
+        fiber_reference=fiber_reference, uncertainty=self.uncertainty)
+        print("Configuration stored in %s" % store.path)
+
+    # ------------------------------------------------------------------------ #
+
+    def load_results(self, store, device_serial=None, fiber_set="default") :
+        '''
+        Method to load the latest valid results from a results store.
+
+        As read_config, any configuration in memory will be overwrited.
+
+        Args:
+            store (Results_store) : The results database.
+            device_serial (str) : Serial number of the device whose port delays \
+            will be loaded.
+            fiber_set (str) : Identifier of the fibers used.
+        '''
+        self.uncertainty = {}
+        self.cfg_dict = store.load_config(device_serial, fiber_set, uncertainty=self.uncertainty)
+
+    # ------------------------------------------------------------------------ #
+
+    @tracing.traced("record_rtt")
+    def record_rtt(self, n_samples, t_samples, device=1) :
+        '''
+        Method to record a long series of RTT values from a WR device.
+
+        The series is stored in rtt_samples and can be analysed with
+        recommend_averaging.
+
+        Args:
+            n_samples (int) : Number of RTT values to read.
+            t_samples (int) : The time between samples.
+            device (int) : Index of the WR device in slave mode.
+
+        Returns:
+            A list with the RTT values (in ps).
+        '''
+        if len(self.devices) <= device :
+            raise WRDeviceNeeded("No WR device with index %d." % device)
+
+        self._mean_rtt(self.devices[device], n_samples, t_samples)
+
+        return self.rtt_samples
+
+    # ------------------------------------------------------------------------ #
+
+    def recommend_averaging(self, tau0, source="skew") :
+        '''
+        Method to recommend the averaging time for a measurement.
+
+        It computes the time deviation (TDEV) of the last acquired series and
+        returns the averaging time where it's minimum, i.e. where more samples
+        stop improving the mean. Long series give better recommendations, so
+        call mean_time_interval or record_rtt with many samples first.
+
+        Args:
+            tau0 (float) : Time between samples of the series (t_samples).
+            source (str) : "skew" for the last instrument acquisition or "rtt" \
+            for the last RTT series.
+
+        Returns:
+            A dict with keys tau, n_samples and tdev (see analysis.allan), None
+            if the series is too short.
+        '''
+        # NumPy is only needed for the analysis, don't import it before
+        from analysis.allan import recommend_averaging
+
+        if source == "skew" :
+            if self.instr == None :
+                raise MeasurementInstrumentNeeded("No measurement instrument added.")
+            series = self.instr.samples
+            unit = 1e12 # s to ps
+        else :
+            series = self.rtt_samples
+            unit = 1
+
+        rec = recommend_averaging(series, tau0)
+        if rec == None :
+            print("Not enough samples to recommend an averaging time.")
+        else :
+            print("Recommended averaging for %s : %d samples every %g s (TDEV %.2f ps)" % \
+            (source, rec['n_samples'], tau0, rec['tdev']*unit))
+
+        return rec
+
+    # ------------------------------------------------------------------------ #
+
+    def _dbg(self, msg) :
+        '''
+        Method to show a debug message.
+
+        The message is shown when debug output is enabled, and it's stored as
+        an event when tracing (see main.tracing).
+
+        Args:
+            msg (str) : The message.
+        '''
+        tracing.event(msg)
+        if self.show_dbg :
+            print(msg)
+
+    # ------------------------------------------------------------------------ #
+
+    def _begin(self, section, params) :
+        '''
+        Method to start or resume the checkpoint section of a procedure.
+
+        Args:
+            section (str) : Section name.
+            params (dict) : Parameters of the procedure.
+        '''
+        if self.checkpoint == None :
+            return
+
+        steps = self.checkpoint.begin(section, params)
+        if len(steps) > 0 :
+            print("Resuming %s after step %s." % (section, steps[-1]))
+
+    # ------------------------------------------------------------------------ #
+
+    def _step(self, section, step, func, restore=True) :
+        '''
+        Method to run a step of a procedure.
+
+        A step already stored in the checkpoint is not run again, its stored
+        result is returned. A step that raises an exception is retried up to
+        self.retries times.
+
+        Args:
+            section (str) : Section name.
+            step (str) : Step name.
+            func (callable) : Function that runs the step and returns its result.
+            restore (bool) : If False, the step is run on resume too and it's \
+            not stored (i.e. the configuration of the hardware).
+
+        Returns:
+            The step result.
+        '''
+        if restore and self.checkpoint != None and self.checkpoint.done(section, step) :
+            self._dbg("Step %s of %s restored from checkpoint." % (step, section))
+            return self.checkpoint.get(section, step)
+
+        attempt = 0
+        while True :
+            try :
+                with tracing.span("%s/%s" % (section, step), "step", attempt=attempt) :
+                    result = func()
+                break
+            except Exception as e :
+                if attempt >= self.retries :
+                    raise
+                attempt += 1
+                metrics.STEP_RETRIES.inc(section)
+                print("Step %s of %s failed (%s), retrying (%d/%d)..." % \
+                (step, section, e, attempt, self.retries))
+
+        if restore and self.checkpoint != None :
+            self.checkpoint.store(section, step, result)
+
+        return result
+
+    # ------------------------------------------------------------------------ #
+
+    def _finish(self, section) :
+        '''
+        Method to remove the checkpoint section of a completed procedure.
+
+        Args:
+            section (str) : Section name.
+        '''
+        if self.checkpoint != None :
+            self.checkpoint.finish(section)
+
+    # ------------------------------------------------------------------------ #
+
+    def _raw(self, source="skew") :
+        '''
+        Method to copy the samples of the last acquisition for the archive.
+
+        Args:
+            source (str) : "skew" for the last instrument acquisition or "rtt" \
+            for the last RTT averaging.
+
+        Returns:
+            A (timestamps, values, accepted) tuple of lists.
+        '''
+        if source == "rtt" :
+            return (list(self.rtt_timestamps), list(self.rtt_samples), list(self.rtt_accepted))
+        return (list(self.instr.timestamps), list(self.instr.samples), list(self.instr.accepted))
+
+    # ------------------------------------------------------------------------ #
+
+    def _archive_run(self, kind, key, series, scalars, params) :
+        '''
+        Method to append a run to the archive, when it's enabled.
+
+        Series of steps restored from a checkpoint are not available, so they
+        are missing in the archived run.
+
+        Args:
+            kind (str) : Procedure of the run.
+            key (str) : Key of the result.
+            series (dict) : (timestamps, values, accepted) by series name.
+            scalars (dict) : Other inputs of the run.
+            params (dict) : Parameters of the procedure.
+        '''
+        if self.archive == None :
+            return
+        run = self.archive.add_run(kind, key, series, scalars, params)
+        self._dbg("Raw samples stored as run %d in %s" % (run, self.archive.path))
+
+    # ------------------------------------------------------------------------ #
+
+    def _sfp_pair(self) :
+        '''
+        Method to get the SFP pair (slave/master) used for fiber latency.
+        '''
+        return "%s/%s" % (self.sfp_sn["blue"], self.sfp_sn["violet"])
+
+    # ------------------------------------------------------------------------ #
+
+    def _setup_pair(self, master, slave, port, slave_sn, master_sn) :
+        '''
+        Method to configure a master and a slave with delays and beta set to 0.
+
+        Args:
+            master (WR_Device) : The WR device in master mode.
+            slave (WR_Device) : The WR device in slave mode.
+            port (int) : The port used for connecting master to slave.
+            slave_sn (str) : Serial number of the SFP of the slave.
+            master_sn (str) : Serial number of the SFP of the master.
+        '''
+        # First, set all delays and beta values in sfp database to 0
+        self._dbg("Setting initial parameters in WR devices...\n")
+        self._dbg("Erasing sfp database...")
+        master.erase_sfp_config()
+        slave.erase_sfp_config()
+
+        self._dbg("Writing initial configuration to sfp database...")
+        slave.write_sfp_config(slave_sn,port)
+        master.write_sfp_config(master_sn,port)
+        master.load_sfp_config()
+        slave.load_sfp_config()
+        slave.set_slaveport(port)
+        master.set_master()
+
+    # ------------------------------------------------------------------------ #
+
+    def _verify_reference(self, ref, t_samples) :
+        '''
+        Method to check that the fibers of a cached reference didn't change.
+
+        Args:
+            ref (dict) : Cached reference (see Results_store.latest_fiber_reference).
+            t_samples (int) : The time between samples.
+
+        Returns:
+            True if the reference is verified.
+        '''
+        if self.cache_settings['verify'] == 0 or self.verified_ref == ref['id'] :
+            return True
+        if ref['delay_ref'] == None or len(self.devices) < 2 :
+            print("Cached fiber reference can't be verified.")
+            return False
+
+        master = self.devices[0]
+        slave = self.devices[1]
+        self._setup_pair(master, slave, 1, self.sfp_sn["blue"], self.sfp_sn["violet"])
+        with tracing.span("fiber-switch", "wait", fiber="f1+f2") :
+            self._get_switch().select_fiber("f1+f2", 1)
+        clock.sleep(1)
+        self._wait_trackphase(slave)
+
+        print("Verifying cached fiber reference...")
+        rtt = self._mean_rtt(slave, self.cache_settings['verify'], t_samples)
+        delays = slave.get_phy_delays()
+        diff = rtt - delays['master'][1] - delays['slave'][1] - ref['delay_ref']
+
+        if abs(diff) > self.cache_settings['tolerance'] :
+            print("Cached fiber reference failed verification (%.1f ps)." % diff)
+            return False
+
+        self._dbg("Cached fiber reference verified (%.1f ps)." % diff)
+        self.verified_ref = ref['id']
+        return True
+
+    # ------------------------------------------------------------------------ #
+
+    def _load_cached_reference(self, key=None, t_samples=1, verify=True) :
+        '''
+        Method to load a valid fiber reference from the cache to cfg_dict.
+
+        Args:
+            key (str) : Fiber asymmetry key ("sfp-wrN") needed, None if only \
+            fiber latency is needed.
+            t_samples (int) : The time between samples of the verification.
+            verify (bool) : If False, the reference is not verified.
+
+        Returns:
+            True if a reference was loaded.
+        '''
+        if self.fiber_cache == None :
+            return False
+
+        since = datetime.datetime.now() - datetime.timedelta(days=self.cache_settings['validity'])
+        ref = self.fiber_cache.latest_fiber_reference(self.cache_settings['fiber_set'], \
+        self._sfp_pair(), since)
+        if ref == None or (key != None and key not in ref['asymmetry']) :
+            return False
+        if verify and not self._verify_reference(ref, t_samples) :
+            return False
+
+        self.cfg_dict['fiber-latency']['delta1'] = ref['delta1']
+        self.cfg_dict['fiber-latency']['delta2'] = ref['delta2']
+        self.uncertainty['fiber-latency'] = dict(ref['uncertainty']['fiber-latency'])
+        if key != None :
+            self.cfg_dict['fiber-asymmetry'][key] = ref['asymmetry'][key]
+            self.uncertainty['fiber-asymmetry'].pop(key, None)
+            if key in ref['uncertainty']['fiber-asymmetry'] :
+                self.uncertainty['fiber-asymmetry'][key] = ref['uncertainty']['fiber-asymmetry'][key]
+        print("Fiber reference loaded from cache (measured %s)." % ref['date'])
+
+        return True
+
+    # ------------------------------------------------------------------------ #
+
+    def _wait_trackphase(self, slave) :
+        '''
+        Method to block until the servo state of slave is TRACK PHASE, and the
+        link is stable when settle detection is enabled.
+
+        Args:
+            slave (WR_Device) : The WR device in slave mode.
+        '''
+        self._dbg("Waiting until TRACK PHASE.....")
+
+        with tracing.span("wait-trackphase", "wait"), metrics.LOCK_SECONDS.time() :
+            status = None if self.settle == None else slave.get_status()
+            if status != None :
+                self.settle.reset()
+                start = clock.monotonic()
+                while not self.settle.add(status, clock.time()) :
+                    if clock.monotonic() - start >= self.settle_settings['timeout'] :
+                        print("Warning: the link is not stable after %d s, sampling anyway." % \
+                        (clock.monotonic() - start))
+                        break
+                    clock.sleep(self.settle_settings['poll'])
+                    status = slave.get_status()
+                self._dbg("Link stable after %.1f s" % (clock.monotonic() - start))
+                return
+
+            while not slave.in_trackphase() :
+                clock.sleep(2)
+
+    # ------------------------------------------------------------------------ #
+
+    def _sampler(self, n_samples, target, budget, scale=1) :
+        '''
+        Method to build the sampling controller for an acquisition.
+
+        Args:
+            n_samples (int) : Number of samples when sampling is not adaptive.
+            target (float) : Target standard error (in ps) or None.
+            budget (float) : Time budget (in s) or None.
+            scale (float) : Factor to convert sample units to ps.
+
+        Returns:
+            A Sampling_controller.
+        '''
+        if target == None and budget == None :
+            return Sampling_controller(max_samples=n_samples)
+
+        return Sampling_controller(target, budget, self.adaptive_min_samples, \
+        self.adaptive_max_samples, scale, self.adaptive_resolution)
+
+    # ------------------------------------------------------------------------ #
+
+    def _report_sampling(self, name, stats, scale=1) :
+        '''
+        Method to show what an adaptive acquisition achieved.
+
+        The number of samples acquired and rejected is published in main.metrics.
+
+        Args:
+            name (str) : Name of the measured magnitude.
+            stats (dict) : Statistics with the sampling report.
+            scale (float) : Factor to convert sample units to ps.
+        '''
+        metrics.SAMPLES.inc(name.lower(), amount=stats.get('n', 0) + stats.get('rejected', 0))
+        metrics.OUTLIERS.inc(name.lower(), amount=stats.get('rejected', 0))
+
+        if stats.get('reason') in ("target", "budget") :
+            achieved = stats['stderr']*scale if stats.get('achieved') == None else stats['achieved']
+            print("%s : uncertainty %.2f ps with %d samples in %.0f s (stopped by %s)" % \
+            (name, achieved, stats['n'], stats['elapsed'], stats['reason']))
+
+    # ------------------------------------------------------------------------ #
+
+    def _stderr(self, stats, scale=1) :
+        '''
+        Method to get the standard error of the estimate of an acquisition.
+
+        Args:
+            stats (dict) : Statistics of the acquisition.
+            scale (float) : Factor to convert sample units to ps.
+
+        Returns:
+            The standard error (in ps), the one of the trend fit when the
+            "trend" estimator was used.
+        '''
+        if 'trend' in stats :
+            return stats['trend']['stderr'] * scale
+        return stats.get('stderr', 0) * scale
+
+    # ------------------------------------------------------------------------ #
+
+    def _interval(self, stats, value, scale=1) :
+        '''
+        Method to get the confidence interval of the estimate of an acquisition.
+
+        Args:
+            stats (dict) : Statistics of the acquisition.
+            value (float) : The estimate (in ps).
+            scale (float) : Factor to convert sample units to ps.
+
+        Returns:
+            A list [low, high] (in ps): the bootstrap interval of the mean, the
+            normal interval of the fit with the "trend" estimator, or the
+            estimate itself when there are not enough samples.
+        '''
+        from analysis import bootstrap
+
+        if 'trend' in stats :
+            return bootstrap.normal_interval(value, stats['trend']['stderr'] * scale)
+        if stats.get('ci') == None :
+            return [value, value]
+        return [stats['ci'][0] * scale, stats['ci'][1] * scale]
+
+    # ------------------------------------------------------------------------ #
+
+    def _propagate(self, func, values, stderrs) :
+        '''
+        Method to propagate uncertainties with the selected method.
+
+        Returns:
+            The standard uncertainty of the result.
+        '''
+        from analysis import uncertainty
+
+        return uncertainty.propagate(func, values, stderrs, self.uncertainty_draws)['stderr']
+
+    # ------------------------------------------------------------------------ #
+
+    def _estimate(self, name, timestamps, values, accepted, stats) :
+        '''
+        Method to apply the selected estimator to an acquisition.
+
+        With the "trend" estimator, the fit is stored in stats with key "trend".
+
+        Args:
+            name (str) : Name of the measured magnitude.
+            timestamps (list) : Time stamps of the values.
+            values (list) : Values read.
+            accepted (list) : For each value, False if it was rejected as outlier.
+            stats (dict) : Statistics of the acquisition.
+
+        Returns:
+            The estimated value.
+        '''
+        if self.estimator == "mean" :
+            return stats['mean']
+
+        from analysis.drift import fit_trend, drift_significant
+
+        t = [ts for ts, ok in zip(timestamps, accepted) if ok]
+        v = [val for val, ok in zip(values, accepted) if ok]
+        if len(v) < 3 :
+            return stats['mean']
+
+        t_ref = self.ref_epoch if self.ref_epoch != None else t[-1]
+        fit = fit_trend(t, v, t_ref)
+        stats['trend'] = fit
+
+        if drift_significant(fit) :
+            print("%s : drift of %g/s compensated, value %g +- %g (mean %g)" % \
+            (name, fit['drift'], fit['value'], fit['stderr'], stats['mean']))
+
+        return fit['value']
+
+    # ------------------------------------------------------------------------ #
+
+    @tracing.traced("rtt-sampling", "sampling")
+    def _mean_rtt(self, slave, n_samples, t_samples, sampler=None) :
+        '''
+        Method to calculate the mean round-trip time reported by slave.
+
+        Outliers are rejected by MAD clipping and the statistics are stored in
+        self.rtt_stats. The value is computed with the selected estimator. In
+        concurrent mode samples are taken on a fixed-rate schedule, so the
+        time spent reading the device is not added to t_samples. With settle
+        detection, the values are read from the status records and the ones
+        read while the servo moves are rejected (their count is stored with
+        key "moving").
+
+        Args:
+            slave (WR_Device) : The WR device in slave mode.
+            n_samples (int) : Number of RTT values to average.
+            t_samples (int) : The time between samples.
+            sampler (Sampling_controller) : If given, it replaces n_samples.
+
+        Returns:
+            The round-trip time in ps.
+
+        Raises:
+            MeasuringError if the servo keeps moving for longer than the \
+            settle timeout.
+        '''
+        from analysis import bootstrap
+
+        if sampler == None :
+            sampler = Sampling_controller(max_samples=n_samples)
+        stats = Online_stats()
+        self.rtt_samples = []
+        self.rtt_timestamps = []
+        self.rtt_accepted = []
+        sampler.start()
+        deadline = clock.monotonic()
+        moving = 0
+        moving_since = None
+        while sampler.keep_going(stats) :
+            status = None if self.settle == None else slave.get_status()
+            rtt = slave.get_rtt() if status == None else status['mu']
+            self.rtt_timestamps.append(clock.time())
+            self.rtt_samples.append(rtt)
+            if status != None and not self.settle.add(status, self.rtt_timestamps[-1]) :
+                if moving_since == None :
+                    moving_since = clock.monotonic()
+                elif clock.monotonic() - moving_since >= self.settle_settings['timeout'] :
+                    raise MeasuringError("The servo is still moving after %d s of RTT sampling." % \
+                    (clock.monotonic() - moving_since))
+                moving += 1
+                self.rtt_accepted.append(False)
+                self._dbg("RTT value rejected, the servo is moving")
+            else :
+                moving_since = None
+                self.rtt_accepted.append(stats.add(rtt, len(self.rtt_accepted)))
+                if not self.rtt_accepted[-1] :
+                    self._dbg("RTT value rejected as outlier")
+            if self.executor == None :
+                clock.sleep(t_samples)
+            else :
+                deadline += t_samples
+                clock.sleep(max(0, deadline - clock.monotonic()))
+        for i in stats.revoked :
+            self.rtt_accepted[i] = False
+        self.rtt_stats = stats.summary()
+        self.rtt_stats.update(sampler.report(stats))
+        self.rtt_stats.update(bootstrap.interval(self.rtt_samples, self.rtt_accepted))
+        self.rtt_stats['moving'] = moving
+        self._report_sampling("RTT", self.rtt_stats)
+
+        self._dbg("RTT stddev : %f (%d values rejected)" % \
+        (self.rtt_stats['stddev'], self.rtt_stats['rejected']))
+
+        return self._estimate("RTT", self.rtt_timestamps, self.rtt_samples, \
+        self.rtt_accepted, self.rtt_stats)
+
+    # ------------------------------------------------------------------------ #
+
+    @tracing.traced("skew-sampling", "sampling")
+    def _measure_skew(self, slave, n_samples, t_samples, sampler=None, rtt_sampler=None) :
+        '''
+        Method to measure the mean skew between the master and slave PPS signals.
+
+        In concurrent mode the instrument acquisition is submitted to the
+        executor and, while it runs, slave is polled for RTT, PHY delays and
+        servo state. The polled values are stored in self.monitor and a warning
+        is shown if the servo leaves TRACK PHASE during the acquisition. With
+        settle detection, the status records are polled instead and the
+        samples taken while the servo moves are counted with key "moving".
+        With rtt_sampler, a full RTT averaging (see _mean_rtt) is done while
+        the instrument acquires, and its result is stored in self.monitor with
+        key "mean-rtt".
+
+        Args:
+            slave (WR_Device) : The WR device in slave mode.
+            n_samples (int) : Indicates how many values will be used for computing \
+            stadistics values.
+            t_samples (int) : The time between samples.
+            sampler (Sampling_controller) : If given, it replaces n_samples.
+            rtt_sampler (Sampling_controller) : Sampling of the RTT averaging, \
+            only used in concurrent mode.
+
+        Returns:
+            The time interval master to slave (in s), computed with the selected
+            estimator.
+        '''
+        if self.executor == None :
+            self.instr.mean_time_interval(n_samples, t_samples, sampler)
+            self._report_sampling("Skew", self.instr.stats, 1e12)
+            return self._estimate("Skew", self.instr.timestamps, self.instr.samples, \
+            self.instr.accepted, self.instr.stats)
+
+        acq = self.executor.submit(self.instr.mean_time_interval, n_samples, t_samples, sampler)
+
+        monitor = {'rtt' : [], 'track-lost' : 0}
+        self.monitor = monitor
+        try :
+            monitor['phy-delays'] = slave.get_phy_delays()
+            if rtt_sampler != None :
+                monitor['mean-rtt'] = self._mean_rtt(slave, n_samples, t_samples, rtt_sampler)
+            while not acq.done() :
+                status = None if self.settle == None else slave.get_status()
+                if status == None :
+                    if not slave.in_trackphase() :
+                        monitor['track-lost'] += 1
+                    monitor['rtt'].append(slave.get_rtt())
+                else :
+                    self.settle.add(status, clock.time())
+                    if status.get('ss') != "TRACK_PHASE" :
+                        monitor['track-lost'] += 1
+                    monitor['rtt'].append(status['mu'])
+                clock.wait(acq, t_samples)
+        finally :
+            # A retried step must not start an acquisition while this one runs
+            if not acq.cancel() :
+                clock.wait(acq)
+
+        if monitor['track-lost'] > 0 :
+            print("Warning: servo left TRACK PHASE %d times during the acquisition." \
+            % monitor['track-lost'])
+        if len(monitor['rtt']) > 0 :
+            self._dbg("Mean rtt during acquisition : %f" % (sum(monitor['rtt']) / len(monitor['rtt'])))
+
+        # Exceptions raised by the instrument are propagated here
+        acq.result()
+        if self.settle != None :
+            monitor['moving'] = sum(self.settle.moving(self.instr.timestamps))
+            if monitor['moving'] > 0 :
+                print("Warning: %d skew samples were taken while the servo was moving." % \
+                monitor['moving'])
+        self._report_sampling("Skew", self.instr.stats, 1e12)
+
+        return self._estimate("Skew", self.instr.timestamps, self.instr.samples, \
+        self.instr.accepted, self.instr.stats)
+
+    # ------------------------------------------------------------------------ #
+
+    def _measure_skews(self, slave_chans, n_samples, t_samples, sampler=None) :
+        '''
+        Method to measure the mean skew between the master PPS signal and the
+        PPS signals of several slaves in one acquisition.
+
+        Args:
+            slave_chans (list) : Instrument input channels of the slaves.
+            n_samples (int) : Indicates how many values will be used for computing \
+            stadistics values.
+            t_samples (int) : The time between samples.
+            sampler (Sampling_controller) : If given, it replaces n_samples.
+
+        Returns:
+            A list with the time interval master to each slave (in s), computed
+            with the selected estimator.
+        '''
+        self.instr.mean_time_intervals(slave_chans, n_samples, t_samples, sampler)
+
+        skews = []
+        for res in self.instr.channel_results :
+            self._report_sampling("Skew CH%d" % res['chan'], res['stats'], 1e12)
+            skews.append(self._estimate("Skew CH%d" % res['chan'], res['timestamps'], \
+            res['samples'], res['accepted'], res['stats']))
+        return skews
+
+    # ------------------------------------------------------------------------ #
+
+    @tracing.traced("measure_skews")
+    def measure_skews(self, slave_chans, devices=None, n_samples=10, t_samples=5, \
+    target=None, budget=None) :
+        '''
+        Method to measure the skew of several slaves fed by the same master.
+
+        The PPS output of each slave is connected to one input of the instrument
+        and all of them are measured against the master PPS signal in one
+        acquisition (i.e. to verify the ports of several calibrated devices).
+
+        Args:
+            slave_chans (list) : Instrument input channels of the slaves.
+            devices (list) : Indexes in the added WR devices of the slave on \
+            each channel. By default the devices after the master (index 0).
+            n_samples (int) : Indicates how many values will be used for computing \
+            stadistics values.
+            t_samples (int) : The time between samples.
+            target (float) : Target uncertainty (standard error, in ps) of the \
+            worst channel. When target or budget are given, sampling is adaptive \
+            and n_samples is ignored.
+            budget (float) : Time budget (in s) for the acquisition.
+
+        Returns:
+            A list with a dict for each channel, with keys: chan, skew (ps),
+            stderr (ps) and ci ([low, high] in ps). It is also stored in
+            channel_skews.
+
+        Raises:
+            WRDeviceNeeded if there are not enough WR devices.
+            MeasurementInstrumentNeeded if no instruments are added.
+        '''
+        if devices == None :
+            devices = list(range(1, len(slave_chans) + 1))
+
+        if len(devices) != len(slave_chans) or len(self.devices) <= max(devices) :
+            raise WRDeviceNeeded("A WR device is needed for each slave channel.")
+
+        if self.instr == None :
+            raise MeasurementInstrumentNeeded("To measure skew between PPS signals a measurement instrument must be added.")
+
+        for d in devices :
+            self._wait_trackphase(self.devices[d])
+
+        skews = self._measure_skews(slave_chans, n_samples, t_samples, \
+        self._sampler(n_samples, target, budget, 1e12))
+
+        self.channel_skews = []
+        for skew, res in zip(skews, self.instr.channel_results) :
+            self.channel_skews.append({'chan' : res['chan'], 'skew' : skew * 1e12, \
+            'stderr' : self._stderr(res['stats'], 1e12), \
+            'ci' : self._interval(res['stats'], skew * 1e12, 1e12)})
+            self._dbg("Mean skew master to CH%d: %G ps" % (res['chan'], skew * 1e12))
+
+        return self.channel_skews
+
+    # ------------------------------------------------------------------------ #
+
+    @tracing.traced("fiber_latency")
+    def fiber_latency(self, n_samples=10, t_samples=5, target=None, budget=None, \
+    fibers=None, repeat=1, redo=1, threshold=3.0) :
         '''
         Method to calculate the reference fiber latency.
 
@@ -294,97 +1410,190 @@ class WR_calibration() :
         This method assumes that slave device uses a blue SFP and the master device
         a violet SFP both in the port 1.
 
+        The RTT is measured with each fiber combination (f1, f2 and f1+f2 by
+        default), repeat times, and the latency of every fiber and the fixed
+        delay of the hardware are solved by weighted least squares (see
+        analysis.latency_fit). With redundant measurements, the inconsistent
+        ones are measured again (up to redo times) and left out of the
+        solution if they are still inconsistent. The solution is stored in
+        latency_fit.
+
+        The procedure runs in steps (setup and one RTT measurement per fiber).
+        The measurements are checkpointed when enable_checkpoint was called.
+
+        In concurrent mode, the PPS skew is acquired at the same time as the RTT
+        with the fibers of fiber_asymmetry, and stored in latency_skews. The
+        setup is the one of fiber_asymmetry for port 1 and the blue SFP, so it
+        uses these skews instead of measuring them again.
+
         Args:
             n_samples (int) : Indicates how many values will be used for computing \
             stadistics values.
             t_samples (int) : The time between samples.
+            target (float) : Target uncertainty (standard error, in ps). When \
+            target or budget are given, sampling is adaptive and n_samples is ignored.
+            budget (float) : Time budget (in s) for each acquisition.
+            fibers (list) : Fiber combinations ("f1", "f1+f2", ...) selected in \
+            the fiber switch. They must determine the latency of f1 and f2. By \
+            default, the fibers of the calibration.
+            repeat (int) : Times each combination is measured.
+            redo (int) : Rounds of new measurements of the inconsistent ones.
+            threshold (float) : Limit of the normalized residuals.
 
         Raises:
             WRDeviceNeeded
+            ValueError if the combinations don't determine the latency of f1 and f2.
         '''
+        from analysis.latency_fit import combination, solve_latencies
+
         if len(self.devices) < 2 :
             raise WRDeviceNeeded("To measure fiber latency, at least, 2 WR devices are needed.")
 
+        fibers = list(self.fibers if fibers == None else fibers)
+        # Raises ValueError when the combinations can't be solved
+        solve_latencies(fibers, [0.0] * len(fibers))
+        if not set(["f1", "f2"]) <= set(f for c in fibers for f in combination(c)) :
+            raise ValueError("The fiber combinations %s don't include f1 and f2." % fibers)
+
+        if self._load_cached_reference(t_samples=t_samples) :
+            return
+
         # Assign one device as master and the other as slave
         master = self.devices[0]
         slave = self.devices[1]
 
-        # WR device configuration -----------------------------------
-
-        # First, set all delays and beta values in sfp database to 0
-        if self.show_dbg :
-            print("Setting initial parameters in WR devices...\n")
-            print("Erasing sfp database...")
-        master.erase_sfp_config()
-        slave.erase_sfp_config()
+        section = "fiber-latency"
+        params = {'n_samples' : n_samples, 't_samples' : t_samples, \
+        'target' : target, 'budget' : budget, 'fibers' : fibers, 'repeat' : repeat, \
+        'threshold' : threshold}
+        self._begin(section, params)
+        series = {}
+        self.latency_skews = {}
+        # Fibers of fiber_asymmetry, their skew is acquired with the RTT in concurrent mode
+        skew_fibers = [f for f in self.fibers if f != 'f1+f2'] \
+        if self.executor != None and self.instr != None else []
 
-        if self.show_dbg :
-            print("Writing initial configuration to sfp database...")
-        slave.write_sfp_config("AXGE-1254-0531",1)
-        master.write_sfp_config("AXGE-3454-0531",1)
-        master.load_sfp_config()
-        slave.load_sfp_config()
-        slave.set_slaveport(1)
-        master.set_master()
+        # WR device configuration -----------------------------------
 
+        self._step(section, "setup", lambda : self._setup_pair(master, slave, 1, \
+        self.sfp_sn["blue"], self.sfp_sn["violet"]), restore=False)
 
         # Retrieve Round-trip time and bitslide values for both master and slave
-        # WR devices when connected by f1, f2 and f1+f2.
+        # WR devices when connected by each fiber combination.
         delays_dict = {}
-        rtt_dict = {}
 
-        for fiber in self.fibers :
-            print("Please connect both WR devices with fiber %s on port 1 and press Enter"\
-            % (fiber))
-            input()
+        switch = self._get_switch()
+
+        def measure(fiber, name) :
+            with_skew = fiber in skew_fibers and name == "rtt-%s" % fiber
+            with tracing.span("fiber-switch", "wait", fiber=fiber) :
+                switch.select_fiber(fiber, 1)
+                if with_skew :
+                    switch.connect_pps()
             print("\nStarting fiber latency measurement procedure.\n")
-            time.sleep(1)
+            clock.sleep(1)
 
             # Wait until servo state in TRANCK PHASE
-            if self.show_dbg :
-                print("Waiting until TRACK PHASE.....")
-
-            while not slave.in_trackphase() :
-                time.sleep(2)
-
-            if self.show_dbg :
-                print("Measuring round-trip time (It will take %d s aprox.)..." \
-                % (n_samples*t_samples))
-
-            mean_rtt = 0
-            for i in range(n_samples) :
-                rtt = slave.get_rtt()
-                mean_rtt += rtt
-                time.sleep(t_samples)
-            mean_rtt /= n_samples
-
-            if self.show_dbg :
-                print("Mean rtt : %f" % mean_rtt)
-
-            delays_dict[fiber] = slave.get_phy_delays()
-            rtt_dict[fiber] = mean_rtt
-
-        # As Rx delays are set to 0 in sfp database, the stat values for Rx
-        # are the bitslides
-        delay_mm1 = rtt_dict['f1'] - delays_dict['f1']['master'][1] - delays_dict['f1']['slave'][1]
-        delay_mm2 = rtt_dict['f2'] - delays_dict['f2']['master'][1] - delays_dict['f2']['slave'][1]
-        delay_mm3 = rtt_dict['f1+f2'] - delays_dict['f1+f2']['master'][1] - delays_dict['f1+f2']['slave'][1]
-
-        if self.show_dbg :
-            print("delay_mm1 : %f" % delay_mm1)
-            print("delay_mm2 : %f" % delay_mm2)
-            print("delay_mm3 : %f" % delay_mm3)
-
-        delta1 = delay_mm3 - delay_mm2
-        delta2 = delay_mm3 - delay_mm1
+            self._wait_trackphase(slave)
+
+            self._dbg("Measuring round-trip time (It will take %d s aprox.)..." \
+            % (n_samples*t_samples))
+
+            result = {}
+            if with_skew :
+                mean_skew = self._measure_skew(slave, n_samples, t_samples, \
+                self._sampler(n_samples, target, budget, 1e12), self._sampler(n_samples, target, budget))
+                mean_rtt = self.monitor['mean-rtt']
+                series["skew-%s" % fiber] = self._raw("skew")
+                result['skew'] = {'value' : mean_skew, 'stderr' : self._stderr(self.instr.stats, 1e12), \
+                'ci' : self._interval(self.instr.stats, mean_skew * 1e12, 1e12)}
+            else :
+                mean_rtt = self._mean_rtt(slave, n_samples, t_samples, \
+                self._sampler(n_samples, target, budget))
+            series[name] = self._raw("rtt")
+
+            self._dbg("Mean rtt : %f" % mean_rtt)
+
+            result.update({'rtt' : mean_rtt, 'delays' : slave.get_phy_delays(), \
+            'stderr' : self._stderr(self.rtt_stats)})
+            return result
+
+        # Step names of the first round are the ones of a single measurement
+        steps = []
+        for n in range(repeat) :
+            for fiber in fibers :
+                steps.append((fiber, "rtt-%s" % fiber if n == 0 else "rtt-%s-%d" % (fiber, n)))
+
+        results = []
+        for fiber, name in steps :
+            results.append(self._step(section, name, lambda : measure(fiber, name)))
+            delays_dict[fiber] = results[-1]['delays']
+            if 'skew' in results[-1] :
+                self.latency_skews[fiber] = dict(results[-1]['skew'], series=series.get("skew-%s" % fiber))
+        if len(self.latency_skews) > 0 :
+            self.latency_skews['params'] = {'n_samples' : n_samples, 't_samples' : t_samples, \
+            'target' : target, 'budget' : budget}
+
+        def solve() :
+            # As Rx delays are set to 0 in sfp database, the stat values for Rx
+            # are the bitslides
+            delays = [r['rtt'] - r['delays']['master'][1] - r['delays']['slave'][1] for r in results]
+            for (fiber, name), delay in zip(steps, delays) :
+                self._dbg("delay_mm %s : %f" % (name, delay))
+            return solve_latencies([fiber for fiber, name in steps], delays, \
+            [r.get('stderr', 0) for r in results], threshold)
+
+        fit = solve()
+        for n in range(1, redo + 1) :
+            if len(fit['inconsistent']) == 0 :
+                break
+            for i in fit['inconsistent'] :
+                fiber, name = steps[i]
+                print("Measurement %s is inconsistent (residual %.1f ps), measuring it again." % \
+                (name, fit['residuals'][i]))
+                redo_name = "%s-redo-%d" % (name, n)
+                results[i] = self._step(section, redo_name, lambda : measure(fiber, redo_name))
+            fit = solve()
+
+        if len(fit['inconsistent']) > 0 :
+            print("Warning: measurements %s are inconsistent and were left out." % \
+            ", ".join(steps[i][1] for i in fit['inconsistent']))
+        self.latency_fit = fit
+
+        delta1 = fit['latencies']['f1']
+        delta2 = fit['latencies']['f2']
+        u_delta1 = fit['stderr']['f1']
+        u_delta2 = fit['stderr']['f2']
+        # Delay with f1+f2, to verify the fibers when the reference is cached
+        delay_ref = fit['predicted']("f1+f2")
 
         self.cfg_dict['fiber-latency']['delta1'] = delta1
         self.cfg_dict['fiber-latency']['delta2'] = delta2
-        print("Fiber latency : delta1 = %.2f , delta2 = %.2f" % (delta1,delta2))
+        self.uncertainty['fiber-latency'] = {'delta1' : u_delta1, 'delta2' : u_delta2}
+        self._finish(section)
+        metrics.completed("fiber-latency")
+
+        scalars = {}
+        for fiber in delays_dict :
+            scalars["rx-master-%s" % fiber] = delays_dict[fiber]['master'][1]
+            scalars["rx-slave-%s" % fiber] = delays_dict[fiber]['slave'][1]
+        # The ones of each measurement used in the fit (see analysis.recompute)
+        for (fiber, name), r in zip(steps, results) :
+            scalars["rx-master-%s" % name] = r['delays']['master'][1]
+            scalars["rx-slave-%s" % name] = r['delays']['slave'][1]
+        self._archive_run(section, "fiber-latency", series, scalars, params)
+
+        if self.fiber_cache != None :
+            self.fiber_cache.add_fiber_latency(delta1, delta2, self.cache_settings['fiber_set'], \
+            self._sfp_pair(), delay_ref=delay_ref, u_delta1=u_delta1, u_delta2=u_delta2)
+        print("Fiber latency : delta1 = %.2f +- %.2f , delta2 = %.2f +- %.2f" % \
+        (delta1, u_delta1, delta2, u_delta2))
 
     # ------------------------------------------------------------------------ #
 
-    def fiber_asymmetry(self, n_samples=10, t_samples=5, port = 1, sfp = "blue") :
+    @tracing.traced("fiber_asymmetry")
+    def fiber_asymmetry(self, n_samples=10, t_samples=5, port = 1, sfp = "blue", \
+    target=None, budget=None, slave_chans=None) :
         '''
         Method to calculate the fiber asymmetry.
 
@@ -394,12 +1603,30 @@ class WR_calibration() :
         called f1 and second one f2.
         Calculated values where stored in cfg_dict with the key "fiber-latency".
 
+        The procedure runs in steps (setup and one skew measurement per fiber).
+        The measurements are checkpointed when enable_checkpoint was called.
+
+        With slave_chans, the asymmetry is measured at once for the slaves
+        devices[1], devices[2]... fed by the master (devices[0]) through a
+        splitter, with the PPS of each one in an input of the instrument.
+        The value of the first slave is stored in cfg_dict and the one of every
+        slave in channel_asymmetry.
+
+        For port 1 and the blue SFP, the skews acquired by fiber_latency in
+        concurrent mode (see latency_skews) are used when they were sampled with
+        the same parameters, and the setup and acquisitions are skipped.
+
         Args:
             n_samples (int) : Indicates how many values will be used for computing \
             stadistics values.
             t_samples (int) : The time between samples.
+            target (float) : Target uncertainty (standard error, in ps). When \
+            target or budget are given, sampling is adaptive and n_samples is ignored.
+            budget (float) : Time budget (in s) for each acquisition.
             port (int) : The port used for connecting master to slave.
             sfp (str) : Indicates which sfp is used in WR slave device.
+            slave_chans (list) : Instrument input channels of the slaves, when \
+            several slaves are measured in one acquisition.
 
         Raises:
             WRDeviceNeeded if no WR devices are added.
@@ -407,8 +1634,12 @@ class WR_calibration() :
             FiberLatencyNeeded if no previous fiber latency measure is done.
             MeasurementInstrumentNeeded if no instruments are added.
         '''
-        if len(self.devices) < 2 :
-            raise WRDeviceNeeded("To measure fiber latency, at least, 2 WR devices are needed.")
+        from analysis import uncertainty
+
+        n_slaves = 1 if slave_chans == None else len(slave_chans)
+        if len(self.devices) < n_slaves + 1 :
+            raise WRDeviceNeeded("To measure fiber asymmetry, at least, %d WR devices are needed." % \
+            (n_slaves + 1))
 
         if self.instr == None :
             raise MeasurementInstrumentNeeded("To measure skew between PPS signals a measurement instrument must be added.")
@@ -416,87 +1647,151 @@ class WR_calibration() :
         if self.cfg_dict['fiber-latency']['delta1'] == 0 :
             raise FiberLatencyNeeded("A valid fiber latency values is needed to use this method.")
 
-        # Assign one device as master and the other as slave
+        if self._load_cached_reference("%s-wr%d"%(sfp,port), t_samples) :
+            return
+
+        # Assign one device as master and the others as slaves
         master = self.devices[0]
-        slave = self.devices[1]
+        slaves = self.devices[1:n_slaves+1]
+        slave = slaves[0]
+
+        section = "fiber-asymmetry-%s-wr%d" % (sfp,port)
+        params = {'n_samples' : n_samples, 't_samples' : t_samples, \
+        'target' : target, 'budget' : budget, 'port' : port, 'sfp' : sfp, \
+        'slave_chans' : slave_chans}
+        self._begin(section, params)
+        series = {}
+
+        # Skews of the fiber latency measurement, acquired with the same setup
+        reuse = {}
+        if slave_chans == None and port == 1 and sfp == "blue" and \
+        self.latency_skews.get('params') == {k : params[k] for k in ('n_samples', 't_samples', 'target', 'budget')} :
+            reuse = self.latency_skews
 
         # WR device configuration -----------------------------------
 
-        # First, set all delays and beta values in sfp database to 0
-        if self.show_dbg :
-            print("Setting initial parameters in WR devices...\n")
-            print("Erasing sfp database...")
-        master.erase_sfp_config()
-        slave.erase_sfp_config()
-
         if sfp == "blue" :
-            sfp_sn1 = "AXGE-1254-0531"
-            sfp_sn2 = "AXGE-3454-0531"
+            sfp_sn1 = self.sfp_sn["blue"]
+            sfp_sn2 = self.sfp_sn["violet"]
 
         else :
-            sfp_sn1 = "AXGE-3454-0531"
-            sfp_sn2 = "AXGE-1254-0531"
-
-        if self.show_dbg :
-            print("Writing initial configuration to sfp database...")
-        slave.write_sfp_config(sfp_sn1,port)
-        master.write_sfp_config(sfp_sn2,port)
-        master.load_sfp_config()
-        slave.load_sfp_config()
-        slave.set_slaveport(port)
-        master.set_master()
+            sfp_sn1 = self.sfp_sn["violet"]
+            sfp_sn2 = self.sfp_sn["blue"]
 
-        # Measure delay between the PPS signals
-        skew = []
+        def setup() :
+            for s in slaves :
+                self._setup_pair(master, s, port, sfp_sn1, sfp_sn2)
 
-        for fiber in self.fibers :
-            if fiber == 'f1+f2' : continue
+        if not all(f in reuse for f in self.fibers if f != 'f1+f2') :
+            self._step(section, "setup", setup, restore=False)
 
-            print("Please connect both WR devices with fiber %s and press Enter" % (fiber))
-            input()
-            print("Now connect their PPS outputs to the measurement instrument and press Enter")
-            input()
+        # Measure delay between the PPS signals, a list with one value per slave
+        skew = []
+        # Standard errors (in ps) by fiber, missing for the steps restored from a checkpoint
+        skew_u = {}
+
+        switch = self._get_switch()
+
+        def measure(fiber) :
+            if fiber in reuse :
+                print("Using the skew measured with fiber %s during the fiber latency measurement." % fiber)
+                mean_skews = [reuse[fiber]['value']]
+                skew_u[fiber] = [reuse[fiber]['stderr']]
+                intervals = [reuse[fiber]['ci']]
+                if reuse[fiber]['series'] != None :
+                    series["skew-%s" % fiber] = reuse[fiber]['series']
+            else :
+                mean_skews, intervals = acquire(fiber)
+
+            for n in range(len(mean_skews)) :
+                low, high = intervals[n]
+                # Change the sign when using blue SFP
+                if sfp == "blue" :
+                    mean_skews[n] *= -1
+                    low, high = -high, -low
+                # Only a skew surely above the limit is an error, not a noisy one
+                if low >= self.max_asymmetry_skew :
+                    raise MeasuringError("Time interval between input 1 and 2 is more than expected. Are the input channels adequately connected?")
+
+            return mean_skews
+
+        def acquire(fiber) :
+            with tracing.span("fiber-switch", "wait", fiber=fiber) :
+                switch.select_fiber(fiber, port)
+                switch.connect_pps()
             print("\nStarting fiber latency measurement procedure.\n")
-            time.sleep(1)
+            clock.sleep(1)
 
             # Wait until servo state in TRANCK PHASE
-            if self.show_dbg :
-                print("Waiting until TRACK PHASE.....")
-
-            while not slave.in_trackphase() :
-                time.sleep(2)
+            for s in slaves :
+                self._wait_trackphase(s)
 
             print("Measuring skew between PPS signals, it should take a long time...")
-            mean_skew = self.instr.mean_time_interval(n_samples, t_samples)
-            # Change the sign when using blue SFP
-            if sfp == "blue" :
-                mean_skew *= -1
-            if mean_skew >= 1e-6 :
-                raise MeasuringError("Time interval between input 1 and 2 is more than expected. Are the input channels adequately connected?")
-            skew.append(mean_skew)
+            sampler = self._sampler(n_samples, target, budget, 1e12)
+            if slave_chans == None :
+                mean_skews = [self._measure_skew(slave, n_samples, t_samples, sampler)]
+                results = [{'stats' : self.instr.stats}]
+                series["skew-%s" % fiber] = self._raw("skew")
+            else :
+                mean_skews = self._measure_skews(slave_chans, n_samples, t_samples, sampler)
+                results = self.instr.channel_results
+                for res in results :
+                    series["skew-%s-ch%d" % (fiber, res['chan'])] = \
+                    (res['timestamps'], res['samples'], res['accepted'])
+
+            skew_u[fiber] = [self._stderr(res['stats'], 1e12) for res in results]
+            return mean_skews, [self._interval(res['stats'], mean_skews[n] * 1e12, 1e12) \
+            for n, res in enumerate(results)]
 
-        # Calculate alpha and alpha_n -------------------------
+        for fiber in self.fibers :
+            if fiber == 'f1+f2' : continue
+            skew.append(self._step(section, "skew-%s" % fiber, lambda : measure(fiber)))
 
-        # Pass time measures from s to ps
-        skew[0] = skew[0] * 1e12
-        skew[1] = skew[1] * 1e12
-        if self.show_dbg :
-            print("Mean skew master to slave with f1: %G" % skew[0])
-            print("Mean skew master to slave with f2: %G" % skew[1])
+        # Calculate alpha and alpha_n -------------------------
 
-        dif = skew[1] - skew[0]
         delta_1 = self.cfg_dict['fiber-latency']['delta1']
         delta_2 = self.cfg_dict['fiber-latency']['delta2']
-        alpha = ( 2 * dif ) / ( 0.5 * delta_2 - dif )
-        alpha_n = pow(2,40) * ( ((alpha+1)/(alpha+2)) - 0.5 )
-        # When measuring with violet sfp in the slave device, it's needed change the sign
-        if sfp == "violet" : alpha_n = alpha_n * -1
+        asymmetry = []
+
+        for n in range(n_slaves) :
+            # Pass time measures from s to ps
+            skew_f1 = skew[0][n] * 1e12
+            skew_f2 = skew[1][n] * 1e12
+            self._dbg("Mean skew master to slave %d with f1: %G" % (n + 1, skew_f1))
+            self._dbg("Mean skew master to slave %d with f2: %G" % (n + 1, skew_f2))
+
+            dif = skew_f2 - skew_f1
+            alpha = ( 2 * dif ) / ( 0.5 * delta_2 - dif )
+            alpha_n = pow(2,40) * ( ((alpha+1)/(alpha+2)) - 0.5 )
+            # When measuring with violet sfp in the slave device, it's needed change the sign
+            if sfp == "violet" : alpha_n = alpha_n * -1
+
+            u_alpha_n = self._propagate(uncertainty.asymmetry, [skew_f1, skew_f2, delta_2], \
+            [skew_u['f1'][n] if 'f1' in skew_u else 0, skew_u['f2'][n] if 'f2' in skew_u else 0, \
+            self.uncertainty['fiber-latency'].get('delta2', 0)])
+            asymmetry.append((alpha_n, u_alpha_n))
+
+        alpha_n, u_alpha_n = asymmetry[0]
         self.cfg_dict['fiber-asymmetry']["%s-wr%d"%(sfp,port)] = alpha_n
-        print("Fiber asymmetry value for port %d and sfp %s = %d" % (port,sfp,alpha_n))
+        self.uncertainty['fiber-asymmetry']["%s-wr%d"%(sfp,port)] = u_alpha_n
+        self.channel_asymmetry["%s-wr%d"%(sfp,port)] = [a for a, u in asymmetry]
+        self._finish(section)
+        metrics.completed("fiber-asymmetry")
+        self._archive_run("fiber-asymmetry", "%s-wr%d"%(sfp,port), series, \
+        {'delta2' : delta_2}, params)
+
+        if self.fiber_cache != None :
+            self.fiber_cache.add_fiber_asymmetry(alpha_n, port, sfp, self.cache_settings['fiber_set'], \
+            sfp_sn1, u_alpha_n=u_alpha_n)
+        for n, (alpha_n, u_alpha_n) in enumerate(asymmetry) :
+            print("Fiber asymmetry value for port %d and sfp %s%s = %d +- %d" % (port, sfp, \
+            "" if slave_chans == None else " (CH%d)" % slave_chans[n], alpha_n, u_alpha_n))
 
     # ------------------------------------------------------------------------ #
 
-    def calibrate_device_port(self, error, n_samples=10, t_samples=5, port = 1, sfp = "blue") :
+    @tracing.traced("calibrate_device_port")
+    def calibrate_device_port(self, error, n_samples=10, t_samples=5, port = 1, sfp = "blue", \
+    target=None, budget=None, strategy=None) :
         '''
         Method to calibrate a port for a WR device.
 
@@ -509,14 +1804,30 @@ class WR_calibration() :
         Remove WR devices associated to the program before calling this method.
         Use remove_wr_devices().
 
+        The procedure runs in steps (setup, coarse delays and one step per
+        iteration). The measurements are checkpointed when enable_checkpoint
+        was called, the setup and the final delays are written again on
+        resume. Each iteration writes the delays it measures, so it can be
+        retried or resumed on its own.
+
+        The delay corrections and the samples of each iteration are chosen by
+        a Convergence_strategy. The iterations (delays, skew, uncertainty and
+        samples) are stored in convergence_trace with the port key.
+
         Args:
             error (float) : The minimal time difference accepted (in ps). It will depend of the \
-            measuring instrument.
+            measuring instrument. The port is calibrated when the confidence \
+            interval of the skew is inside [-error, error].
             n_samples (int) : Indicates how many values will be used for computing \
             stadistics values.
             t_samples (int) : The time between samples.
+            target (float) : Target uncertainty (standard error, in ps). When \
+            target or budget are given, sampling is adaptive and n_samples is ignored.
+            budget (float) : Time budget (in s) for each acquisition.
             port (int) : The port used for connecting master to slave.
             sfp (str) : Indicates which sfp is used in WR slave device.
+            strategy (Convergence_strategy) : Strategy for the delay iteration, \
+            by default Fixed_step (the skew is the correction).
 
         Raises:
             WRDeviceNeeded if a slave device is not connected.
@@ -526,115 +1837,169 @@ class WR_calibration() :
             FiberLatencyNeeded if no previous fiber latency measure is done.
             FiberAsymmetryNeeded if no previous fiber asymmetry measure is done.
         '''
+        from analysis import uncertainty
+
         if len(self.devices) < 1 :
             raise WRDeviceNeeded("To measure fiber latency, at least, 2 WR devices are needed.")
 
         if self.instr == None :
             raise MeasurementInstrumentNeeded("To measure skew between PPS signals a measurement instrument must be added.")
 
+        key = "%s-wr%d"%(sfp,port)
+        if self.cfg_dict['fiber-latency']['delta1'] == 0 or key not in self.cfg_dict['fiber-asymmetry'] :
+            self._load_cached_reference(key, verify=False)
+
         if self.cfg_dict['fiber-latency']['delta1'] == 0 :
             raise FiberLatencyNeeded("A valid fiber latency values are needed to use this method.")
-
-        key = "%s-wr%d"%(sfp,port)
         if key not in self.cfg_dict['fiber-asymmetry'] :
             raise FiberLatencyNeeded("Fiber asymmetry value for port %d and sfp %s is needed." % (port,sfp))
 
         # Assign the device that will be calibrated
         slave = self.devices[0]
 
-        # WR device configuration -----------------------------------
-
-        # First, set dTx and Rx to 0, and beta to a previously measured value.
-        if self.show_dbg :
-            print("Setting initial parameters in WR devices...\n")
-            print("Erasing sfp database...")
-        slave.erase_sfp_config()
-
-        if self.show_dbg :
-            print("Writing initial configuration to sfp database...")
         if sfp == "blue" :
-            sfp_sn = "AXGE-1254-0531"
-        else : sfp_sn = "AXGE-3454-0531"
-        key = "%s-wr%d"%(sfp,port)
+            sfp_sn = self.sfp_sn["blue"]
+        else : sfp_sn = self.sfp_sn["violet"]
         beta = self.cfg_dict['fiber-asymmetry'][key]
-        slave.write_sfp_config(sfp_sn, port, 0, 0, beta)
-        slave.load_sfp_config()
-        slave.set_slaveport(port)
+        delta1 = self.cfg_dict['fiber-latency']['delta1']
 
-        input("Pleasse connect the WR calibrator to the uncalibrated device with fiber f1 and press Enter")
-        print("\nStarting device calibration procedure.\n")
-        # Wait until servo state in TRANCK PHASE
-        if self.show_dbg :
-            print("Waiting until TRACK PHASE.....")
-        while not slave.in_trackphase() :
-            time.sleep(2)
+        section = "port-delay-%s" % key
+        params = {'error' : error, 'n_samples' : n_samples, 't_samples' : t_samples, \
+        'target' : target, 'budget' : budget, 'port' : port, 'sfp' : sfp, \
+        'beta' : beta, 'delta1' : delta1}
+        self._begin(section, params)
+        series = {}
+        scalars = {'delta1' : delta1}
 
-        if self.show_dbg :
-            print("Calculating coarse Tx and Rx delays ...")
-        mean_rtt = 0
-        for i in range(n_samples) :
-            rtt = slave.get_rtt()
-            mean_rtt += rtt
-            time.sleep(t_samples)
-        mean_rtt /= n_samples
-
-        delays_dict = slave.get_phy_delays()
-        dtxm = delays_dict['master'][0]
-        drxm = delays_dict['master'][1]
-        bitslide = delays_dict['slave'][1]
-        delta1 = self.cfg_dict['fiber-latency']['delta1']
+        # WR device configuration -----------------------------------
 
-        coarse_delays = 0.5 * ( mean_rtt - dtxm - drxm - bitslide - delta1 )
+        def setup() :
+            # First, set dTx and Rx to 0, and beta to a previously measured value.
+            self._dbg("Setting initial parameters in WR devices...\n")
+            self._dbg("Erasing sfp database...")
+            slave.erase_sfp_config()
 
-        slave.erase_sfp_config()
-        slave.write_sfp_config(sfp_sn, port, coarse_delays, coarse_delays, beta)
-        slave.load_sfp_config()
+            self._dbg("Writing initial configuration to sfp database...")
+            slave.write_sfp_config(sfp_sn, port, 0, 0, beta)
+            slave.load_sfp_config()
+            slave.set_slaveport(port)
 
-        if self.show_dbg :
-            print("Coarse transmission and reception delays = %d" % coarse_delays)
-        print("Calibrating device ...")
+            with tracing.span("fiber-switch", "wait", fiber="f1") :
+                self._get_switch().connect_calibrator("f1", port)
 
-        # Keep adjusting delays, while the skew is higher than error.
-        # A iteration limit is set for avoiding a infinite loop.
-        times = 10
-        i = 0
-        mean_skew = 1e10
-        old_dtxs = coarse_delays
-        old_drxs = coarse_delays
+        self._step(section, "setup", setup, restore=False)
 
-        while abs(mean_skew) > error and i < times:
+        def coarse() :
+            print("\nStarting device calibration procedure.\n")
             # Wait until servo state in TRANCK PHASE
-            if self.show_dbg :
-                print("Waiting until TRACK PHASE.....")
+            self._wait_trackphase(slave)
 
-            while not slave.in_trackphase() :
-                time.sleep(2)
+            self._dbg("Calculating coarse Tx and Rx delays ...")
+            mean_rtt = self._mean_rtt(slave, n_samples, t_samples, \
+            self._sampler(n_samples, target, budget))
 
-            print("Measuring skew between PPS signals, it should take a long time...")
-            mean_skew = self.instr.mean_time_interval(n_samples, t_samples)
+            delays_dict = slave.get_phy_delays()
+            dtxm = delays_dict['master'][0]
+            drxm = delays_dict['master'][1]
+            bitslide = delays_dict['slave'][1]
+            series["rtt-coarse"] = self._raw("rtt")
+            scalars.update({'dtxm' : dtxm, 'drxm' : drxm, 'bitslide' : bitslide})
 
-            # Write the new delay value
-            # mean_skew must be in ps
-            mean_skew *= 1e12
-            print("skew = %f" % mean_skew)
-            dtxs = old_dtxs - mean_skew
-            drxs = old_drxs + mean_skew
+            return 0.5 * ( mean_rtt - dtxm - drxm - bitslide - delta1 )
+
+        coarse_delays = self._step(section, "coarse", coarse)
 
-            if self.show_dbg :
-                print("Writing current delays %d,%d to sfp database..." % (dtxs,drxs))
+        self._dbg("Coarse transmission and reception delays = %d" % coarse_delays)
+        print("Calibrating device ...")
+
+        def write_delays(dtxs, drxs) :
+            self._dbg("Writing current delays %d,%d to sfp database..." % (dtxs,drxs))
             slave.erase_sfp_config()
             slave.write_sfp_config(sfp_sn, port, dtxs, drxs, beta)
             slave.load_sfp_config()
-            old_dtxs = dtxs
-            old_drxs = drxs
+
+        def iteration(dtxs, drxs, n_iter) :
+            write_delays(dtxs, drxs)
+
+            # Wait until servo state in TRANCK PHASE
+            self._wait_trackphase(slave)
+
+            print("Measuring skew between PPS signals, it should take a long time...")
+            # Coarse iterations don't use adaptive sampling
+            if n_iter < n_samples :
+                sampler = self._sampler(n_iter, None, None)
+            else :
+                sampler = self._sampler(n_samples, target, budget, 1e12)
+            mean_skew = self._measure_skew(slave, n_iter, t_samples, sampler)
+            series["skew-%d" % i] = self._raw("skew")
+
+            # mean_skew must be in ps
+            return {'skew' : mean_skew * 1e12, 'stderr' : self._stderr(self.instr.stats, 1e12), \
+            'n' : n_iter, 'ci' : self._interval(self.instr.stats, mean_skew * 1e12, 1e12)}
+
+        if strategy == None :
+            strategy = Fixed_step()
+        strategy.reset()
+        trace = []
+        self.convergence_trace[key] = trace
+
+        # Keep adjusting delays until the skew is surely lower than error (its
+        # confidence interval is inside [-error, error]), so a noisy skew
+        # doesn't end the calibration.
+        # A iteration limit is set for avoiding a infinite loop.
+        # Only a full measurement (not a coarse one) can end the loop.
+        times = 10
+        i = 0
+        mean_skew = 1e10
+        converged = False
+        full = False
+        dtxs = coarse_delays
+        drxs = coarse_delays
+
+        while (not converged or not full) and i < times:
+            n_iter = strategy.n_samples(n_samples, error)
+            result = self._step(section, "iteration-%d" % i, \
+            lambda : iteration(dtxs, drxs, n_iter))
+            mean_skew = result['skew']
+            low, high = result.get('ci', [mean_skew, mean_skew])
+            converged = -error <= low and high <= error
+            full = result['n'] >= n_samples
+            print("skew = %f (%.2f .. %.2f)" % (mean_skew, low, high))
+            trace.append({'iteration' : i, 'dtxs' : dtxs, 'drxs' : drxs, 'skew' : mean_skew, \
+            'stderr' : result['stderr'], 'ci' : [low, high], 'n_samples' : result['n']})
+            scalars["dtxs-%d" % i] = dtxs
+            scalars["drxs-%d" % i] = drxs
+
+            # Calculate the new delay values
+            correction = strategy.update(dtxs, mean_skew, result['stderr'])
+            dtxs = dtxs - correction
+            drxs = drxs + correction
 
             i += 1
 
-        if self.show_dbg and i == times:
-            print("Exceeded limit of iterations")
+        if i == times:
+            self._dbg("Exceeded limit of iterations")
+
+        # Write the last delay values
+        self._step(section, "write", lambda : write_delays(dtxs, drxs), restore=False)
 
         # Store measured delay values
         self.cfg_dict['port-delay'][key] = (dtxs,drxs)
-        print("Port calibrated.")
-        if self.show_dbg :
-            print("dtxs = %d , drxs = %d, final skew = %f" % (dtxs,drxs,mean_skew))
+        # The iterations remove the error of the coarse delays, the last
+        # correction is as uncertain as the last skew and the fiber asymmetry
+        u_delay = 0
+        if len(trace) > 0 :
+            u_delay = self._propagate(uncertainty.port_delay, \
+            [trace[-1]['dtxs'], trace[-1]['skew'], beta, beta, delta1], [0, trace[-1]['stderr'], \
+            self.uncertainty['fiber-asymmetry'].get(key, 0), 0, \
+            self.uncertainty['fiber-latency'].get('delta1', 0)])
+        self.uncertainty['port-delay'][key] = (u_delay, u_delay)
+        self._finish(section)
+        metrics.completed("port-delay")
+        scalars['iterations'] = i
+        self._archive_run("port-delay", key, series, scalars, params)
+        print("Port calibrated in %d iterations (delays +- %.1f ps)." % (i, u_delay))
+        self._dbg("dtxs = %d , drxs = %d, final skew = %f" % (dtxs,drxs,mean_skew))
+        for it in trace :
+            self._dbg("-- iteration %d : dtxs = %.1f, drxs = %.1f, skew = %.2f +- %.2f (%d samples)" % \
+            (it['iteration'], it['dtxs'], it['drxs'], it['skew'], it['stderr'], it['n_samples']))
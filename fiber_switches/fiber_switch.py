@@ -0,0 +1,94 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Abstract class to define the API for a fiber switch
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup fiber_switches
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import abc
+
+# This attribute permits dynamic loading inside wrcalibration class.
+__fiber_switch__ = "Fiber_switch"
+
+class Fiber_switch() :
+    '''
+    Fiber switch API
+
+    Abstract class that represents the API used by the calibration procedure
+    each time the fiber between the WR devices or the PPS cabling must change.
+
+    The fibers are named as in WR_calibration: "f1", "f2" and "f1+f2". A
+    concrete class could ask an operator to do it (Interactive_switch) or
+    drive a motorized optical switch, so a calibration can run unattended.
+    '''
+    __metaclass__ = abc.ABCMeta
+
+    ## Enable debug message output
+    show_dbg = False
+
+    @abc.abstractmethod
+    def select_fiber(self, fiber, port=1) :
+        '''
+        Abstract method to connect master and slave WR devices with a fiber.
+
+        The method must return when the fiber is connected.
+
+        Args:
+            fiber (str) : Fiber name: "f1", "f2" or "f1+f2".
+            port (int) : Port of the WR devices used for the link.
+
+        Raises:
+            ValueError if the fiber is not available in the switch.
+        '''
+
+    # ------------------------------------------------------------------------ #
+
+    @abc.abstractmethod
+    def connect_pps(self) :
+        '''
+        Abstract method to connect the PPS outputs of the WR devices to the
+        measurement instrument.
+        '''
+
+    # ------------------------------------------------------------------------ #
+
+    @abc.abstractmethod
+    def connect_calibrator(self, fiber="f1", port=1) :
+        '''
+        Abstract method to connect the WR calibrator to the device under
+        calibration.
+
+        Args:
+            fiber (str) : Fiber name used for the link.
+            port (int) : Port of the device under calibration.
+        '''
+
+    # ------------------------------------------------------------------------ #
+
+    def close(self) :
+        '''
+        Method to release the switch. By default it does nothing.
+        '''
@@ -0,0 +1,84 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Class that implements the interface Fiber_switch asking an operator.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup fiber_switches
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# User modules
+from fiber_switches.fiber_switch import *
+
+# This attribute permits dynamic loading inside wrcalibration class.
+__fiber_switch__ = "Interactive_switch"
+
+class Interactive_switch(Fiber_switch) :
+    '''
+    Class that implements the interface Fiber_switch asking an operator.
+
+    This is the default switch of WR_calibration: each change is requested
+    with a message and the procedure waits until Enter is pressed.
+    '''
+
+    def __init__(self) :
+        '''
+        Constructor
+        '''
+        self.show_dbg = False
+
+    # ------------------------------------------------------------------------ #
+
+    def select_fiber(self, fiber, port=1) :
+        '''
+        Method to ask the operator to connect the WR devices with a fiber.
+
+        Args:
+            fiber (str) : Fiber name: "f1", "f2" or "f1+f2".
+            port (int) : Port of the WR devices used for the link.
+        '''
+        print("Please connect both WR devices with fiber %s on port %d and press Enter"\
+        % (fiber,port))
+        input()
+
+    # ------------------------------------------------------------------------ #
+
+    def connect_pps(self) :
+        '''
+        Method to ask the operator to connect the PPS outputs to the instrument.
+        '''
+        print("Now connect their PPS outputs to the measurement instrument and press Enter")
+        input()
+
+    # ------------------------------------------------------------------------ #
+
+    def connect_calibrator(self, fiber="f1", port=1) :
+        '''
+        Method to ask the operator to connect the WR calibrator.
+
+        Args:
+            fiber (str) : Fiber name used for the link.
+            port (int) : Port of the device under calibration.
+        '''
+        input("Please connect the WR calibrator to the uncalibrated device with fiber %s "\
+        "on port %d and press Enter" % (fiber,port))
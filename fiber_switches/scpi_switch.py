@@ -0,0 +1,191 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Class that implements the interface Fiber_switch for SCPI optical switches.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup fiber_switches
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# User modules
+from fiber_switches.fiber_switch import *
+from main.wrcexceptions          import *
+from main                        import clock
+
+# This attribute permits dynamic loading inside wrcalibration class.
+__fiber_switch__ = "SCPI_switch"
+# Plugin metadata, read by main.registry without importing this module.
+__interfaces__ = ("serial",)
+__requires__ = ("serial",)
+
+class SCPI_switch(Fiber_switch) :
+    '''
+    Class that implements the interface Fiber_switch for SCPI optical switches.
+
+    It drives a motorized optical switch (or a switch matrix) through a serial
+    port using SCPI commands. Each fiber name is mapped to a switch channel
+    and routed with route_cmd; after each change the switch is asked with
+    *OPC? and its error queue is checked.
+
+    PPS cabling changes are done with pps_cmd if the rig has a switch for
+    them, otherwise the PPS outputs must be permanently connected to the
+    measurement instrument.
+    '''
+
+    ## Default mapping from fiber names to switch channels
+    DEF_CHANNELS = {"f1" : 1, "f2" : 2, "f1+f2" : 3}
+
+    def __init__(self, port, baudrate=9600, channels=None, calibrator_channels=None, \
+    route_cmd="ROUT:CLOS (@%d)", pps_cmd=None, settle=0.5, timeout=2) :
+        '''
+        Constructor
+
+        Args:
+            port (str) : Serial port of the switch (i.e. "/dev/ttyUSB2").
+            baudrate (int) : Baud rate of the serial port.
+            channels (dict) : Fiber name to switch channel for master-slave links.
+            calibrator_channels (dict) : Fiber name to switch channel for the \
+            WR calibrator links. By default, the same as channels.
+            route_cmd (str) : SCPI command template to close a channel.
+            pps_cmd (str) : SCPI command to route the PPS signals, if any.
+            settle (float) : Time to wait after a change (in s).
+            timeout (float) : Read timeout (in s).
+        '''
+        # pyserial is only needed when this backend is used
+        import serial
+
+        self.bus = serial.Serial(port=port, baudrate=baudrate, timeout=timeout)
+        self.channels = channels if channels != None else dict(self.DEF_CHANNELS)
+        self.calibrator_channels = calibrator_channels if calibrator_channels != None \
+        else self.channels
+        self.route_cmd = route_cmd
+        self.pps_cmd = pps_cmd
+        self.settle = settle
+        self.show_dbg = False
+
+    # ------------------------------------------------------------------------ #
+
+    def write(self, cmd) :
+        '''
+        Method to write a SCPI command to the switch.
+
+        Args:
+            cmd (str) : A SCPI command.
+        '''
+        if self.show_dbg :
+            print("SCPI_switch << %s" % cmd)
+        self.bus.write(str.encode("%s\n" % cmd))
+
+    # ------------------------------------------------------------------------ #
+
+    def query(self, cmd) :
+        '''
+        Method to write a SCPI command and read the response.
+
+        Args:
+            cmd (str) : A SCPI query.
+
+        Returns:
+            The response without the line terminator.
+        '''
+        self.write(cmd)
+        ret = bytes.decode(self.bus.readline()).strip()
+        if self.show_dbg :
+            print("SCPI_switch >> %s" % ret)
+
+        return ret
+
+    # ------------------------------------------------------------------------ #
+
+    def _route(self, cmd) :
+        '''
+        Method to run a route command and wait until it's completed.
+
+        Raises:
+            SwitchError if the switch doesn't complete the command or reports an error.
+        '''
+        self.write(cmd)
+        if self.query("*OPC?") != "1" :
+            raise SwitchError("SCPI_switch ERROR: '%s' not completed." % cmd)
+        err = self.query("SYST:ERR?")
+        if not err.startswith("0") and not err.startswith("+0") :
+            raise SwitchError("SCPI_switch ERROR: '%s' : %s" % (cmd, err))
+        clock.sleep(self.settle)
+
+    # ------------------------------------------------------------------------ #
+
+    def select_fiber(self, fiber, port=1) :
+        '''
+        Method to connect master and slave WR devices with a fiber.
+
+        Args:
+            fiber (str) : Fiber name: "f1", "f2" or "f1+f2".
+            port (int) : Port of the WR devices used for the link (the switch \
+            must be wired to it).
+
+        Raises:
+            ValueError if the fiber is not mapped to a switch channel.
+            SwitchError if the switch fails.
+        '''
+        if fiber not in self.channels :
+            raise ValueError("SCPI_switch ERROR: Fiber %s not mapped to a channel." % fiber)
+        self._route(self.route_cmd % self.channels[fiber])
+
+    # ------------------------------------------------------------------------ #
+
+    def connect_pps(self) :
+        '''
+        Method to route the PPS outputs to the measurement instrument.
+
+        Raises:
+            SwitchError if the switch fails.
+        '''
+        if self.pps_cmd != None :
+            self._route(self.pps_cmd)
+
+    # ------------------------------------------------------------------------ #
+
+    def connect_calibrator(self, fiber="f1", port=1) :
+        '''
+        Method to connect the WR calibrator to the device under calibration.
+
+        Args:
+            fiber (str) : Fiber name used for the link.
+            port (int) : Port of the device under calibration.
+
+        Raises:
+            ValueError if the fiber is not mapped to a switch channel.
+            SwitchError if the switch fails.
+        '''
+        if fiber not in self.calibrator_channels :
+            raise ValueError("SCPI_switch ERROR: Fiber %s not mapped to a channel." % fiber)
+        self._route(self.route_cmd % self.calibrator_channels[fiber])
+        self.connect_pps()
+
+    # ------------------------------------------------------------------------ #
+
+    def close(self) :
+        '''
+        Method to close the serial port.
+        '''
+        self.bus.close()
@@ -0,0 +1,115 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Class that implements the interface Fiber_switch for a simulated switch.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup fiber_switches
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# User modules
+from fiber_switches.fiber_switch import *
+
+# This attribute permits dynamic loading inside wrcalibration class.
+__fiber_switch__ = "Sim_switch"
+
+class Sim_switch(Fiber_switch) :
+    '''
+    Class that implements the interface Fiber_switch for a simulated switch.
+
+    It doesn't need any hardware. The current route is kept in the object and
+    every change is logged in history, so it's useful for testing the
+    procedures and for dry runs. An optional callback is called on each change
+    to update a simulated link.
+    '''
+
+    def __init__(self, fibers=("f1","f2","f1+f2"), on_change=None) :
+        '''
+        Constructor
+
+        Args:
+            fibers (tuple) : Available fiber names.
+            on_change (callable) : Called as on_change(route) after each change, \
+            where route is a dict with keys fiber, port, pps and calibrator.
+        '''
+        self.fibers = fibers
+        self.on_change = on_change
+        self.show_dbg = False
+        self.route = {'fiber' : None, 'port' : None, 'pps' : False, 'calibrator' : False}
+        self.history = []
+
+    # ------------------------------------------------------------------------ #
+
+    def _changed(self, action) :
+        '''
+        Method to log a route change and notify it.
+        '''
+        self.history.append((action, dict(self.route)))
+        if self.show_dbg :
+            print("Sim_switch : %s %s" % (action, self.route))
+        if self.on_change != None :
+            self.on_change(dict(self.route))
+
+    # ------------------------------------------------------------------------ #
+
+    def select_fiber(self, fiber, port=1) :
+        '''
+        Method to route the link between the WR devices through a fiber.
+
+        Args:
+            fiber (str) : Fiber name: "f1", "f2" or "f1+f2".
+            port (int) : Port of the WR devices used for the link.
+
+        Raises:
+            ValueError if the fiber is not available.
+        '''
+        if fiber not in self.fibers :
+            raise ValueError("Sim_switch ERROR: Fiber %s not available." % fiber)
+        self.route['fiber'] = fiber
+        self.route['port'] = port
+        self.route['calibrator'] = False
+        self._changed("select_fiber")
+
+    # ------------------------------------------------------------------------ #
+
+    def connect_pps(self) :
+        '''
+        Method to route the PPS outputs to the measurement instrument.
+        '''
+        self.route['pps'] = True
+        self._changed("connect_pps")
+
+    # ------------------------------------------------------------------------ #
+
+    def connect_calibrator(self, fiber="f1", port=1) :
+        '''
+        Method to route the WR calibrator to the device under calibration.
+
+        Args:
+            fiber (str) : Fiber name used for the link.
+            port (int) : Port of the device under calibration.
+        '''
+        self.select_fiber(fiber, port)
+        self.route['calibrator'] = True
+        self.route['pps'] = True
+        self._changed("connect_calibrator")
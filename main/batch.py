@@ -0,0 +1,512 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Batch calibration runner driven by job files.
+
+Usage (from the root folder of the package):
+
+    python3 -m main.batch job.json [job2.json ...] [--dry-run] [--verbose] [--metrics-port N]
+
+A job file is a JSON document describing the bench and the calibration plan:
+
+    {
+      "name"       : "rig-1",
+      "switch"     : {"name" : "scpi_switch", "params" : ["/dev/ttyUSB4"]},
+      "instrument" : {"name" : "FCA3103", "params" : [0, 1, 2], "trig_level" : [1.3, 1.3]},
+      "sfp_sn"     : {"blue" : "AXGE-1254-0531", "violet" : "AXGE-3454-0531"},
+      "sampling"   : {"n_samples" : 10, "t_samples" : 5, "target" : null, "budget" : null},
+      "store"      : "results.db",
+      "fiber_set"  : "f1:A12,f2:B3",
+      "fiber_cache": {"validity" : 7, "verify" : 10},
+      "config"     : "reference.cfg",
+      "output"     : "configs",
+      "reference"  : {"devices" : [{"name" : "wr_len", "interface" : "usb", "port" : 0},
+                                  {"name" : "wr_len", "interface" : "usb", "port" : 1}],
+                      "asymmetry" : [{"port" : 1, "sfp" : "blue"}]},
+      "duts"       : [{"serial" : "LEN-0001", "name" : "wr_len", "interface" : "usb",
+                       "port" : 2, "ports" : [1], "sfp" : "blue", "error" : 10}]
+    }
+
+Only switch, instrument and duts are mandatory. Without trig_level, the
+trigger level is searched with the reference devices. Without a reference
+section, the fiber latency and asymmetry values are taken from config or from
+the fiber cache of store.
+
+The plan (fiber latency, trigger level, fiber asymmetries and the ports of each
+DUT) runs without an operator. The output of the procedures goes to a log file
+and a progress line is shown for each task. The completed tasks and the steps
+of the running procedure are checkpointed in a state file, so running the same
+job again resumes it. The port delays of each calibrated DUT are stored in
+store and its configuration is written to <output>/<serial>.cfg. A measured
+fiber reference is stored once.
+
+With several job files (i.e. one for each rig), each job runs in its own
+calibration session (see calibration.session) and the jobs run in parallel.
+
+Exit codes: 0 when every task succeeded, 1 when some DUT failed (the others
+are calibrated anyway), 2 when the job file is not valid, 3 when the bench
+can't be set up or the reference can't be measured and 130 when interrupted.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup main
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
+import threading
+
+# User modules
+from main import clock
+from main import metrics
+from main.wrcexceptions import JobError
+from calibration.session import Calibration_session, session_output
+from calibration.results_store import Results_store
+from wr_devices.wr_device import WR_interfaces
+
+## Exit codes
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_JOB = 2
+EXIT_REFERENCE = 3
+EXIT_INTERRUPTED = 130
+
+def load_job(path, bench=False) :
+    '''
+    Function to read and validate a job file.
+
+    Args:
+        path (str) : Path to the JSON job file.
+        bench (bool) : When True, the file describes a bench of a calibration \
+        farm (see calibration.farm): duts is optional and a dut key with the \
+        device where the DUTs are connected is needed.
+
+    Returns:
+        The job dict, with defaults for the optional keys.
+
+    Raises:
+        JobError if the file can't be read or a key is not valid.
+    '''
+    try :
+        with open(path, 'r', encoding='utf-8') as f :
+            job = json.load(f)
+    except (OSError, ValueError) as e :
+        raise JobError("Can't read job file %s: %s" % (path, e))
+
+    if not isinstance(job, dict) :
+        raise JobError("A job file must contain a JSON object.")
+    if bench :
+        job.setdefault("duts", [])
+    for key in ("switch", "instrument", "duts") + (("dut",) if bench else ()) :
+        if key not in job :
+            raise JobError("Key %s is needed for an unattended run." % key)
+
+    base = os.path.splitext(path)[0]
+    job.setdefault("name", os.path.basename(base))
+    job.setdefault("state", base + ".state")
+    job.setdefault("log", base + ".log")
+    job.setdefault("fiber_set", "default")
+    job.setdefault("sampling", {})
+    job.setdefault("reference", None)
+
+    devices = [d for d in job['duts']] + ([job['dut']] if bench else [])
+    if job['reference'] != None :
+        devices += job['reference'].get("devices", [])
+        if len(job['reference'].get("devices", [])) != 2 :
+            raise JobError("The reference needs 2 WR devices (master and slave).")
+    for dev in devices :
+        if dev.get("interface", "usb") not in WR_interfaces.__members__ :
+            raise JobError("Unknown interface %s." % dev.get("interface"))
+        if "port" not in dev :
+            raise JobError("A port is needed for each WR device.")
+
+    serials = [dut.get("serial") for dut in job['duts']]
+    if None in serials or len(set(serials)) != len(serials) :
+        raise JobError("Each DUT needs a unique serial.")
+    if "fiber_cache" in job and "store" not in job :
+        raise JobError("fiber_cache needs a store.")
+
+    return job
+
+# ---------------------------------------------------------------------------- #
+
+def device_params(dev) :
+    '''
+    Function to build the add_wr_device arguments of a device in a job file.
+    '''
+    return dev.get("name", "wr_len"), [WR_interfaces[dev.get("interface", "usb")], dev['port']]
+
+# ---------------------------------------------------------------------------- #
+
+class Batch_runner() :
+    '''
+    Runner of the calibration plan of a job.
+
+    All the tasks share a Calibration_session: the reference devices are
+    added for the fiber tasks and replaced by each DUT for its port tasks.
+    '''
+
+    def __init__(self, job, out=None, label="") :
+        '''
+        Constructor
+
+        Args:
+            job (dict) : A job (see load_job).
+            out (file) : Where the progress is shown, by default the stdout \
+            of the process.
+            label (str) : Prefix of the progress lines.
+        '''
+        self.job = job
+        self.session = Calibration_session(job['name'])
+        self.out = out if out != None else session_output().default
+        self.label = label
+        ## Set it to stop the run before the next task
+        self.stop = threading.Event()
+        self.cal = None
+        self.store = None
+        self.section = "batch-%s" % job['name']
+        ## Plan, a list of (name, function, reference task?)
+        self.tasks = []
+        ## Results of the completed tasks, by name
+        self.results = {}
+        ## Tasks to run again even if they are in the state file
+        self.redo = set()
+        ## Errors of the tasks failed in the last run, by name
+        self.errors = {}
+        self.failed = []
+
+        ref = job['reference']
+        if ref != None :
+            self.tasks.append(("fiber-latency", self._fiber_latency, True))
+        if job['instrument'].get("trig_level") == None :
+            self.tasks.append(("trigger-level", self._trigger_level, True))
+        if ref != None :
+            for asym in ref.get("asymmetry", [{}]) :
+                port = asym.get("port", 1)
+                sfp = asym.get("sfp", "blue")
+                self.tasks.append(("fiber-asymmetry-%s-wr%d" % (sfp, port), \
+                lambda port=port, sfp=sfp : self._fiber_asymmetry(port, sfp), True))
+        for dut in job['duts'] :
+            self.add_dut(dut)
+
+    # ------------------------------------------------------------------------ #
+
+    def add_dut(self, dut) :
+        '''
+        Method to add the port tasks of a DUT to the plan.
+
+        Args:
+            dut (dict) : A DUT, as in the duts list of a job file.
+
+        Returns:
+            The names of the new tasks.
+        '''
+        names = []
+        for port in dut.get("ports", [1]) :
+            name = "%s-%s-wr%d" % (dut['serial'], dut.get("sfp", "blue"), port)
+            self.tasks.append((name, lambda dut=dut, port=port : self._port(dut, port), False))
+            names.append(name)
+        return names
+
+    # ------------------------------------------------------------------------ #
+
+    def forget(self, names) :
+        '''
+        Method to forget the results of some tasks, so the next run measures
+        them again.
+
+        Args:
+            names (list) : Names of the tasks.
+        '''
+        for name in names :
+            self.results.pop(name, None)
+            self.redo.add(name)
+
+    # ------------------------------------------------------------------------ #
+
+    def _progress(self, msg) :
+        '''
+        Method to show a progress line.
+        '''
+        self.out.write(self.label + msg + "\n")
+        self.out.flush()
+
+    # ------------------------------------------------------------------------ #
+
+    def _open(self) :
+        '''
+        Method to open the calibration session and the bench.
+        '''
+        job = self.job
+        cal = self.session.calibration
+        cal.enable_checkpoint(job['state'], job.get("retries", 1))
+        cal.add_fiber_switch(job['switch']['name'], job['switch'].get("params", []))
+        instr = job['instrument']
+        cal.add_meas_instr(instr.get("name", "FCA3103"), instr.get("params", [0, 1, 2]))
+        if instr.get("trig_level") != None :
+            cal.instr.trig_level = list(instr['trig_level'])
+        cal.sfp_sn.update(job.get("sfp_sn", {}))
+
+        if "config" in job :
+            cal.read_config(job['config'])
+        if "store" in job :
+            self.store = Results_store(job['store'])
+            if "fiber_cache" in job :
+                cal.enable_fiber_cache(self.store, job['fiber_set'], **job['fiber_cache'])
+
+        self.cal = cal
+        cal.checkpoint.begin(self.section, {'name' : job['name']})
+
+    # ------------------------------------------------------------------------ #
+
+    def _use_devices(self, devices) :
+        '''
+        Method to replace the WR devices of the session.
+        '''
+        self.cal.remove_wr_devices()
+        for dev in devices :
+            name, params = device_params(dev)
+            self.cal.add_wr_device(name, params)
+
+    # ------------------------------------------------------------------------ #
+
+    def _sampling(self, *keys) :
+        return {k : v for k, v in self.job['sampling'].items() if k in keys}
+
+    # ------------------------------------------------------------------------ #
+
+    def _store_reference(self, cfg) :
+        '''
+        Method to store a measured fiber reference value, once per job. With a
+        fiber cache, WR_calibration already stores it.
+        '''
+        if self.store != None and "fiber_cache" not in self.job :
+            self.store.store_config(cfg, fiber_set=self.job['fiber_set'], sfp_sn=self.cal.sfp_sn, \
+            uncertainty=self.cal.uncertainty)
+
+    # ------------------------------------------------------------------------ #
+
+    def _fiber_latency(self) :
+        self._use_devices(self.job['reference']['devices'])
+        self.cal.fiber_latency(**self._sampling("n_samples", "t_samples", "target", "budget"))
+        self._store_reference({'fiber-latency' : self.cal.cfg_dict['fiber-latency']})
+        return dict(self.cal.cfg_dict['fiber-latency'])
+
+    # ------------------------------------------------------------------------ #
+
+    def _trigger_level(self) :
+        if self.job['reference'] != None :
+            self._use_devices(self.job['reference']['devices'])
+        self.cal.instr.trigger_level()
+        return list(self.cal.instr.trig_level)
+
+    # ------------------------------------------------------------------------ #
+
+    def _fiber_asymmetry(self, port, sfp) :
+        self._use_devices(self.job['reference']['devices'])
+        self.cal.fiber_asymmetry(port=port, sfp=sfp, \
+        **self._sampling("n_samples", "t_samples", "target", "budget"))
+        key = "%s-wr%d" % (sfp, port)
+        self._store_reference({'fiber-asymmetry' : {key : self.cal.cfg_dict['fiber-asymmetry'][key]}})
+        return self.cal.cfg_dict['fiber-asymmetry'][key]
+
+    # ------------------------------------------------------------------------ #
+
+    def _port(self, dut, port) :
+        cal = self.cal
+        sfp = dut.get("sfp", "blue")
+        self._use_devices([dut])
+        cal.cfg_dict['port-delay'] = {}
+        sampling = self._sampling("n_samples", "t_samples", "target", "budget")
+        sampling.update(dut.get("sampling", {}))
+        cal.calibrate_device_port(dut.get("error", 10), port=port, sfp=sfp, **sampling)
+        delays = cal.cfg_dict['port-delay']["%s-wr%d" % (sfp, port)]
+
+        if self.store != None :
+            # The fiber reference is stored once, not with each DUT
+            cal.store_results(self.store, dut['serial'], self.job['fiber_set'], fiber_reference=False)
+        if "output" in self.job :
+            os.makedirs(self.job['output'], exist_ok=True)
+            cal.write_config(os.path.join(self.job['output'], "%s-wr%d.cfg" % (dut['serial'], port)))
+
+        return list(delays)
+
+    # ------------------------------------------------------------------------ #
+
+    def _restore(self, name, result) :
+        '''
+        Method to restore in the session the result of a completed task.
+        '''
+        cfg = self.cal.cfg_dict
+        if name == "fiber-latency" :
+            cfg['fiber-latency'].update(result)
+        elif name == "trigger-level" :
+            self.cal.instr.trig_level = list(result)
+        elif name.startswith("fiber-asymmetry-") :
+            cfg['fiber-asymmetry'][name[len("fiber-asymmetry-"):]] = result
+
+    # ------------------------------------------------------------------------ #
+
+    def run(self, log) :
+        '''
+        Method to run the pending tasks of the plan.
+
+        The bench is set up on the first run. Tasks completed in a previous
+        run (or in the state file) are not run again.
+
+        Args:
+            log (file) : Where the output of the procedures is written.
+
+        Returns:
+            The exit code (see EXIT_OK and the others).
+        '''
+        self.session.out = log
+        if self.cal == None :
+            try :
+                with self.session.redirect() :
+                    self._open()
+            except Exception as e :
+                log.write("batch ERROR: %s: %s\n" % (type(e).__name__, e))
+                self._progress("Can't set up the bench: %s" % e)
+                self.cal = None
+                return EXIT_REFERENCE
+        checkpoint = self.cal.checkpoint
+        for name in self.redo :
+            checkpoint.discard(self.section, name)
+        self.redo = set()
+        total = len(self.tasks)
+        self.failed = []
+        self.errors = {}
+
+        for n, (name, func, reference) in enumerate(self.tasks, 1) :
+            head = "[%d/%d] %-32s" % (n, total, name)
+            if self.stop.is_set() :
+                self._progress("Stopped before %s, run the job again to resume it." % name)
+                return EXIT_INTERRUPTED
+            if name in self.results :
+                continue
+            if checkpoint.done(self.section, name) :
+                self.results[name] = checkpoint.get(self.section, name)
+                self._restore(name, self.results[name])
+                self._progress("%s done (resumed)" % head)
+                continue
+
+            self._progress("%s running..." % head)
+            start = clock.monotonic()
+            try :
+                with self.session.redirect() :
+                    print("\n==== %s ====" % name)
+                    result = func()
+            except KeyboardInterrupt :
+                raise
+            except Exception as e :
+                log.write("%s ERROR: %s: %s\n" % (name, type(e).__name__, e))
+                self.errors[name] = "%s: %s" % (type(e).__name__, e)
+                self._progress("%s FAILED after %.0f s: %s" % \
+                (head, clock.monotonic() - start, self.errors[name]))
+                if reference :
+                    return EXIT_REFERENCE
+                self.failed.append(name)
+                continue
+
+            checkpoint.store(self.section, name, result)
+            self.results[name] = result
+            self._progress("%s ok in %.0f s: %s" % (head, clock.monotonic() - start, result))
+
+        with self.session.redirect() :
+            self.cal.remove_wr_devices()
+
+        if len(self.failed) > 0 :
+            self._progress("%d of %d tasks failed: %s" % (len(self.failed), total, ", ".join(self.failed)))
+            return EXIT_FAILED
+        self._progress("All %d tasks completed." % total)
+        return EXIT_OK
+
+# ---------------------------------------------------------------------------- #
+
+def main(argv=None) :
+    parser = argparse.ArgumentParser(description="Run calibration jobs without an operator.")
+    parser.add_argument("jobs", nargs="+", metavar="job", \
+    help="JSON job files, several jobs run in parallel.")
+    parser.add_argument("--dry-run", action="store_true", help="Validate the jobs and show their tasks.")
+    parser.add_argument("--verbose", action="store_true", \
+    help="Show the output of the procedures instead of writing it to the log file.")
+    parser.add_argument("--metrics-port", type=int, \
+    help="Serve the metrics of the rig on this local port (see main.metrics).")
+    args = parser.parse_args(argv)
+
+    runners = []
+    try :
+        for path in args.jobs :
+            job = load_job(path)
+            if job['name'] in [r.job['name'] for r in runners] :
+                raise JobError("Job name %s is used twice." % job['name'])
+            label = "%s " % job['name'] if len(args.jobs) > 1 else ""
+            runners.append(Batch_runner(job, label=label))
+    except JobError as e :
+        print("batch ERROR: %s" % e, file=sys.stderr)
+        return EXIT_JOB
+
+    if args.dry_run :
+        for runner in runners :
+            for n, task in enumerate(runner.tasks, 1) :
+                runner._progress("[%d/%d] %s" % (n, len(runner.tasks), task[0]))
+        return EXIT_OK
+
+    if args.metrics_port != None :
+        metrics.start_server(args.metrics_port)
+
+    def run(runner) :
+        if args.verbose :
+            return runner.run(runner.out)
+        with open(runner.job['log'], 'a', encoding='utf-8') as log :
+            return runner.run(log)
+
+    if len(runners) == 1 :
+        try :
+            return run(runners[0])
+        except KeyboardInterrupt :
+            print("\nInterrupted, run the job again to resume it.", file=sys.stderr)
+            return EXIT_INTERRUPTED
+
+    # Each job runs in the worker of its session
+    futures = [r.session.executor.submit(run, r) for r in runners]
+    try :
+        concurrent.futures.wait(futures)
+    except KeyboardInterrupt :
+        print("\nInterrupted, waiting for the running tasks to finish...", file=sys.stderr)
+        for r in runners :
+            r.stop.set()
+        concurrent.futures.wait(futures)
+    codes = []
+    for f in futures :
+        codes.append(f.result() if f.exception() == None else EXIT_REFERENCE)
+    for r in runners :
+        r.session.executor.shutdown()
+    return max(codes)
+
+if __name__ == "__main__" :
+    sys.exit(main())
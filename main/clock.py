@@ -0,0 +1,198 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Clock used for sleeps and time stamps, replaceable by a virtual clock.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup main
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import time as _time
+import threading
+import concurrent.futures
+
+# User modules
+from main import tracing
+
+class Clock() :
+    '''
+    Wall clock, it uses the time module.
+    '''
+
+    ## False if sleeps advance the time instead of blocking
+    blocking = True
+
+    def time(self) :
+        '''
+        Method to get the current time (as time.time()).
+        '''
+        return _time.time()
+
+    # ------------------------------------------------------------------------ #
+
+    def monotonic(self) :
+        '''
+        Method to get the value of a monotonic clock (as time.monotonic()).
+        '''
+        return _time.monotonic()
+
+    # ------------------------------------------------------------------------ #
+
+    def sleep(self, seconds) :
+        '''
+        Method to block the calling thread (as time.sleep()).
+        '''
+        _time.sleep(seconds)
+
+    # ------------------------------------------------------------------------ #
+
+    def wait(self, future, timeout=None) :
+        '''
+        Method to wait until a future is done or timeout seconds of this clock
+        passed.
+
+        With a non blocking clock the time is advanced by the thread running
+        the future, so it's polled without advancing the time.
+
+        Args:
+            future (concurrent.futures.Future) : The future.
+            timeout (float) : Maximum time to wait (in s), None to wait forever.
+
+        Returns:
+            True if the future is done.
+        '''
+        if self.blocking :
+            concurrent.futures.wait([future], timeout)
+            return future.done()
+
+        end = None if timeout == None else self.monotonic() + timeout
+        while not future.done() and (end == None or self.monotonic() < end) :
+            _time.sleep(0.001)
+        return future.done()
+
+# ---------------------------------------------------------------------------- #
+
+class Virtual_clock(Clock) :
+    '''
+    Simulated clock, sleeps don't block but advance the time.
+    '''
+
+    blocking = False
+
+    def __init__(self, epoch=0.0) :
+        '''
+        Constructor
+
+        Args:
+            epoch (float) : Value returned by time() at start.
+        '''
+        self.epoch = epoch
+        self.t = 0.0
+        self.lock = threading.Lock()
+
+    # ------------------------------------------------------------------------ #
+
+    def time(self) :
+        '''
+        Method to get epoch plus the simulated time.
+        '''
+        return self.epoch + self.t
+
+    # ------------------------------------------------------------------------ #
+
+    def monotonic(self) :
+        '''
+        Method to get the simulated time since the clock was created.
+        '''
+        return self.t
+
+    # ------------------------------------------------------------------------ #
+
+    def sleep(self, seconds) :
+        '''
+        Method to advance the simulated time without blocking.
+        '''
+        with self.lock :
+            self.t += max(0, seconds)
+
+# ---------------------------------------------------------------------------- #
+
+## Clock used by devices, instruments and procedures
+_clock = Clock()
+
+def set_clock(clock=None) :
+    '''
+    Function to replace the clock used by the whole package.
+
+    Args:
+        clock (Clock) : The new clock, the wall clock when None.
+
+    Returns:
+        The previous clock.
+    '''
+    global _clock
+    prev = _clock
+    _clock = clock if clock != None else Clock()
+    return prev
+
+# ---------------------------------------------------------------------------- #
+
+def get_clock() :
+    '''
+    Function to get the clock in use.
+    '''
+    return _clock
+
+# ---------------------------------------------------------------------------- #
+
+def time() :
+    '''
+    Function to get the current time of the clock in use.
+    '''
+    return _clock.time()
+
+# ---------------------------------------------------------------------------- #
+
+def monotonic() :
+    '''
+    Function to get the monotonic time of the clock in use.
+    '''
+    return _clock.monotonic()
+
+# ---------------------------------------------------------------------------- #
+
+def sleep(seconds) :
+    '''
+    Function to sleep with the clock in use.
+    '''
+    with tracing.span("sleep", "sleep", seconds=seconds) :
+        _clock.sleep(seconds)
+
+# ---------------------------------------------------------------------------- #
+
+def wait(future, timeout=None) :
+    '''
+    Function to wait for a future with the clock in use (see Clock.wait).
+    '''
+    return _clock.wait(future, timeout)
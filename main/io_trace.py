@@ -0,0 +1,498 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Record and replay of the I/O of devices and instruments.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup main
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import marshal
+import struct
+import threading
+import collections
+import builtins
+
+# User modules
+from main import clock
+from main import tracing
+from main import metrics
+import main.wrcexceptions as wrcexceptions
+from main.wrcexceptions import ReplayError
+
+## Trace file signature
+MAGIC = b"WRIOTRC1"
+
+## Record kinds
+OPEN  = 0
+CALL  = 1
+CLOCK = 2
+
+## Record header: kind, channel, time since start (s), payload length
+_HDR = struct.Struct("<BHdI")
+
+## Channel of the clock records
+CLOCK_CHAN = 0
+
+# ---------------------------------------------------------------------------- #
+
+def _dump(obj) :
+    '''
+    Function to encode a value for the trace (repr for unsupported types).
+    '''
+    try :
+        return marshal.dumps(obj)
+    except ValueError :
+        return marshal.dumps(repr(obj))
+
+# ---------------------------------------------------------------------------- #
+
+class Trace_recorder() :
+    '''
+    Recorder of the I/O of transports (serial ports, USBTMC...) to a binary trace.
+
+    Each method call of a recorded transport is stored with its arguments,
+    result (or raised exception), start time and duration. Reads of the
+    clock (see main.clock) are stored too, so time stamps and adaptive
+    sampling are replayed exactly.
+
+    The trace is a MAGIC signature followed by records with a fixed header
+    (see _HDR) and a marshal encoded payload.
+    '''
+
+    def __init__(self, path) :
+        '''
+        Constructor
+
+        Args:
+            path (str) : Path to the trace file, it's overwritten.
+        '''
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+        self.lock = threading.Lock()
+        self.t0 = clock.get_clock().monotonic()
+        self.names = {}
+        self.clock = _Recording_clock(self, clock.get_clock())
+
+    # ------------------------------------------------------------------------ #
+
+    def write(self, kind, chan, payload, t) :
+        '''
+        Method to append a record to the trace.
+        '''
+        with self.lock :
+            self.file.write(_HDR.pack(kind, chan, t - self.t0, len(payload)))
+            self.file.write(payload)
+
+    # ------------------------------------------------------------------------ #
+
+    def channel(self, name, factory, methods) :
+        '''
+        Method to open a recorded transport.
+
+        Args:
+            name (str) : Name of the transport.
+            factory (callable) : Function that opens the real transport.
+            methods (tuple) : Methods of the transport to record.
+
+        Returns:
+            A proxy of the transport.
+        '''
+        obj = factory()
+        with self.lock :
+            name = _unique(self.names, name)
+            chan = len(self.names)
+        self.write(OPEN, chan, name.encode(), self.clock.base.monotonic())
+        return _Recording_channel(self, chan, obj, methods)
+
+    # ------------------------------------------------------------------------ #
+
+    def close(self) :
+        '''
+        Method to close the trace file.
+        '''
+        with self.lock :
+            self.file.close()
+
+# ---------------------------------------------------------------------------- #
+
+class Trace_player() :
+    '''
+    Player of a trace written by Trace_recorder.
+
+    Replayed transports don't open any device: each call is checked against
+    the next recorded call of its transport and the recorded result is
+    returned (or the recorded exception raised). The clock returns the
+    recorded times and sleeps don't block.
+    '''
+
+    def __init__(self, path) :
+        '''
+        Constructor
+
+        Args:
+            path (str) : Path to the trace file.
+
+        Raises:
+            ReplayError if the file is not a trace.
+        '''
+        self.path = path
+        self.names = {}
+        self.calls = {}
+        clock_records = collections.deque()
+        chan_names = {}
+
+        with open(path, 'rb') as f :
+            if f.read(len(MAGIC)) != MAGIC :
+                raise ReplayError("%s is not an I/O trace." % path)
+            while True :
+                hdr = f.read(_HDR.size)
+                if len(hdr) < _HDR.size :
+                    break
+                kind, chan, t, length = _HDR.unpack(hdr)
+                payload = f.read(length)
+                if kind == OPEN :
+                    chan_names[chan] = payload.decode()
+                    self.calls[chan_names[chan]] = collections.deque()
+                elif kind == CALL :
+                    self.calls[chan_names[chan]].append(marshal.loads(payload))
+                elif kind == CLOCK :
+                    clock_records.append(marshal.loads(payload))
+
+        self.clock = _Replay_clock(clock_records)
+
+    # ------------------------------------------------------------------------ #
+
+    def channel(self, name, factory, methods) :
+        '''
+        Method to open a replayed transport.
+
+        Args:
+            name (str) : Name of the transport.
+            factory (callable) : Not used, the real transport is not opened.
+            methods (tuple) : Methods of the transport.
+
+        Returns:
+            A replayed transport.
+
+        Raises:
+            ReplayError if the transport was not recorded.
+        '''
+        name = _unique(self.names, name)
+        if name not in self.calls :
+            raise ReplayError("Transport %s is not in the trace." % name)
+        return _Replay_channel(name, self.calls[name], methods)
+
+    # ------------------------------------------------------------------------ #
+
+    def pending(self) :
+        '''
+        Method to count the recorded calls that were not replayed.
+
+        Returns:
+            A dict with the number of pending calls by transport.
+        '''
+        return {name : len(q) for name, q in self.calls.items() if len(q) > 0}
+
+    # ------------------------------------------------------------------------ #
+
+    def close(self) :
+        '''
+        Method to show a warning if the replay ended before the trace.
+        '''
+        pending = self.pending()
+        if len(pending) > 0 :
+            print("Warning: calls not replayed from %s : %s" % (self.path, pending))
+
+# ---------------------------------------------------------------------------- #
+
+def _unique(names, name) :
+    '''
+    Function to name the n-th transport opened with the same name as name#n.
+    '''
+    names[name] = names.get(name, 0) + 1
+    if names[name] > 1 :
+        name = "%s#%d" % (name, names[name])
+        names[name] = 1
+    return name
+
+# ---------------------------------------------------------------------------- #
+
+class _Recording_channel() :
+    '''
+    Proxy of a transport that records the calls to its methods.
+    '''
+
+    def __init__(self, recorder, chan, obj, methods) :
+        self._recorder = recorder
+        self._chan = chan
+        self._obj = obj
+        self._methods = methods
+
+    def __getattr__(self, attr) :
+        value = getattr(self._obj, attr)
+        if attr not in self._methods :
+            return value
+
+        def call(*args, **kwargs) :
+            base = self._recorder.clock.base
+            t = base.monotonic()
+            payload = None
+            try :
+                ret = value(*args, **kwargs)
+                payload = (attr, args, tuple(sorted(kwargs.items())), True, ret)
+                return ret
+            except Exception as e :
+                payload = (attr, args, tuple(sorted(kwargs.items())), False, \
+                (type(e).__name__, str(e)))
+                raise
+            finally :
+                if payload != None :
+                    payload += (base.monotonic() - t,)
+                    self._recorder.write(CALL, self._chan, _dump(payload), t)
+
+        return call
+
+# ---------------------------------------------------------------------------- #
+
+class _Replay_channel() :
+    '''
+    Transport that returns the recorded results.
+    '''
+
+    def __init__(self, name, calls, methods) :
+        self._name = name
+        self._calls = calls
+        self._methods = methods
+
+    def __getattr__(self, attr) :
+        if attr not in self._methods :
+            raise AttributeError("Replayed transport %s has no attribute %s" % (self._name, attr))
+
+        def call(*args, **kwargs) :
+            if len(self._calls) == 0 :
+                raise ReplayError("%s.%s%s called after the end of the trace." % \
+                (self._name, attr, args))
+            rec = self._calls.popleft()
+            got = marshal.loads(_dump((attr, args, tuple(sorted(kwargs.items())))))
+            if tuple(rec[:3]) != got :
+                raise ReplayError("%s : expected %s%s, called %s%s" % \
+                (self._name, rec[0], rec[1], attr, args))
+            if rec[3] :
+                return rec[4]
+            exc_name, msg = rec[4]
+            exc = getattr(wrcexceptions, exc_name, getattr(builtins, exc_name, None))
+            if not (isinstance(exc, type) and issubclass(exc, Exception)) :
+                exc = ReplayError
+            raise exc(msg)
+
+        return call
+
+# ---------------------------------------------------------------------------- #
+
+class _Traced_channel() :
+    '''
+    Proxy of a transport that opens an "io" span for each call when tracing,
+    and publishes the latency of the calls in main.metrics.
+    '''
+
+    def __init__(self, name, obj, methods) :
+        self._name = name
+        self._obj = obj
+        self._methods = methods
+
+    def __getattr__(self, attr) :
+        value = getattr(self._obj, attr)
+        if attr not in self._methods :
+            return value
+
+        def call(*args, **kwargs) :
+            with metrics.IO_SECONDS.time(self._name, attr) :
+                with tracing.span("%s.%s" % (self._name, attr), "io") :
+                    return value(*args, **kwargs)
+
+        return call
+
+# ---------------------------------------------------------------------------- #
+
+class _Recording_clock(clock.Clock) :
+    '''
+    Clock that records the times it returns and the sleeps.
+    '''
+
+    def __init__(self, recorder, base) :
+        self.recorder = recorder
+        self.base = base
+
+    def _record(self, op, value) :
+        t = self.base.monotonic()
+        self.recorder.write(CLOCK, CLOCK_CHAN, _dump((op, value)), t)
+        return value
+
+    def time(self) :
+        return self._record("time", self.base.time())
+
+    def monotonic(self) :
+        return self._record("monotonic", self.base.monotonic())
+
+    def sleep(self, seconds) :
+        self._record("sleep", seconds)
+        self.base.sleep(seconds)
+
+    def wait(self, future, timeout=None) :
+        return self.base.wait(future, timeout)
+
+# ---------------------------------------------------------------------------- #
+
+class _Replay_clock(clock.Clock) :
+    '''
+    Clock that returns the recorded times. Sleeps don't block.
+
+    When the recorded times are exhausted, time advances with the sleeps.
+    '''
+
+    blocking = False
+
+    def __init__(self, records) :
+        self.records = {'time' : collections.deque(), 'monotonic' : collections.deque()}
+        for op, value in records :
+            if op in self.records :
+                self.records[op].append(value)
+        self.last = {'time' : 0.0, 'monotonic' : 0.0}
+        self.lock = threading.Lock()
+
+    def _read(self, op) :
+        with self.lock :
+            if len(self.records[op]) > 0 :
+                self.last[op] = self.records[op].popleft()
+            return self.last[op]
+
+    def time(self) :
+        return self._read("time")
+
+    def monotonic(self) :
+        return self._read("monotonic")
+
+    def sleep(self, seconds) :
+        with self.lock :
+            for op in self.last :
+                self.last[op] += max(0, seconds)
+
+# ---------------------------------------------------------------------------- #
+
+## Recording or replay session in progress
+_session = None
+_prev_clock = None
+
+def start_recording(path) :
+    '''
+    Function to start recording the transports opened from now on.
+
+    Args:
+        path (str) : Path to the trace file.
+
+    Returns:
+        The Trace_recorder.
+    '''
+    return _start(Trace_recorder(path))
+
+# ---------------------------------------------------------------------------- #
+
+def start_replay(path) :
+    '''
+    Function to replay a trace in the transports opened from now on.
+
+    Run the same procedures, with the same parameters and in the same order
+    as when it was recorded. Runs in concurrent mode (see
+    WR_calibration.enable_concurrency) read the clock from several threads,
+    so their replay is not bit-identical.
+
+    Args:
+        path (str) : Path to the trace file.
+
+    Returns:
+        The Trace_player.
+    '''
+    return _start(Trace_player(path))
+
+# ---------------------------------------------------------------------------- #
+
+def start_simulation(simulator) :
+    '''
+    Function to simulate the transports opened from now on.
+
+    Args:
+        simulator (object) : A simulated bench (i.e. simulation.sim_world.Sim_world). \
+        It must have a clock, a channel method with the arguments of transport \
+        and a close method.
+
+    Returns:
+        The simulator.
+    '''
+    return _start(simulator)
+
+# ---------------------------------------------------------------------------- #
+
+def _start(session) :
+    global _session, _prev_clock
+    stop()
+    _session = session
+    _prev_clock = clock.set_clock(session.clock)
+    return session
+
+# ---------------------------------------------------------------------------- #
+
+def stop() :
+    '''
+    Function to end the recording or replay session.
+    '''
+    global _session, _prev_clock
+    if _session == None :
+        return
+    _session.close()
+    clock.set_clock(_prev_clock)
+    _session = None
+    _prev_clock = None
+
+# ---------------------------------------------------------------------------- #
+
+def transport(name, factory, methods) :
+    '''
+    Function used by the drivers to open their transport.
+
+    Args:
+        name (str) : Name of the transport (i.e. the device file).
+        factory (callable) : Function that opens the real transport.
+        methods (tuple) : Methods of the transport that do I/O.
+
+    Returns:
+        A proxy of the real transport, or of a recorded or replayed one when a
+        session is in progress. Its calls are traced (see main.tracing).
+    '''
+    if _session == None :
+        obj = factory()
+    else :
+        obj = _session.channel(name, factory, methods)
+    return _Traced_channel(name, obj, methods)
@@ -0,0 +1,566 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Live metrics of the calibration rig in Prometheus text format.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup main
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import abc
+import bisect
+import collections
+import http.server
+import threading
+import time
+
+# Default port of the metrics endpoint
+DEFAULT_PORT = 9464
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class _Metric() :
+    '''
+    Base class of the metrics.
+
+    The values are kept in shards, one per thread, and each shard is only
+    written by its thread. This way the acquisition loops update the metrics
+    without taking any lock: the lock is only taken the first time a thread
+    uses a metric, to register its shard. The endpoint merges the shards when
+    it is scraped. A thread that ends keeps its shard, so counters never go
+    backwards.
+
+    Durations are taken from time.perf_counter, the wall time spent, as in
+    main.tracing.
+    '''
+    __metaclass__ = abc.ABCMeta
+
+    ## Type of the metric in the exposition format
+    kind = "untyped"
+
+    def __init__(self, name, help, labels=()) :
+        '''
+        Constructor
+
+        Args:
+            name (str) : Name of the metric.
+            help (str) : Description of the metric.
+            labels (tuple) : Names of the labels.
+        '''
+        ## Name of the metric
+        self.name = name
+        ## Description of the metric
+        self.help = help
+        ## Names of the labels
+        self.labels = tuple(labels)
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+        _register(self)
+
+    # ------------------------------------------------------------------------ #
+
+    def _shard(self) :
+        '''
+        Method to get the shard of the calling thread.
+        '''
+        try :
+            return self._local.shard
+        except AttributeError :
+            shard = {}
+            with self._lock :
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    # ------------------------------------------------------------------------ #
+
+    def _merged(self) :
+        '''
+        Method to get the values of all the shards.
+
+        Returns:
+            A list of (label values, value) tuples. Values of the same labels
+            from different threads are given in separate tuples.
+        '''
+        with self._lock :
+            shards = list(self._shards)
+        items = []
+        for shard in shards :
+            items.extend(list(shard.items()))
+        return items
+
+    # ------------------------------------------------------------------------ #
+
+    def _key(self, values) :
+        if len(values) != len(self.labels) :
+            raise ValueError("METRICS ERROR: %s expects labels %s" % (self.name, self.labels))
+        return tuple(str(v) for v in values)
+
+    # ------------------------------------------------------------------------ #
+
+    def _labels(self, key, extra=None) :
+        pairs = list(zip(self.labels, key))
+        if extra != None :
+            pairs.append(extra)
+        if len(pairs) == 0 :
+            return ""
+        return "{%s}" % ",".join('%s="%s"' % (k, _escape(v)) for k, v in pairs)
+
+    # ------------------------------------------------------------------------ #
+
+    @abc.abstractmethod
+    def samples(self) :
+        '''
+        Method to get the lines of the metric values.
+
+        Returns:
+            A list of lines of the exposition format.
+        '''
+
+    # ------------------------------------------------------------------------ #
+
+    def render(self) :
+        '''
+        Method to render the metric in the exposition format.
+
+        Returns:
+            The text of the metric, including its HELP and TYPE lines.
+        '''
+        lines = ["# HELP %s %s" % (self.name, self.help), "# TYPE %s %s" % (self.name, self.kind)]
+        lines.extend(self.samples())
+        return "\n".join(lines) + "\n"
+
+# ---------------------------------------------------------------------------- #
+
+class Counter(_Metric) :
+    '''
+    Counter that only goes up.
+    '''
+
+    kind = "counter"
+
+    def inc(self, *values, amount=1) :
+        '''
+        Method to increment the counter.
+
+        Args:
+            values : Values of the labels.
+            amount (float) : Increment.
+        '''
+        shard = self._shard()
+        key = self._key(values)
+        shard[key] = shard.get(key, 0) + amount
+
+    # ------------------------------------------------------------------------ #
+
+    def value(self, *values) :
+        '''
+        Method to get the value of the counter.
+
+        Args:
+            values : Values of the labels.
+        '''
+        key = self._key(values)
+        return sum(v for k, v in self._merged() if k == key)
+
+    # ------------------------------------------------------------------------ #
+
+    def samples(self) :
+        totals = collections.OrderedDict()
+        for key, v in self._merged() :
+            totals[key] = totals.get(key, 0) + v
+        return ["%s%s %s" % (self.name, self._labels(k), _number(v)) for k, v in totals.items()]
+
+# ---------------------------------------------------------------------------- #
+
+class Window_counter(_Metric) :
+    '''
+    Gauge with the number of events in the last window of time (i.e. the
+    calibrations completed in the last hour).
+
+    The times of the last max_events events are kept for each label values.
+    '''
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), window=3600, max_events=10000) :
+        '''
+        Constructor
+
+        Args:
+            name (str) : Name of the metric.
+            help (str) : Description of the metric.
+            labels (tuple) : Names of the labels.
+            window (float) : Length of the window (in s).
+            max_events (int) : Maximum number of events kept by label values \
+            and thread.
+        '''
+        _Metric.__init__(self, name, help, labels)
+        ## Length of the window (in s)
+        self.window = window
+        self._max_events = max_events
+
+    # ------------------------------------------------------------------------ #
+
+    def inc(self, *values) :
+        '''
+        Method to count an event now.
+
+        Args:
+            values : Values of the labels.
+        '''
+        shard = self._shard()
+        key = self._key(values)
+        events = shard.get(key)
+        if events == None :
+            events = shard[key] = collections.deque(maxlen=self._max_events)
+        events.append(time.monotonic())
+
+    # ------------------------------------------------------------------------ #
+
+    def samples(self) :
+        start = time.monotonic() - self.window
+        totals = collections.OrderedDict()
+        for key, events in self._merged() :
+            totals[key] = totals.get(key, 0) + sum(1 for t in list(events) if t >= start)
+        return ["%s%s %d" % (self.name, self._labels(k), v) for k, v in totals.items()]
+
+# ---------------------------------------------------------------------------- #
+
+class Histogram(_Metric) :
+    '''
+    Histogram of observations in fixed buckets.
+    '''
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=(0.1, 1, 10, 60, 600)) :
+        '''
+        Constructor
+
+        Args:
+            name (str) : Name of the metric.
+            help (str) : Description of the metric.
+            labels (tuple) : Names of the labels.
+            buckets (tuple) : Upper bounds of the buckets, in ascending order.
+        '''
+        _Metric.__init__(self, name, help, labels)
+        ## Upper bounds of the buckets
+        self.buckets = tuple(sorted(buckets))
+
+    # ------------------------------------------------------------------------ #
+
+    def observe(self, value, *values) :
+        '''
+        Method to add an observation.
+
+        Args:
+            value (float) : Observed value.
+            values : Values of the labels.
+        '''
+        shard = self._shard()
+        key = self._key(values)
+        counts = shard.get(key)
+        if counts == None :
+            # A count by bucket (the last one is +Inf) and the sum
+            counts = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    # ------------------------------------------------------------------------ #
+
+    def time(self, *values) :
+        '''
+        Method to observe the duration of a with block.
+
+        Args:
+            values : Values of the labels.
+        '''
+        return _Timer(self, values)
+
+    # ------------------------------------------------------------------------ #
+
+    def samples(self) :
+        totals = collections.OrderedDict()
+        for key, counts in self._merged() :
+            counts = list(counts)
+            total = totals.setdefault(key, [0] * len(counts))
+            for i, c in enumerate(counts) :
+                total[i] += c
+        lines = []
+        for key, counts in totals.items() :
+            acc = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts) :
+                acc += c
+                lines.append("%s_bucket%s %d" % (self.name, \
+                self._labels(key, ("le", _number(bound))), acc))
+            lines.append("%s_sum%s %s" % (self.name, self._labels(key), _number(counts[-1])))
+            lines.append("%s_count%s %d" % (self.name, self._labels(key), acc))
+        return lines
+
+# ---------------------------------------------------------------------------- #
+
+class Summary(_Metric) :
+    '''
+    Summary with quantiles of the last observations (i.e. I/O latencies).
+
+    The quantiles are computed when scraped from the last max_samples
+    observations kept by label values and thread.
+    '''
+
+    kind = "summary"
+
+    def __init__(self, name, help, labels=(), quantiles=(0.5, 0.9, 0.99), max_samples=1000) :
+        '''
+        Constructor
+
+        Args:
+            name (str) : Name of the metric.
+            help (str) : Description of the metric.
+            labels (tuple) : Names of the labels.
+            quantiles (tuple) : Quantiles exported.
+            max_samples (int) : Number of observations kept to compute them.
+        '''
+        _Metric.__init__(self, name, help, labels)
+        ## Quantiles exported
+        self.quantiles = tuple(quantiles)
+        self._max_samples = max_samples
+
+    # ------------------------------------------------------------------------ #
+
+    def observe(self, value, *values) :
+        '''
+        Method to add an observation.
+
+        Args:
+            value (float) : Observed value.
+            values : Values of the labels.
+        '''
+        shard = self._shard()
+        key = self._key(values)
+        entry = shard.get(key)
+        if entry == None :
+            # Last observations, count and sum
+            entry = shard[key] = [collections.deque(maxlen=self._max_samples), 0, 0.0]
+        entry[0].append(value)
+        entry[1] += 1
+        entry[2] += value
+
+    # ------------------------------------------------------------------------ #
+
+    def time(self, *values) :
+        '''
+        Method to observe the duration of a with block.
+
+        Args:
+            values : Values of the labels.
+        '''
+        return _Timer(self, values)
+
+    # ------------------------------------------------------------------------ #
+
+    def samples(self) :
+        totals = collections.OrderedDict()
+        for key, entry in self._merged() :
+            window, count, total = list(entry[0]), entry[1], entry[2]
+            t = totals.setdefault(key, [[], 0, 0.0])
+            t[0].extend(window)
+            t[1] += count
+            t[2] += total
+        lines = []
+        for key, (window, count, total) in totals.items() :
+            window.sort()
+            for q in self.quantiles :
+                if len(window) == 0 :
+                    continue
+                value = window[min(len(window) - 1, int(q * len(window)))]
+                lines.append("%s%s %s" % (self.name, self._labels(key, ("quantile", _number(q))), \
+                _number(value)))
+            lines.append("%s_sum%s %s" % (self.name, self._labels(key), _number(total)))
+            lines.append("%s_count%s %d" % (self.name, self._labels(key), count))
+        return lines
+
+# ---------------------------------------------------------------------------- #
+
+class _Timer() :
+    '''
+    Context manager that observes the duration of its block in a metric.
+    '''
+
+    __slots__ = ("metric", "values", "t0")
+
+    def __init__(self, metric, values) :
+        self.metric = metric
+        self.values = values
+
+    def __enter__(self) :
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) :
+        self.metric.observe(time.perf_counter() - self.t0, *self.values)
+        return False
+
+# ---------------------------------------------------------------------------- #
+
+def _escape(value) :
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+# ---------------------------------------------------------------------------- #
+
+def _number(value) :
+    if value == float("inf") :
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# ---------------------------------------------------------------------------- #
+
+_metrics = []
+_metrics_lock = threading.Lock()
+
+def _register(metric) :
+    with _metrics_lock :
+        if any(m.name == metric.name for m in _metrics) :
+            raise ValueError("METRICS ERROR: metric %s already defined" % metric.name)
+        _metrics.append(metric)
+
+# ---------------------------------------------------------------------------- #
+
+def render() :
+    '''
+    Function to render all the metrics in the Prometheus text format.
+
+    Returns:
+        The text served by the endpoint.
+    '''
+    with _metrics_lock :
+        metrics = list(_metrics)
+    return "".join(m.render() for m in metrics)
+
+# ---------------------------------------------------------------------------- #
+
+# Metrics published by the calibration procedures, devices and instruments
+
+CALIBRATIONS = Counter("wrcal_calibrations_total", \
+"Calibration procedures completed.", ("procedure",))
+
+CALIBRATIONS_LAST_HOUR = Window_counter("wrcal_calibrations_last_hour", \
+"Calibration procedures completed in the last hour.", ("procedure",))
+
+PHASE_SECONDS = Histogram("wrcal_phase_seconds", \
+"Duration of the calibration phases.", ("phase",), \
+buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600))
+
+PHASE_FAILURES = Counter("wrcal_phase_failures_total", \
+"Calibration phases that raised an exception.", ("phase",))
+
+SAMPLES = Counter("wrcal_samples_total", \
+"Samples acquired.", ("magnitude",))
+
+OUTLIERS = Counter("wrcal_outliers_rejected_total", \
+"Samples rejected as outliers.", ("magnitude",))
+
+IO_SECONDS = Summary("wrcal_io_seconds", \
+"Latency of the serial and SCPI transport calls.", ("channel", "method"))
+
+LOCK_SECONDS = Histogram("wrcal_trackphase_lock_seconds", \
+"Time waited until the servo of the slave reached TRACK PHASE.", \
+buckets=(1, 2, 5, 10, 20, 30, 60, 120, 300))
+
+STEP_RETRIES = Counter("wrcal_step_retries_total", \
+"Steps of a calibration procedure run again after a failure.", ("section",))
+
+JOB_RETRIES = Counter("wrcal_farm_job_retries_total", \
+"Farm jobs queued again after a failed attempt.")
+
+def completed(procedure) :
+    '''
+    Function to count a completed calibration procedure.
+
+    Args:
+        procedure (str) : Name of the procedure.
+    '''
+    CALIBRATIONS.inc(procedure)
+    CALIBRATIONS_LAST_HOUR.inc(procedure)
+
+# ---------------------------------------------------------------------------- #
+
+class _Handler(http.server.BaseHTTPRequestHandler) :
+    '''
+    Handler of the metrics endpoint.
+    '''
+
+    def do_GET(self) :
+        if self.path.split("?")[0] not in ("/", "/metrics") :
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) :
+        pass
+
+# ---------------------------------------------------------------------------- #
+
+_server = None
+
+def start_server(port=DEFAULT_PORT, host="127.0.0.1") :
+    '''
+    Function to serve the metrics over HTTP (GET /metrics) in a background
+    thread.
+
+    Args:
+        port (int) : TCP port, 0 to use any free port.
+        host (str) : Address to listen to. By default only local clients can \
+        scrape the metrics.
+
+    Returns:
+        The address (host, port) served.
+    '''
+    global _server
+    stop_server()
+    _server = http.server.ThreadingHTTPServer((host, port), _Handler)
+    _server.daemon_threads = True
+    thread = threading.Thread(target=_server.serve_forever, name="metrics", daemon=True)
+    thread.start()
+    return _server.server_address[:2]
+
+# ---------------------------------------------------------------------------- #
+
+def stop_server() :
+    '''
+    Function to stop serving the metrics.
+    '''
+    global _server
+    if _server == None :
+        return
+    _server.shutdown()
+    _server.server_close()
+    _server = None
@@ -0,0 +1,420 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Registry of the WR device, measurement instrument and fiber switch plugins.
+
+Plugins are discovered without importing them:
+
+- The modules of the packages wr_devices, measurement and fiber_switches that
+  define the attribute __wrdevice__, __meas_instr__ or __fiber_switch__. The
+  plugin name is the module name (i.e. "wr_len" or "FCA3103").
+- The entry points of installed distributions in the groups
+  wrcalibration.wr_devices, wrcalibration.meas_instr and
+  wrcalibration.fiber_switches, with the form "package.module:Class".
+
+The metadata of a plugin (class, description, interfaces, channels and
+required modules) is read from the module source with ast, from the literal
+module attributes __interfaces__, __channels__ and __requires__. The metadata
+of each file is cached (by path, size and modification time) in a JSON index,
+by default ~/.cache/wrcalibration/plugins.json. The module is only imported
+when the plugin is loaded, so its optional dependencies (pyserial, vxi11) are
+only needed when the backend is used.
+
+List the plugins with:
+
+    python3 -m main.registry [--refresh]
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup main
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import argparse
+import ast
+import importlib
+import importlib.metadata
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import threading
+
+# User modules
+from main.wrcexceptions import DeviceNotFound
+
+## Plugin kinds: (package, marker attribute, entry point group)
+KINDS = {
+    'wr_device'    : ("wr_devices", "__wrdevice__", "wrcalibration.wr_devices"),
+    'meas_instr'   : ("measurement", "__meas_instr__", "wrcalibration.meas_instr"),
+    'fiber_switch' : ("fiber_switches", "__fiber_switch__", "wrcalibration.fiber_switches")
+}
+
+## Version of the index format
+INDEX_VERSION = 1
+
+def default_index() :
+    '''
+    Function to get the default path of the discovery index.
+    '''
+    cache = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(cache, "wrcalibration", "plugins.json")
+
+# ---------------------------------------------------------------------------- #
+
+def read_metadata(path, marker=None, cls=None) :
+    '''
+    Function to read the metadata of a plugin module without importing it.
+
+    Args:
+        path (str) : Path to the module source.
+        marker (str) : Attribute with the name of the plugin class. If cls is \
+        not given and the module doesn't define it, it's not a plugin.
+        cls (str) : Name of the plugin class, when known.
+
+    Returns:
+        A dict with keys class, doc, interfaces, channels and requires, or None
+        if the module is not a plugin or its class is abstract.
+    '''
+    with open(path, 'rb') as src :
+        tree = ast.parse(src.read(), path)
+
+    attrs = {}
+    classes = {}
+    for node in tree.body :
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 \
+        and isinstance(node.targets[0], ast.Name) :
+            try :
+                attrs[node.targets[0].id] = ast.literal_eval(node.value)
+            except ValueError :
+                pass
+        elif isinstance(node, ast.ClassDef) :
+            classes[node.name] = node
+
+    if cls == None :
+        cls = attrs.get(marker)
+    if cls == None or cls not in classes :
+        return None
+
+    node = classes[cls]
+    # Abstract interfaces (i.e. WR_Device) are not plugins
+    for item in node.body :
+        if isinstance(item, ast.Assign) and any(isinstance(t, ast.Name) \
+        and t.id == "__metaclass__" for t in item.targets) :
+            return None
+
+    doc = ast.get_docstring(node) or ""
+    return {
+        'class'      : cls,
+        'doc'        : doc.strip().split("\n")[0],
+        'interfaces' : list(attrs.get("__interfaces__", ())),
+        'channels'   : attrs.get("__channels__"),
+        'requires'   : list(attrs.get("__requires__", ()))
+    }
+
+# ---------------------------------------------------------------------------- #
+
+class Plugin() :
+    '''
+    A discovered plugin, its module is imported on the first load.
+    '''
+
+    def __init__(self, kind, name, module, meta, source="package") :
+        '''
+        Constructor
+
+        Args:
+            kind (str) : Plugin kind (see KINDS).
+            name (str) : Plugin name.
+            module (str) : Module that defines the plugin class.
+            meta (dict) : Metadata (see read_metadata).
+            source (str) : "package" or the distribution of the entry point.
+        '''
+        self.kind = kind
+        self.name = name
+        self.module = module
+        self.meta = meta
+        self.source = source
+        self._class = None
+
+    # ------------------------------------------------------------------------ #
+
+    def available(self) :
+        '''
+        Method to check if the modules required by the plugin are installed.
+
+        The modules are searched, not imported.
+
+        Returns:
+            A list with the missing modules.
+        '''
+        return [m for m in self.meta['requires'] if importlib.util.find_spec(m) == None]
+
+    # ------------------------------------------------------------------------ #
+
+    def load(self) :
+        '''
+        Method to import the plugin module.
+
+        Returns:
+            The plugin class.
+
+        Raises:
+            ImportError if the module or its dependencies can't be imported.
+        '''
+        if self._class == None :
+            module = importlib.import_module(self.module)
+            self._class = getattr(module, self.meta['class'])
+        return self._class
+
+# ---------------------------------------------------------------------------- #
+
+class Registry() :
+    '''
+    Registry of the plugins of each kind.
+
+    Discovery runs on first use and its results are kept in memory. The
+    discovery index is only rewritten when a plugin file changed.
+    '''
+
+    def __init__(self, index=None) :
+        '''
+        Constructor
+
+        Args:
+            index (str) : Path to the discovery index, by default default_index(). \
+            An empty string disables it.
+        '''
+        self.index = default_index() if index == None else index
+        self.plugins = None
+        self.lock = threading.Lock()
+
+    # ------------------------------------------------------------------------ #
+
+    def _read_index(self) :
+        '''
+        Method to read the cached metadata, by file path.
+        '''
+        if self.index == "" or not os.path.exists(self.index) :
+            return {}
+        try :
+            with open(self.index, 'r', encoding='utf-8') as f :
+                index = json.load(f)
+        except (OSError, ValueError) :
+            return {}
+        if index.get("version") != INDEX_VERSION :
+            return {}
+        return index['files']
+
+    # ------------------------------------------------------------------------ #
+
+    def _write_index(self, files) :
+        '''
+        Method to write the index atomically, errors are ignored (i.e. a read
+        only home folder).
+        '''
+        if self.index == "" :
+            return
+        try :
+            folder = os.path.dirname(os.path.abspath(self.index))
+            os.makedirs(folder, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=".plugins-", dir=folder)
+            with os.fdopen(fd, 'w', encoding='utf-8') as out :
+                json.dump({'version' : INDEX_VERSION, 'files' : files}, out, indent=1)
+            os.replace(tmp, self.index)
+        except OSError :
+            pass
+
+    # ------------------------------------------------------------------------ #
+
+    def _scan(self, path, marker, cls, cached, files) :
+        '''
+        Method to get the metadata of a file, from the index when it's up to date.
+        '''
+        st = os.stat(path)
+        key = "%s:%s" % (path, cls or marker)
+        entry = cached.get(key)
+        if entry == None or entry['mtime'] != st.st_mtime or entry['size'] != st.st_size :
+            entry = {'mtime' : st.st_mtime, 'size' : st.st_size, \
+            'meta' : read_metadata(path, marker, cls)}
+        files[key] = entry
+        return entry['meta']
+
+    # ------------------------------------------------------------------------ #
+
+    def discover(self, refresh=False) :
+        '''
+        Method to discover the plugins of every kind.
+
+        Args:
+            refresh (bool) : When True, the index is ignored and every plugin \
+            file is parsed again.
+
+        Returns:
+            A dict of plugin dicts by name, by kind.
+        '''
+        with self.lock :
+            if self.plugins != None and not refresh :
+                return self.plugins
+
+            cached = {} if refresh else self._read_index()
+            files = {}
+            plugins = {}
+            root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+            for kind, (package, marker, group) in KINDS.items() :
+                found = {}
+                folder = os.path.join(root, package)
+                for fname in sorted(os.listdir(folder)) :
+                    if not fname.endswith(".py") or fname.startswith("_") :
+                        continue
+                    meta = self._scan(os.path.join(folder, fname), marker, None, cached, files)
+                    if meta != None :
+                        name = fname[:-3]
+                        found[name] = Plugin(kind, name, "%s.%s" % (package, name), meta)
+
+                for ep in importlib.metadata.entry_points(group=group) :
+                    if ep.name in found :
+                        continue
+                    module, _, cls = ep.value.partition(":")
+                    try :
+                        spec = importlib.util.find_spec(module)
+                    except ImportError :
+                        spec = None
+                    if spec == None or spec.origin == None or not spec.origin.endswith(".py") :
+                        continue
+                    meta = self._scan(spec.origin, marker, cls.strip() or None, cached, files)
+                    if meta != None :
+                        dist = ep.dist.name if ep.dist != None else "entry point"
+                        found[ep.name] = Plugin(kind, ep.name, module, meta, dist)
+
+                plugins[kind] = found
+
+            if files != cached :
+                self._write_index(files)
+            self.plugins = plugins
+            return plugins
+
+    # ------------------------------------------------------------------------ #
+
+    def list(self, kind) :
+        '''
+        Method to list the plugins of a kind.
+
+        Args:
+            kind (str) : Plugin kind (see KINDS).
+
+        Returns:
+            A list of Plugin sorted by name.
+        '''
+        plugins = self.discover()[kind]
+        return [plugins[name] for name in sorted(plugins)]
+
+    # ------------------------------------------------------------------------ #
+
+    def get(self, kind, name) :
+        '''
+        Method to get a plugin.
+
+        A name that wasn't discovered is imported as a module of the package
+        of its kind, as add_wr_device did before the registry (i.e. for
+        modules added while running).
+
+        Args:
+            kind (str) : Plugin kind (see KINDS).
+            name (str) : Plugin name.
+
+        Returns:
+            The Plugin.
+
+        Raises:
+            DeviceNotFound if there's no plugin with that name.
+        '''
+        plugins = self.discover()[kind]
+        if name in plugins :
+            return plugins[name]
+
+        package, marker, group = KINDS[kind]
+        try :
+            module = importlib.import_module("%s.%s" % (package, name))
+        except ImportError :
+            module = None
+        if module != None and hasattr(module, marker) :
+            meta = {'class' : getattr(module, marker), 'doc' : "", \
+            'interfaces' : list(getattr(module, "__interfaces__", ())), \
+            'channels' : getattr(module, "__channels__", None), \
+            'requires' : list(getattr(module, "__requires__", ()))}
+            with self.lock :
+                plugins[name] = Plugin(kind, name, module.__name__, meta)
+            return plugins[name]
+
+        raise DeviceNotFound("No %s plugin named %s (available: %s)." % \
+            (kind, name, ", ".join(sorted(plugins))))
+
+    # ------------------------------------------------------------------------ #
+
+    def load(self, kind, name) :
+        '''
+        Method to import a plugin and get its class.
+
+        Raises:
+            DeviceNotFound if there's no plugin with that name.
+            ImportError if the plugin module can't be imported.
+        '''
+        return self.get(kind, name).load()
+
+# ---------------------------------------------------------------------------- #
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def registry() :
+    '''
+    Function to get the registry shared by the package.
+    '''
+    global _registry
+    with _registry_lock :
+        if _registry == None :
+            _registry = Registry()
+        return _registry
+
+# ---------------------------------------------------------------------------- #
+
+def main(argv=None) :
+    parser = argparse.ArgumentParser(description="List the available plugins.")
+    parser.add_argument("--refresh", action="store_true", help="Ignore the discovery index.")
+    args = parser.parse_args(argv)
+
+    reg = registry()
+    reg.discover(args.refresh)
+    for kind in KINDS :
+        print("%s:" % kind)
+        for p in reg.list(kind) :
+            missing = p.available()
+            print("  %-20s %-20s %-10s %-2s %-25s %s" % (p.name, p.meta['class'], \
+            ",".join(p.meta['interfaces']) or "-", p.meta['channels'] or "-", \
+            "missing " + ",".join(missing) if len(missing) > 0 else p.source, p.meta['doc']))
+    return 0
+
+if __name__ == "__main__" :
+    sys.exit(main())
@@ -0,0 +1,316 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Tracing of calibration phases in Chrome trace-event format.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup main
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import os
+import json
+import time
+import threading
+import functools
+import cProfile
+import pstats
+
+# Import custom modules
+from main import metrics
+
+class Tracer() :
+    '''
+    Collector of timed spans and events.
+
+    Spans are stored as complete events ("X") and events as instant events
+    ("i") of the Chrome trace-event format, so the trace can be opened with
+    chrome://tracing or Perfetto. Spans of the same thread nest by time, so
+    device and instrument calls appear as children of the phase that made
+    them. Time is taken from time.perf_counter, the wall time spent, even
+    when a virtual or replayed clock is in use (see main.clock).
+
+    With profile enabled, the outermost span of each thread with category
+    "phase" is profiled with cProfile and its statistics are stored by
+    span name.
+    '''
+
+    def __init__(self, profile=False) :
+        '''
+        Constructor
+
+        Args:
+            profile (bool) : Enable cProfile capture per phase.
+        '''
+        self.profile = profile
+        self.events = []
+        self.profiles = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.t0 = time.perf_counter()
+        self.pid = os.getpid()
+
+    # ------------------------------------------------------------------------ #
+
+    def _ts(self) :
+        '''
+        Method to get the time since the tracer was created (in us).
+        '''
+        return (time.perf_counter() - self.t0) * 1e6
+
+    # ------------------------------------------------------------------------ #
+
+    def _add(self, event) :
+        event['pid'] = self.pid
+        event['tid'] = threading.get_ident()
+        with self.lock :
+            self.events.append(event)
+
+    # ------------------------------------------------------------------------ #
+
+    def span(self, name, cat="phase", **args) :
+        '''
+        Method to open a timed span.
+
+        Args:
+            name (str) : Name of the span.
+            cat (str) : Category (phase, step, device, instrument, io, wait...).
+            args : Values stored with the span.
+
+        Returns:
+            A context manager.
+        '''
+        return _Span(self, name, cat, args)
+
+    # ------------------------------------------------------------------------ #
+
+    def event(self, name, cat="dbg", **args) :
+        '''
+        Method to store an instant event.
+
+        Args:
+            name (str) : Name of the event (i.e. a debug message).
+            cat (str) : Category.
+            args : Values stored with the event.
+        '''
+        self._add({'name' : name, 'cat' : cat, 'ph' : 'i', 's' : 't', 'ts' : self._ts(), \
+        'args' : args})
+
+    # ------------------------------------------------------------------------ #
+
+    def summary(self) :
+        '''
+        Method to compute the time spent by span name.
+
+        Returns:
+            A dict by span name with the number of spans, total and self time
+            (total time minus the time of the nested spans) in s.
+        '''
+        spans = sorted([e for e in self.events if e['ph'] == 'X'], \
+        key=lambda e : (e['tid'], e['ts'], -e['dur']))
+        summary = {}
+        stack = []
+        for e in spans :
+            while len(stack) > 0 and (stack[-1]['tid'] != e['tid'] or \
+            e['ts'] >= stack[-1]['ts'] + stack[-1]['dur']) :
+                stack.pop()
+            if len(stack) > 0 :
+                summary[stack[-1]['name']]['self'] -= e['dur'] * 1e-6
+            s = summary.setdefault(e['name'], {'count' : 0, 'total' : 0.0, 'self' : 0.0})
+            s['count'] += 1
+            s['total'] += e['dur'] * 1e-6
+            s['self'] += e['dur'] * 1e-6
+            stack.append(e)
+
+        return summary
+
+    # ------------------------------------------------------------------------ #
+
+    def save(self, path) :
+        '''
+        Method to write the trace to a JSON file.
+
+        Profiles are written next to it, as <path>.<phase>.prof files that can
+        be read with pstats.
+
+        Args:
+            path (str) : Path to the trace file.
+        '''
+        with self.lock :
+            events = list(self.events)
+        with open(path, 'w', encoding='utf-8') as f :
+            json.dump({'traceEvents' : events, 'displayTimeUnit' : 'ms'}, f)
+
+        for name, prof in self.profiles.items() :
+            fname = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+            prof.dump_stats("%s.%s.prof" % (path, fname))
+
+# ---------------------------------------------------------------------------- #
+
+class _Span() :
+    '''
+    Context manager of a span.
+    '''
+
+    def __init__(self, tracer, name, cat, args) :
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.prof = None
+
+    def __enter__(self) :
+        local = self.tracer.local
+        if self.tracer.profile and self.cat == "phase" and not getattr(local, 'profiling', False) :
+            self.prof = cProfile.Profile()
+            local.profiling = True
+            try :
+                self.prof.enable()
+            except ValueError :
+                # Another profiler is active
+                self.prof = None
+                local.profiling = False
+        self.ts = self.tracer._ts()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) :
+        dur = self.tracer._ts() - self.ts
+        local = self.tracer.local
+        if self.prof != None :
+            self.prof.disable()
+            local.profiling = False
+            with self.tracer.lock :
+                if self.name in self.tracer.profiles :
+                    self.tracer.profiles[self.name].add(pstats.Stats(self.prof))
+                else :
+                    self.tracer.profiles[self.name] = pstats.Stats(self.prof)
+        if exc_type != None :
+            self.args['error'] = "%s: %s" % (exc_type.__name__, exc)
+        self.tracer._add({'name' : self.name, 'cat' : self.cat, 'ph' : 'X', 'ts' : self.ts, \
+        'dur' : dur, 'args' : self.args})
+        return False
+
+# ---------------------------------------------------------------------------- #
+
+class _Null_span() :
+    '''
+    Span used when tracing is disabled.
+    '''
+
+    def __enter__(self) :
+        return self
+
+    def __exit__(self, exc_type, exc, tb) :
+        return False
+
+_NULL_SPAN = _Null_span()
+
+# ---------------------------------------------------------------------------- #
+
+## Tracer in use, None when tracing is disabled
+_tracer = None
+
+def start(profile=False) :
+    '''
+    Function to start tracing.
+
+    Args:
+        profile (bool) : Enable cProfile capture per phase.
+
+    Returns:
+        The Tracer.
+    '''
+    global _tracer
+    _tracer = Tracer(profile)
+    return _tracer
+
+# ---------------------------------------------------------------------------- #
+
+def stop(path=None) :
+    '''
+    Function to stop tracing.
+
+    Args:
+        path (str) : If given, the trace is saved to this file.
+
+    Returns:
+        The Tracer, None if tracing was not started.
+    '''
+    global _tracer
+    tracer = _tracer
+    _tracer = None
+    if tracer != None and path != None :
+        tracer.save(path)
+    return tracer
+
+# ---------------------------------------------------------------------------- #
+
+def span(name, cat="phase", **args) :
+    '''
+    Function to open a span in the tracer in use (see Tracer.span).
+    '''
+    if _tracer == None :
+        return _NULL_SPAN
+    return _tracer.span(name, cat, **args)
+
+# ---------------------------------------------------------------------------- #
+
+def event(name, cat="dbg", **args) :
+    '''
+    Function to store an event in the tracer in use (see Tracer.event).
+    '''
+    if _tracer != None :
+        _tracer.event(name, cat, **args)
+
+# ---------------------------------------------------------------------------- #
+
+def traced(name, cat="phase") :
+    '''
+    Decorator to run a function (or method) inside a span.
+
+    The duration of the functions with category "phase", and whether they
+    failed, are published in main.metrics even when not tracing.
+
+    Args:
+        name (str) : Name of the span.
+        cat (str) : Category of the span.
+    '''
+    def decorator(func) :
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) :
+            if _tracer == None :
+                return func(*args, **kwargs)
+            with _tracer.span(name, cat) :
+                return func(*args, **kwargs)
+
+        @functools.wraps(func)
+        def phase_wrapper(*args, **kwargs) :
+            try :
+                with metrics.PHASE_SECONDS.time(name) :
+                    return wrapper(*args, **kwargs)
+            except BaseException :
+                metrics.PHASE_FAILURES.inc(name)
+                raise
+
+        return phase_wrapper if cat == "phase" else wrapper
+    return decorator
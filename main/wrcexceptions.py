@@ -49,3 +49,15 @@ class MeasuringError(Exception) :
 class MeasureError(Exception) :
     '''A wrong measured value'''
     pass
+
+class SwitchError(Exception) :
+    '''The fiber switch failed to change the route'''
+    pass
+
+class ReplayError(Exception) :
+    '''The replayed run differs from the recorded trace'''
+    pass
+
+class JobError(Exception) :
+    '''A batch job file is not valid'''
+    pass
@@ -28,11 +28,20 @@ Class that implements the interface Calibration_instrument for the Tektronix DPO
 #-------------------------------------------------------------------------------
 #                                   Import                                    --
 #-------------------------------------------------------------------------------
-# Import system modules
-import time
-
 # User modules
-import vxi11
+from measurement.calibration_instrument import *
+from analysis.online_stats              import *
+from analysis.sampling                  import *
+from analysis.bootstrap                 import interval
+from main.wrcexceptions                 import *
+from main                               import clock
+
+# This attribute permits dynamic loading inside wrcalibration class.
+__meas_instr__ = "DPO7354"
+# Plugin metadata, read by main.registry without importing this module.
+__interfaces__ = ("vxi11",)
+__channels__ = 4
+__requires__ = ("vxi11",)
 
 class DPO7354(Calibration_instrument) :
     '''
@@ -48,8 +57,17 @@ class DPO7354(Calibration_instrument) :
         Args:
             ip (str) :
         '''
+        # vxi11 is only needed when this backend is used
+        import vxi11
+
         self.instr = vxi11.Instrument(ip, name="DPO 7354")
         self.show_dbg = False
+        ## Statistical clipping of outliers (None, "sigma" or "mad")
+        self.clip = "mad"
+        self.stats = {}
+        self.samples = []
+        self.timestamps = []
+        self.accepted = []
 
     # ------------------------------------------------------------------------ #
 
@@ -67,117 +85,237 @@ class DPO7354(Calibration_instrument) :
 
     # ------------------------------------------------------------------------ #
 
-    def mean_time_interval(self, n_samples, t_samples, input1_trig, input2_trig) :
+    def _setup_channels(self, slave_chans) :
         '''
-        Abstract method to measure time interval between two input signals.
-
-        This will measure delay master to slave. For the best results use
-        the method.
-
-        Before using this method, master_chan and slave_chan must be set.
+        Method to reset the instrument and configure the master and slave
+        inputs and the trigger (on the master signal).
 
         Args:
-            n_samples (int) : Number of measures to be done.
-            t_samples (int) : Time between samples (should be greater than 1ms)
-            input1_trig (float) : Trigger level for the input 1
-            input2_trig (float) : Trigger level for the input 2
-
-        Returns:
-
+            slave_chans (list) : Input channels of the slave signals.
         '''
-
-        # Initial device configuration --------------------
+        chans = [self.master_chan] + list(slave_chans)
 
         if self.show_dbg :
             print("Setting the initial instrument configuration.")
 
         # Reset the device
         self.instr.write("*RST")
-        time.sleep(3) # Wait 3 seconds for command to complete
+        clock.sleep(3) # Wait 3 seconds for command to complete
 
         # Use Autoset to simplify the setting process, really needed?
         self.instr.write("AUTOSET EXECUTE") # EXECUTE is equivalent to press AUTOSET button
-        time.sleep(0.5)
-
-        # Display used channels
-        self.instr.write
-        self.instr.write("SELECT:%d ON" % self.master_chan)
-        time.sleep(0.5)
-        self.instr.write("SELECT:%d ON" % self.slave_chan)
-        time.sleep(0.5)
-
-        # Configure the channels
-        # Set coupling to AC
-        self.instr.write("CH%d:COUPLING DC" % self.master_chan)
-        time.sleep(0.5)
-        self.instr.write("CH%d:COUPLING DC" % self.slave_chan)
-        time.sleep(0.5)
-
-        # Set channel position
-        self.instr.write("CH%d:POSITION -2" % self.master_chan)
-        time.sleep(0.5)
-        self.instr.write("CH%d:POSITION -2" % self.slave_chan)
-        time.sleep(0.5)
-        # Set channel termination
-        self.instr.write("CH%d:TERMINATION 1E6" % self.master_chan)
-        time.sleep(0.5)
-        self.instr.write("CH%d:TERMINATION 1E6" % self.slave_chan)
-        time.sleep(0.5)
-        # Set channel scale
-        self.instr.write("CH%d:SCALE 600E-3" % self.master_chan)
-        time.sleep(0.5)
-        self.instr.write("CH%d:SCALE 600E-3" % self.slave_chan)
-        time.sleep(0.5)
-
-        # Set horizontal scale TODO:scale value variable
-        self.instr.write("CH%d:MODE:SCALE 20E-9" % self.master_chan)
-        time.sleep(0.5)
-        self.instr.write("CH%d:MODE:SCALE 20E-9" % self.slave_chan)
-        time.sleep(0.5)
+        clock.sleep(0.5)
+
+        # Display used channels and configure them: coupling, position,
+        # termination, vertical and horizontal scale
+        # TODO:scale value variable
+        for cmd in ("SELECT:%d ON", "CH%d:COUPLING DC", "CH%d:POSITION -2", \
+        "CH%d:TERMINATION 1E6", "CH%d:SCALE 600E-3", "CH%d:MODE:SCALE 20E-9") :
+            for chan in chans :
+                self.instr.write(cmd % chan)
+                clock.sleep(0.5)
 
         #TODO:Maybe set horizontal sample rate HORIZONTAL:MODE:SAMPLERATE
 
         # Configure the trigger
         self.instr.write("TRIGGER:A:EDGE:SOURCE CH%d" % self.master_chan)
-        time.sleep(0.5)
+        clock.sleep(0.5)
         # TODO: not a fix value for trigger level
         self.instr.write("TRIGGER:A:LEVEL:CH%d 0.4" % self.master_chan)
-        time.sleep(0.5)
+        clock.sleep(0.5)
+
+    # ------------------------------------------------------------------------ #
+
+    def _check_errors(self) :
+        '''
+        Method to check the error queue of the instrument.
+
+        Raises:
+            MeasuringError if the instrument reports an error.
+        '''
+        errors = self.instr.ask("SYST:ERR?")
+        if int(errors.split(",")[0]) != 0 :
+            raise MeasuringError("DPO7354 ERROR: Error in initial config: " + errors)
+        if self.show_dbg :
+            print("No errors in initial config")
+
+    # ------------------------------------------------------------------------ #
+
+    def mean_time_interval(self, n_samples, t_samples, sampler=None) :
+        '''
+        Abstract method to measure time interval between two input signals.
+
+        This will measure delay master to slave. For the best results use
+        the method.
+
+        Before using this method, master_chan and slave_chan must be set.
+
+        Args:
+            n_samples (int) : Number of measures to be done.
+            t_samples (int) : Time between samples (should be greater than 1ms)
+            sampler (Sampling_controller) : If given, it decides when to stop \
+            sampling instead of n_samples.
+
+        Returns:
+            The mean value of the accepted samples. The full statistics are
+            stored in stats.
+
+        Raises:
+            MeasuringError if the instrument reports an error in the configuration.
+        '''
+
+        # Initial device configuration --------------------
+
+        self._setup_channels([self.slave_chan])
 
         # Configure the instrument to measure time delay between PPS signals
         self.instr.write("MEASUREMENT:IMMED:SOURCE1 CH%d" % self.master_chan)
-        time.sleep(0.5)
+        clock.sleep(0.5)
         self.instr.write("MEASUREMENT:IMMED:SOURCE2 CH%d" % self.slave_chan)
-        time.sleep(0.5)
+        clock.sleep(0.5)
         self.instr.write("MEASUREMENT:IMMED:DELAY:DIRECTION FORWARDS")
-        time.sleep(0.5)
+        clock.sleep(0.5)
         self.instr.write("MEASUREMENT:IMMED:DELAY:EDGE1 RISE")
-        time.sleep(0.5)
+        clock.sleep(0.5)
         self.instr.write("MEASUREMENT:IMMED:DELAY:EDGE2 RISE")
-        time.sleep(0.5)
+        clock.sleep(0.5)
         self.instr.write("MEASUREMENT:IMMED:TYPE DELAY")
-        time.sleep(0.5)
+        clock.sleep(0.5)
 
         # Check for errors in the initial configuration
-        errors = self.drv.query("syst:err?")
-        if errors[0] != 1 :
-            # Throw an exception not a print!!
-            print("Error in initial config: " + errors)
+        self._check_errors()
 
         # Measurement -------------------------------------
 
-        mean = 0
+        stats = Online_stats(clip=self.clip)
 
-        for i in range(n_samples) :
+        if sampler == None :
+            sampler = Sampling_controller(max_samples=n_samples)
+        sampler.start()
+
+        self.samples = []
+        self.timestamps = []
+        self.accepted = []
+        while sampler.keep_going(stats) :
             cur = float(self.instr.ask("MEASUREMENT:IMMED:VALUE?"))
-            mean += cur
+            self.timestamps.append(clock.time())
+            self.samples.append(cur)
+            accepted = stats.add(cur)
+            self.accepted.append(accepted)
 
             if self.show_dbg :
-                print("%DPO7354 TINT: %g" % (cur))
-            time.sleep(t_samples)
-        mean /= n_samples
+                print("DPO7354 TINT: %g%s" % (cur, "" if accepted else " rejected"))
+            clock.sleep(t_samples)
+
+        # Warm-up samples rejected after the first outlier checks
+        for i in stats.revoked :
+            self.accepted[i] = False
+
+        self.stats = stats.summary()
+        self.stats.update(sampler.report(stats))
+        self.stats.update(interval(self.samples, self.accepted))
+
+        return self.stats['mean']
+
+    # ------------------------------------------------------------------------ #
+
+    def mean_time_intervals(self, slave_chans, n_samples, t_samples, sampler=None) :
+        '''
+        Method to measure the time interval from the master input to up to 3
+        slave inputs on the same edges.
 
-        print(mean)
-        print(type(mean))
+        A delay measurement (MEAS1, MEAS2, ...) is set for each slave input
+        and all of them are read from each single acquisition, so the
+        channels take the time of one measurement. The sampler decides with
+        the statistics of the channel with the largest standard error.
 
-        return mean
+        Args:
+            slave_chans (list) : Input channels of the slave signals.
+            n_samples (int) : Number of measures to be done.
+            t_samples (int) : Time between samples (should be greater than 1ms)
+            sampler (Sampling_controller) : If given, it decides when to stop \
+            sampling instead of n_samples.
+
+        Returns:
+            A list with the mean time interval master to each slave channel.
+            The result of each channel is stored in channel_results.
+
+        Raises:
+            ValueError if master_chan is not set or the channels are not valid.
+            MeasuringError if the instrument reports an error in the configuration.
+        '''
+        if self.master_chan == None :
+            raise ValueError("DPO7354 ERROR: Master input channel not set.")
+        if len(slave_chans) == 0 or len(slave_chans) >= __channels__ or \
+        self.master_chan in slave_chans :
+            raise ValueError("DPO7354 ERROR: From 1 to %d slave channels, other than the master one, " \
+            "are needed." % (__channels__ - 1))
+
+        self._setup_channels(slave_chans)
+
+        # A delay measurement from the master to each slave input
+        for n, chan in enumerate(slave_chans, 1) :
+            for cmd in ("SOURCE1 CH%d" % self.master_chan, "SOURCE2 CH%d" % chan, \
+            "DELAY:DIRECTION FORWARDS", "DELAY:EDGE1 RISE", "DELAY:EDGE2 RISE", "TYPE DELAY", "STATE ON") :
+                self.instr.write("MEASUREMENT:MEAS%d:%s" % (n, cmd))
+                clock.sleep(0.5)
+
+        # Single acquisitions, so every measurement is taken on the same edges
+        self.instr.write("ACQUIRE:STOPAFTER SEQUENCE")
+        clock.sleep(0.5)
+
+        # Check for errors in the initial configuration
+        self._check_errors()
+
+        # Measurement -------------------------------------
+
+        stats = [Online_stats(clip=self.clip) for chan in slave_chans]
+        samples = [[] for chan in slave_chans]
+        timestamps = []
+        accepted = [[] for chan in slave_chans]
+
+        def limiting() :
+            return max(stats, key=lambda s : s.stderr() if s.n > 1 else float("inf"))
+
+        if sampler == None :
+            sampler = Sampling_controller(max_samples=n_samples)
+        sampler.start()
+
+        while sampler.keep_going(limiting()) :
+            self.instr.write("ACQUIRE:STATE ON")
+            # Wait until the acquisition is complete
+            self.instr.ask("*OPC?")
+            timestamps.append(clock.time())
+            for n in range(len(slave_chans)) :
+                cur = float(self.instr.ask("MEASUREMENT:MEAS%d:VALUE?" % (n + 1)))
+                samples[n].append(cur)
+                accepted[n].append(stats[n].add(cur))
+
+                if self.show_dbg :
+                    print("DPO7354 TINT CH%d: %g%s" % (slave_chans[n], cur, \
+                    "" if accepted[n][-1] else " rejected"))
+            clock.sleep(t_samples)
+
+        report = sampler.report(limiting())
+        results = []
+        for n, chan in enumerate(slave_chans) :
+            for i in stats[n].revoked :
+                accepted[n][i] = False
+            self.stats = stats[n].summary()
+            self.stats.update(report)
+            self.stats.update(interval(samples[n], accepted[n]))
+            self.samples = samples[n]
+            self.timestamps = timestamps
+            self.accepted = accepted[n]
+            results.append(self._channel_result(chan, self.stats['mean']))
+
+        self._store_channels(results)
+        return [r['mean'] for r in results]
+
+    # ------------------------------------------------------------------------ #
+
+    def close(self) :
+        '''
+        Method to close the connection to the instrument.
+        '''
+        self.instr.close()
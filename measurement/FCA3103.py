@@ -27,15 +27,21 @@ Class that implements the interface Calibration_instrument for the Tektronix FCA
 #-------------------------------------------------------------------------------
 #                                   Import                                    --
 #-------------------------------------------------------------------------------
-# Import system modules
-import time
-
 # User modules
 from measurement.calibration_instrument import *
 from measurement.tektronix_fca3103_drv  import *
+from analysis.online_stats              import *
+from analysis.sampling                  import *
+from analysis.bootstrap                 import interval
+from main.wrcexceptions                 import *
+from main                               import clock
+from main                               import tracing
 
 # This attribute permits dynamic loading inside wrcalibration class.
 __meas_instr__ = "FCA3103"
+# Plugin metadata, read by main.registry without importing this module.
+__interfaces__ = ("usbtmc",)
+__channels__ = 2
 
 class FCA3103(Calibration_instrument) :
     '''
@@ -58,6 +64,10 @@ class FCA3103(Calibration_instrument) :
     skip_values = False
     ## Error value, used for skip a value (in ps)
     error = 500000
+    ## Statistical clipping of outliers (None, "sigma" or "mad")
+    clip = "mad"
+    ## Clipping threshold in (robust) standard deviations
+    clip_k = 5.0
 
     def __init__(self, port, master_chan=None, slave_chan=None) :
         '''
@@ -72,11 +82,33 @@ class FCA3103(Calibration_instrument) :
         self.master_chan = master_chan
         self.slave_chan = slave_chan
         self.trig_level = [None, ] *2 # This device has 2 input channels.
-        self.trig_level[0] = None
-        self.trig_level[1] = None
+        ## Statistics of the last call to mean_time_interval
+        self.stats = {}
+        ## Values read in the last call to mean_time_interval
+        self.samples = []
+        ## Time stamps (clock.time()) of the values in samples
+        self.timestamps = []
+        ## For each value in samples, False if it was rejected as outlier
+        self.accepted = []
 
     # ------------------------------------------------------------------------ #
 
+    def _check_errors(self) :
+        '''
+        Method to check the error queue of the instrument.
+
+        Raises:
+            MeasuringError if the instrument reports an error.
+        '''
+        errors = self.drv.query("syst:err?")
+        if int(errors.split(",")[0]) != 0 :
+            raise MeasuringError("FCA3103 ERROR: Error in initial config: " + errors)
+        if self.show_dbg :
+            print("No errors in initial config")
+
+    # ------------------------------------------------------------------------ #
+
+    @tracing.traced("FCA3103.trigger_level")
     def trigger_level(self, v_min=0, v_max=5) :
         '''
         Method to determine a good trigger level for a input channel.
@@ -93,6 +125,7 @@ class FCA3103(Calibration_instrument) :
         Raises:
             ValueError if master_chan or slave_chan are not set.
             NotADevicePort if input is a invalid input channel for this device.
+            MeasuringError if the instrument reports a configuration error.
         '''
         if self.master_chan == None :
             raise ValueError("FCA3103 ERROR: Master input channel not set.")
@@ -140,12 +173,7 @@ class FCA3103(Calibration_instrument) :
         self.drv.write("FORMAT ASCII;:FORMAT:TINF OFF")
 
         # Check for errors in the initial configuration
-        errors = self.drv.query("syst:err?")
-        if errors[0] != 0 :
-            #TODO: raise an exception
-            print("Error in initial config: " + errors)
-        elif show_dbg :
-            print("No errors in initial config")
+        self._check_errors()
 
         # Test the trigger levels to determine the best ---
         trig_levels = {}
@@ -154,16 +182,16 @@ class FCA3103(Calibration_instrument) :
             print("Testing trigger level values, it should take a long time ...")
 
         for i in v_array :
-            mean = 0
             # Set trigger level
             self.drv.write("INPUT%d:LEVEL %1.3f" % (self.master_chan,i))
             self.drv.write("INPUT%d:LEVEL %1.3f" % (self.slave_chan,i))
 
             # Test it
+            stats = Online_stats(clip=None)
             for j in range(self.n_samples) :
-                mean += float(self.drv.query("READ?"))
-                time.sleep(self.t_samples)
-            mean /= self.n_samples # Get the mean value
+                stats.add(float(self.drv.query("READ?")))
+                clock.sleep(self.t_samples)
+            mean = stats.mean # Get the mean value
 
             if self.show_dbg :
                 print("Trig level : %1.3f V, Mean time interval: %g" % (i, mean))
@@ -184,7 +212,8 @@ class FCA3103(Calibration_instrument) :
 
     # ------------------------------------------------------------------------ #
 
-    def mean_time_interval(self, n_samples, t_samples) :
+    @tracing.traced("FCA3103.mean_time_interval", "instrument")
+    def mean_time_interval(self, n_samples, t_samples, sampler=None) :
         '''
         Abstract method to measure time interval between two input signals.
 
@@ -193,14 +222,21 @@ class FCA3103(Calibration_instrument) :
         Args:
             n_samples (int) : Number of measures to be done.
             t_samples (int) : Time between samples (should be greater than 1ms)
-            input1_trig (float) : Trigger level for the input 1
-            input2_trig (float) : Trigger level for the input 2
+            sampler (Sampling_controller) : If given, it decides when to stop \
+            sampling instead of n_samples.
+
+        Outliers are rejected using the clipping mode in clip. A value farther
+        than error (ps) from the running median raises MeasureError, unless
+        skip_values is enabled. The mean is computed only with the accepted
+        values and the full statistics are stored in stats.
 
         Returns:
-            The mean value of the N samples.
+            The mean value of the accepted samples.
 
         Raises:
             ValueError if master_chan or slave_chan are not set or trigger level not set.
+            MeasureError if a value is far from the median and skip_values is disabled.
+            MeasuringError if the instrument reports a configuration error.
         '''
         if self.master_chan == None :
             raise ValueError("FCA3103 ERROR: Master input channel not set.")
@@ -215,7 +251,7 @@ class FCA3103(Calibration_instrument) :
 
         # Reset the device
         self.drv.write("*RST")
-        time.sleep(0.5)
+        clock.sleep(0.5)
 
         # Trigger mode not continuous
         self.drv.write("INIT:CONT OFF")
@@ -229,53 +265,80 @@ class FCA3103(Calibration_instrument) :
 
         # Set input coupling to AC
         self.drv.write("INPUT1:COUPling AC")
-        time.sleep(0.5)
+        clock.sleep(0.5)
         self.drv.write("INPUT2:COUPling AC")
-        time.sleep(0.5)
+        clock.sleep(0.5)
 
         # Set input impedance to 1MOhm
         self.drv.write("INPUT1:IMPedance MAX")
-        time.sleep(0.5)
+        clock.sleep(0.5)
         self.drv.write("INPUT2:IMPedance MAX")
-        time.sleep(0.5)
+        clock.sleep(0.5)
 
         # Set the trigger level to 450mV in both inputs
         self.drv.write("INPUT1:LEVEL:AUTO OFF")
-        time.sleep(0.5)
+        clock.sleep(0.5)
         self.drv.write("INPUT2:LEVEL:AUTO OFF")
-        time.sleep(0.5)
+        clock.sleep(0.5)
         self.drv.write("INPUT1:LEVEL %1.3f" % self.trig_level[0])
-        time.sleep(0.5)
+        clock.sleep(0.5)
         self.drv.write("INPUT2:LEVEL %1.3f" % self.trig_level[1])
-        time.sleep(0.5)
+        clock.sleep(0.5)
 
         # Measures format (ASCII with time stamping disabled)
         self.drv.write("FORMAT ASCII;:FORMAT:TINF OFF")
-        time.sleep(0.5)
+        clock.sleep(0.5)
 
         # Check for errors in the initial configuration
-        errors = self.drv.query("syst:err?")
-        if errors[0] != 0 :
-            # Throw an exception not a print!!
-            print("Error in initial config: " + errors)
+        self._check_errors()
 
         # Measurement -------------------------------------
 
-        mean = 0
+        # Error is given in ps and the instrument returns values in s
+        stats = Online_stats(clip=self.clip, k=self.clip_k, max_dev=self.error*1e-12)
 
-        for i in range(n_samples) :
+        if sampler == None :
+            sampler = Sampling_controller(max_samples=n_samples)
+        sampler.start()
+
+        self.samples = []
+        self.timestamps = []
+        self.accepted = []
+        while sampler.keep_going(stats) :
             # READ? command is equivalente to ABORT;INITIATE;FETCH?:
             cur = float(self.drv.query("READ?"))
-            if cur > mean + self.error :
-                if self.skip_values :
-                    continue
-                else :
-                    raise MeasureError("FCA3103 ERROR: current value far from mean value : %f (%f)" % (cur,mean))
-            mean += cur
-
-            if self.show_dbg :
+            self.timestamps.append(clock.time())
+            self.samples.append(cur)
+            median = stats.median()
+            if not self.skip_values and median != None and abs(cur - median) > self.error*1e-12 :
+                raise MeasureError("FCA3103 ERROR: current value far from median value : %g (%g)" \
+                % (cur,median))
+
+            self.accepted.append(stats.add(cur))
+            if not self.accepted[-1] :
+                if self.show_dbg :
+                    print("%s TINT: %g rejected" % (self.drv.device, cur))
+            elif self.show_dbg :
                 print("%s TINT: %g" % (self.drv.device, cur))
-            time.sleep(t_samples)
-        mean /= n_samples
+            clock.sleep(t_samples)
+
+        # Warm-up samples rejected after the first outlier checks
+        for i in stats.revoked :
+            self.accepted[i] = False
 
-        return mean
+        self.stats = stats.summary()
+        self.stats.update(sampler.report(stats))
+        self.stats.update(interval(self.samples, self.accepted))
+        if self.show_dbg :
+            print("%s TINT: mean %g, stddev %g, %d rejected" % \
+            (self.drv.device, self.stats['mean'], self.stats['stddev'], self.stats['rejected']))
+
+        return self.stats['mean']
+
+    # ------------------------------------------------------------------------ #
+
+    def close(self) :
+        '''
+        Method to close the connection to the instrument.
+        '''
+        self.drv.close()
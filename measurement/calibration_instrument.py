@@ -46,12 +46,26 @@ class Calibration_instrument() :
     '''
     __metaclass__ = abc.ABCMeta
 
+    # The state of an instrument must be created in the constructor, so each
+    # instance (i.e. one for each rig) has its own. Attributes used by the
+    # calibration procedure:
+
     ## The input channel for the slave signal
-    slave_chan  = ""
+    slave_chan  = None
     ## The input channel for the master signal
-    master_chan = ""
-    ## Trigger level array. Each position i stores the trigger level for the input i.
-    trigger_level = []
+    master_chan = None
+    ## Trigger level list (per instance). Each position i stores the trigger level for the input i.
+    trig_level = None
+    ## Statistics of the last time interval measurement (per instance, see Online_stats.summary)
+    stats = None
+    ## Raw values read in the last time interval measurement (per instance, see analysis.allan)
+    samples = None
+    ## Time stamps (clock.time()) of the values in samples (per instance, see analysis.drift)
+    timestamps = None
+    ## For each value in samples, False if it was rejected as outlier (per instance)
+    accepted = None
+    ## Results of the last multi-channel measurement, a dict for each slave channel (per instance)
+    channel_results = None
 
     # The following methods must be implemented by a concrete class for a WR device.
 
@@ -90,19 +104,26 @@ class Calibration_instrument() :
     # ------------------------------------------------------------------------ #
 
     @abc.abstractmethod
-    def mean_time_interval(self, n_samples, t_samples) :
+    def mean_time_interval(self, n_samples, t_samples, sampler=None) :
         '''
         Abstract method to measure time interval between two input signals.
 
         This method measures time interval between the PPS input from the master
         to the PPS input from the slave. It makes n_samples and calculates the
-        mean value.
+        mean value. Outliers should be rejected with an Online_stats object,
+        whose summary is stored in stats, and every value read must be stored
+        in samples, with its time stamp in timestamps and the clipping result
+        in accepted. When a Sampling_controller is given,
+        it replaces n_samples to decide when the acquisition is finished and
+        its report is added to stats. The bootstrap confidence interval of the
+        mean should be added too (see analysis.bootstrap.interval).
 
         Before using this method, master_chan and slave_chan must be set.
 
         Args:
             n_samples (int) : Number of measures to be done.
             t_samples (int) : Time between samples (should be greater than 1ms)
+            sampler (Sampling_controller) : Optional sequential sampling controller.
 
         Returns:
             The mean time interval master to slave.
@@ -112,3 +133,83 @@ class Calibration_instrument() :
             TriggerNotSet if trigger levels are not set.
             MeasuringError if a time interval value is higher than expected.
         '''
+
+    # ------------------------------------------------------------------------ #
+
+    def mean_time_intervals(self, slave_chans, n_samples, t_samples, sampler=None) :
+        '''
+        Method to measure the time interval from the master input to several
+        slave inputs.
+
+        The result of each channel is stored in channel_results, and stats,
+        samples, timestamps and accepted keep the ones of the first channel.
+
+        This implementation measures each channel in turn with
+        mean_time_interval. Instruments with more inputs should override it
+        to measure every slave input on the same edges of the master signal,
+        in the time of one acquisition.
+
+        Args:
+            slave_chans (list) : Input channels of the slave signals.
+            n_samples (int) : Number of measures to be done.
+            t_samples (int) : Time between samples (should be greater than 1ms)
+            sampler (Sampling_controller) : Optional sequential sampling \
+            controller, it must stop when every channel is done.
+
+        Returns:
+            A list with the mean time interval master to each slave channel.
+
+        Raises:
+            ValueError if master_chan is not set or slave_chans is empty.
+        '''
+        if self.master_chan == None :
+            raise ValueError("Master input channel not set.")
+        if len(slave_chans) == 0 :
+            raise ValueError("At least a slave input channel is needed.")
+
+        slave_chan = self.slave_chan
+        results = []
+        try :
+            for chan in slave_chans :
+                self.slave_chan = chan
+                mean = self.mean_time_interval(n_samples, t_samples, sampler)
+                results.append(self._channel_result(chan, mean))
+        finally :
+            self.slave_chan = slave_chan
+
+        self._store_channels(results)
+        return [r['mean'] for r in results]
+
+    # ------------------------------------------------------------------------ #
+
+    def _channel_result(self, chan, mean) :
+        '''
+        Method to copy the result of the last acquisition of a channel.
+
+        Returns:
+            A dict with keys: chan, mean, stats, samples, timestamps and accepted.
+        '''
+        return {'chan' : chan, 'mean' : mean, 'stats' : self.stats, 'samples' : list(self.samples), \
+        'timestamps' : list(self.timestamps), 'accepted' : list(self.accepted)}
+
+    # ------------------------------------------------------------------------ #
+
+    def _store_channels(self, results) :
+        '''
+        Method to store the results of a multi-channel measurement.
+
+        Args:
+            results (list) : A dict for each channel (see _channel_result).
+        '''
+        self.channel_results = results
+        self.stats = results[0]['stats']
+        self.samples = results[0]['samples']
+        self.timestamps = results[0]['timestamps']
+        self.accepted = results[0]['accepted']
+
+    # ------------------------------------------------------------------------ #
+
+    def close(self) :
+        '''
+        Method to release the instrument. By default it does nothing.
+        '''
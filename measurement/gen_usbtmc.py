@@ -77,3 +77,11 @@ class Gen_usbtmc() :
             length (int) : Number of bytes to be read
         '''
         return os.read(self.device, length)
+
+    def close(self) :
+        '''
+        Close the device files
+        '''
+        os.close(self.device)
+        if self.driver != None :
+            os.close(self.driver)
@@ -27,10 +27,10 @@ Driver for the Tektronix FCA 3103 Timer/Counter/Analyzer
 #-------------------------------------------------------------------------------
 #                                   Import                                    --
 #-------------------------------------------------------------------------------
-# Import system modules
-import time
-
 # User modules
+from main                   import clock
+from main                   import io_trace
+from main                   import tracing
 from measurement.gen_usbtmc import *
 
 class FCA3103_drv() :
@@ -46,7 +46,9 @@ class FCA3103_drv() :
             port (int) : Port index of usbtmc device (from 0 to 16)
             full_support (boolean) : Indicates if custom usbtmc driver is loaded
         '''
-        self.driver = Gen_usbtmc(port,full_support)
+        # The driver is recorded or replayed when an I/O trace session is in progress
+        self.driver = io_trace.transport("usbtmc%d" % port, \
+        lambda : Gen_usbtmc(port,full_support), ("write", "read", "listDevices", "close"))
 
         if full_support :
             devices = self.driver.listDevices()
@@ -74,6 +76,7 @@ class FCA3103_drv() :
 
     # ------------------------------------------------------------------------ #
 
+    @tracing.traced("FCA3103_drv.query", "instrument")
     def query(self, cmd, length=100) :
         '''
         Method to write a command and read the result.
@@ -86,7 +89,7 @@ class FCA3103_drv() :
             Command "cmd" response.
         '''
         self.driver.write(str.encode(cmd))
-        time.sleep(1)
+        clock.sleep(1)
         ret = self.driver.read(length)[:-1]
 
         return bytes.decode(ret)
@@ -105,6 +108,7 @@ class FCA3103_drv() :
 
     # ------------------------------------------------------------------------ #
 
+    @tracing.traced("FCA3103_drv.write", "instrument")
     def write(self, cmd, check=False) :
         '''
         Method for writing to input buffer of the instrument.
@@ -117,7 +121,15 @@ class FCA3103_drv() :
             If check=True it returns a tuple (error code,error message).
         '''
         self.driver.write(str.encode(cmd))
-        time.sleep(1)
+        clock.sleep(1)
 
         if check :
             return self.query("syst:err?")
+
+    # ------------------------------------------------------------------------ #
+
+    def close(self) :
+        '''
+        Method to close the usbtmc device.
+        '''
+        self.driver.close()
@@ -0,0 +1,109 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Simulated USBTMC interface of a Tektronix FCA3103.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup simulation
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+class Sim_FCA3103_usbtmc() :
+    '''
+    Simulated FCA3103, with the interface of measurement.gen_usbtmc.Gen_usbtmc.
+
+    It answers the SCPI commands used by FCA3103 with time intervals between
+    the PPS signals of the link of a Sim_world. READ? waits for the next PPS.
+    '''
+
+    ## Time of a SCPI command (in s)
+    CMD_TIME = 0.005
+
+    def __init__(self, world) :
+        '''
+        Constructor
+
+        Args:
+            world (Sim_world) : The simulated bench.
+        '''
+        self.world = world
+        self.levels = [0.0, 0.0]
+        self.output = b""
+
+    # ------------------------------------------------------------------------ #
+
+    def listDevices(self) :
+        '''
+        Method for listing detected devices, not supported.
+        '''
+        return None
+
+    # ------------------------------------------------------------------------ #
+
+    def write(self, cmd) :
+        '''
+        Method to send a command to the simulated instrument.
+
+        Args:
+            cmd (bytes) : The SCPI command(s).
+        '''
+        world = self.world
+        world.count("usbtmc", self.CMD_TIME)
+
+        for c in bytes.decode(cmd).split(";") :
+            c = c.strip().lstrip(":").upper()
+            if c == "*IDN?" :
+                self.output = b"TEKTRONIX,FCA3103,SIM0001,1.0"
+            elif c == "SYST:ERR?" :
+                self.output = b'0,"No error"'
+            elif c == "READ?" :
+                # A time interval is measured at the next PPS
+                now = world.clock.monotonic()
+                world.clock.sleep(int(now) + 1 - now)
+                self.output = str.encode("%.12e" % world.time_interval(self.levels))
+            elif c.startswith("INPUT") and ":LEVEL " in c :
+                chan = int(c[5]) - 1
+                self.levels[chan] = float(c.split(" ")[-1])
+
+    # ------------------------------------------------------------------------ #
+
+    def read(self, length=1) :
+        '''
+        Method to read the output of the last query.
+
+        Args:
+            length (int) : Maximum number of bytes.
+
+        Returns:
+            The output followed by a new line.
+        '''
+        self.world.count("usbtmc", self.CMD_TIME)
+        out = (self.output + b"\n")[:length]
+        self.output = b""
+        return out
+
+    # ------------------------------------------------------------------------ #
+
+    def close(self) :
+        '''
+        Method to close the simulated instrument, nothing to release.
+        '''
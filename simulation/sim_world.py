@@ -0,0 +1,342 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Simulated WR link: devices, fibers and PPS signals with known ground truth.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup simulation
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import math
+import random
+
+# User modules
+from main import clock
+
+class Sim_device() :
+    '''
+    Physical model of a WR device.
+
+    It has true fixed delays and bitslide (the ground truth) and the state
+    that the WR LEN command line changes: SFP database, loaded configuration,
+    mode and servo state.
+    '''
+
+    def __init__(self, name, tx, rx, bitslide, sfp_sn) :
+        '''
+        Constructor
+
+        Args:
+            name (str) : Name of the device.
+            tx (float) : True Tx fixed delay (in ps).
+            rx (float) : True Rx fixed delay (in ps).
+            bitslide (float) : Rx bitslide (in ps).
+            sfp_sn (str) : Serial number of the SFP plugged in.
+        '''
+        self.name = name
+        self.tx = tx
+        self.rx = rx
+        self.bitslide = bitslide
+        self.sfp_sn = sfp_sn
+        ## SFP database, (dtx, drx, beta) by (sfp_sn, port)
+        self.sfp_db = {}
+        ## Loaded configuration (dtx, drx, beta)
+        self.cfg = (0, 0, 0)
+        self.mode = "slave"
+        self.port = 1
+        ## Simulated time when servo reaches TRACK PHASE
+        self.lock_at = 0.0
+
+# ---------------------------------------------------------------------------- #
+
+class Sim_world() :
+    '''
+    Simulated calibration bench.
+
+    It holds a reference pair of WR devices (master and slave), devices under
+    calibration, a calibrated WR calibrator, the fibers (f1, f2) and the
+    fiber switch route. The clock is a virtual clock, so sleeps and servo
+    lock times don't block.
+
+    The model follows the conventions of WR_calibration: the slave estimates
+    the master to slave delay with its configured delays and asymmetry, and
+    the instrument reads the error of that estimate (plus trigger walk and
+    noise). A port is calibrated when its configured delays equal the true
+    ones.
+
+    Used as session of main.io_trace (see start), the WR LEN serial buses
+    (ttyUSB<n>) and the FCA3103 USBTMC (usbtmc<n>) are simulated, so the real
+    drivers and procedures run on it. Every transaction is counted.
+    '''
+
+    def __init__(self, seed=1, rt1=10000.0, rt2=25000000.0, alpha=2.6e-4, rtt_noise=8.0, \
+    skew_noise=4.0, lock_time=20.0, io_latency=0.1, v_trigger=1.3, settle_time=0.0, \
+    settle_error=500.0) :
+        '''
+        Constructor
+
+        Args:
+            seed (int) : Seed of the noise, runs with the same seed are identical.
+            rt1 (float) : Round-trip delay of fiber f1 (in ps).
+            rt2 (float) : Round-trip delay of fiber f2 (in ps).
+            alpha (float) : Fiber asymmetry for the blue wavelength.
+            rtt_noise (float) : Standard deviation of round-trip time values (in ps).
+            skew_noise (float) : Standard deviation of the PPS skew (in ps).
+            lock_time (float) : Time to reach TRACK PHASE after a change (in s).
+            io_latency (float) : Time of a serial transaction (in s).
+            v_trigger (float) : Best trigger level of the PPS signals (in V).
+            settle_time (float) : Time the servo keeps moving after reaching \
+            TRACK PHASE (in s). The error decays exponentially, it's 1%% of \
+            settle_error at the end.
+            settle_error (float) : Error of the servo when it reaches TRACK \
+            PHASE (in ps), it biases the setpoint, mu and the skew.
+        '''
+        self.random = random.Random(seed)
+        self.rt = {'f1' : rt1, 'f2' : rt2, 'f1+f2' : rt1 + rt2}
+        self.alpha = alpha
+        self.rtt_noise = rtt_noise
+        self.skew_noise = skew_noise
+        self.lock_time = lock_time
+        self.io_latency = io_latency
+        self.v_trigger = v_trigger
+        self.settle_time = settle_time
+        self.settle_error = settle_error
+        ## Trigger walk (in s per V away from the best trigger level)
+        self.trigger_walk = 2e-10
+
+        self.clock = clock.Virtual_clock(1.7e9)
+        self.devices = {}
+        self.master = None
+        self.slave = None
+        self.calibrator = None
+        self.dut = None
+        self.route = {'fiber' : "f1", 'port' : 1, 'pps' : False, 'calibrator' : False}
+        self.transactions = {}
+
+    # ------------------------------------------------------------------------ #
+
+    def add_device(self, tty, device, role) :
+        '''
+        Method to connect a simulated device to a serial port.
+
+        Args:
+            tty (int) : Index of /dev/ttyUSB<tty>.
+            device (Sim_device) : The device.
+            role (str) : "master" or "slave" of the reference pair, or "dut".
+        '''
+        self.devices[tty] = device
+        setattr(self, role, device)
+
+    # ------------------------------------------------------------------------ #
+
+    def set_calibrator(self, device) :
+        '''
+        Method to set the WR calibrator, its configuration is the true one.
+
+        Args:
+            device (Sim_device) : The calibrator.
+        '''
+        device.cfg = (device.tx, device.rx, 0)
+        device.mode = "master"
+        self.calibrator = device
+
+    # ------------------------------------------------------------------------ #
+
+    def on_route(self, route) :
+        '''
+        Method to use as on_change callback of a Sim_switch.
+        '''
+        self.route = route
+        for dev in self.devices.values() :
+            self.relock(dev)
+
+    # ------------------------------------------------------------------------ #
+
+    def relock(self, dev) :
+        '''
+        Method to restart the servo of a device.
+        '''
+        dev.lock_at = self.clock.monotonic() + self.lock_time
+
+    # ------------------------------------------------------------------------ #
+
+    def count(self, kind, duration=0) :
+        '''
+        Method to count a transaction and advance the clock its duration.
+
+        Args:
+            kind (str) : Kind of transaction (i.e. "serial" or "usbtmc").
+            duration (float) : Duration of the transaction (in s).
+        '''
+        self.transactions[kind] = self.transactions.get(kind, 0) + 1
+        self.clock.sleep(duration)
+
+    # ------------------------------------------------------------------------ #
+
+    def link(self) :
+        '''
+        Method to get the devices linked by the switch.
+
+        Returns:
+            A (master, slave) tuple.
+        '''
+        if self.route['calibrator'] :
+            return (self.calibrator, self.dut)
+        return (self.master, self.slave)
+
+    # ------------------------------------------------------------------------ #
+
+    def asymmetry(self, dev) :
+        '''
+        Method to get the true fiber asymmetry seen by a slave.
+        '''
+        if dev.sfp_sn == "AXGE-3454-0531" :
+            # Violet SFP, wavelengths are swapped
+            return -self.alpha / (1 + self.alpha)
+        return self.alpha
+
+    # ------------------------------------------------------------------------ #
+
+    def servo_error(self, dev) :
+        '''
+        Method to compute the error of the servo of a slave that is settling (in ps).
+        '''
+        elapsed = self.clock.monotonic() - dev.lock_at
+        if self.settle_time <= 0 :
+            return 0.0
+        if elapsed < 0 :
+            return self.settle_error
+        return self.settle_error * math.exp(-elapsed * math.log(100) / self.settle_time)
+
+    # ------------------------------------------------------------------------ #
+
+    def rtt(self, dev) :
+        '''
+        Method to compute the round-trip time reported by a slave.
+        '''
+        master, slave = self.link()
+        if dev is not slave :
+            return 0
+        mu = master.tx + master.rx + slave.tx + slave.rx + master.bitslide + slave.bitslide \
+        + self.rt[self.route['fiber']] + self.servo_error(dev)
+        return int(round(mu + self.random.gauss(0, self.rtt_noise)))
+
+    # ------------------------------------------------------------------------ #
+
+    def skew(self) :
+        '''
+        Method to compute the true mean PPS skew of the linked slave (in ps).
+        '''
+        master, slave = self.link()
+        # Error of the configured fixed delays
+        e_stx = slave.tx - slave.cfg[0]
+        e_srx = slave.rx - slave.cfg[1]
+        e_mtx = master.tx - master.cfg[0]
+        e_mrx = master.rx - master.cfg[1]
+        hw = ((e_srx - e_stx) + (e_mtx - e_mrx)) / 2
+
+        # Error of the fiber asymmetry estimate
+        ratio = slave.cfg[2] / 2**40 + 0.5
+        alpha_cfg = (2*ratio - 1) / (1 - ratio)
+        rt = self.rt[self.route['fiber']]
+        fiber = lambda a : rt * a / (2 * (2 + a))
+
+        return hw - fiber(self.asymmetry(slave)) + fiber(alpha_cfg) + self.servo_error(slave)
+
+    # ------------------------------------------------------------------------ #
+
+    def time_interval(self, levels) :
+        '''
+        Method to read a time interval between the PPS signals (in s).
+
+        Args:
+            levels (tuple) : Trigger levels of both inputs (in V).
+        '''
+        skew = self.skew() * 1e-12
+        if max(levels) > 2 * self.v_trigger or min(levels) <= 0 :
+            # No trigger
+            return 9.91e37
+        walk = self.trigger_walk * sum(abs(l - self.v_trigger) for l in levels) / 2
+        walk = walk if skew >= 0 else -walk
+        return skew + walk + self.random.gauss(0, self.skew_noise) * 1e-12
+
+    # ------------------------------------------------------------------------ #
+
+    def status(self, dev) :
+        '''
+        Method to build the output of the WR LEN "stat" command.
+        '''
+        master, slave = self.link()
+        locked = dev.mode == "slave" and dev is slave and self.clock.monotonic() >= dev.lock_at
+        ss = "TRACK_PHASE" if locked else ("IDLE" if dev.mode == "master" else "SYNC_PHASE")
+        m = master if dev is slave else dev
+        return ("lnk:1 rx:1 tx:1 lock:%d sv:1 ss:'%s' aux:0 sec:%d nsec:0 mu:%d dms:0 " \
+        "dtxm:%d drxm:%d dtxs:%d drxs:%d asym:0 crtt:0 cko:0 setp:%d hd:0 md:0 ad:0 temp:45.0") % \
+        (1 if locked else 0, ss, int(self.clock.time()), self.rtt(dev), m.cfg[0], \
+        m.cfg[1] + m.bitslide, dev.cfg[0], dev.cfg[1] + dev.bitslide, \
+        int(round(self.servo_error(dev))) if dev is slave else 0)
+
+    # ------------------------------------------------------------------------ #
+
+    def channel(self, name, factory, methods) :
+        '''
+        Method to open a simulated transport (see main.io_trace.transport).
+
+        Raises:
+            ValueError if there's nothing simulated for name.
+        '''
+        from simulation.sim_wr_len import Sim_WR_LEN_bus
+        from simulation.sim_fca3103 import Sim_FCA3103_usbtmc
+
+        if name.startswith("ttyUSB") :
+            return Sim_WR_LEN_bus(self, self.devices[int(name[6:].split("#")[0])])
+        if name.startswith("usbtmc") :
+            return Sim_FCA3103_usbtmc(self)
+        raise ValueError("Sim_world ERROR: Transport %s is not simulated." % name)
+
+    # ------------------------------------------------------------------------ #
+
+    def close(self) :
+        '''
+        Method called when the simulation session ends.
+        '''
+        pass
+
+    # ------------------------------------------------------------------------ #
+
+    def truth(self) :
+        '''
+        Method to get the values that a perfect calibration would find.
+
+        Returns:
+            A dict with delta1, delta2, alpha_n (for a blue SFP in the slave),
+            v_trigger and the DUT dtxs and drxs.
+        '''
+        alpha_n = 2**40 * ((1 + self.alpha) / (2 + self.alpha) - 0.5)
+        truth = {'delta1' : self.rt['f1'], 'delta2' : self.rt['f2'], 'alpha_n' : alpha_n, \
+        'v_trigger' : self.v_trigger}
+        if self.dut != None :
+            truth['dtxs'] = self.dut.tx
+            truth['drxs'] = self.dut.rx
+        return truth
@@ -0,0 +1,122 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Simulated serial bus of a WR LEN.
+
+@file
+@date Created on Oct 18, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup simulation
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+class Sim_WR_LEN_bus() :
+    '''
+    Simulated WR LEN command line, with the interface of drivers.serial.serial_drvr.
+
+    It implements the commands used by WR_LEN on a Sim_device of a Sim_world.
+    '''
+
+    ## Time per character written (interchartimeout of WR_LEN)
+    CHAR_TIME = 0.01
+
+    def __init__(self, world, dev) :
+        '''
+        Constructor
+
+        Args:
+            world (Sim_world) : The simulated bench.
+            dev (Sim_device) : The device behind the serial port.
+        '''
+        self.world = world
+        self.dev = dev
+
+    # ------------------------------------------------------------------------ #
+
+    def cmd_w(self, cmd, output=True) :
+        '''
+        Method to run a command in the simulated device.
+
+        Args:
+            cmd (str) : A WR LEN command.
+            output (bool) : When True, the command output is returned.
+
+        Returns:
+            The command output.
+        '''
+        world = self.world
+        dev = self.dev
+        world.count("serial", world.io_latency + self.CHAR_TIME * (len(cmd) + 1))
+
+        args = cmd.split()
+        ret = ""
+        if cmd == "stat" :
+            ret = world.status(dev)
+        elif cmd.startswith("sfp add") :
+            # sfp add <sn> wr<port-1> <dtx> <drx> <beta>
+            dev.sfp_db[(args[2], int(args[3][2:]) + 1)] = (int(args[4]), int(args[5]), int(args[6]))
+        elif cmd == "sfp erase" :
+            dev.sfp_db = {}
+        elif cmd == "sfp match" :
+            key = (dev.sfp_sn, dev.port)
+            if key in dev.sfp_db :
+                dev.cfg = dev.sfp_db[key]
+                ret = "Port wr%d, SFP %s matched" % (dev.port - 1, dev.sfp_sn)
+            else :
+                dev.cfg = (0, 0, 0)
+                ret = "Could not match to DB"
+        elif cmd == "sfp show" :
+            ret = "\n".join("%s wr%d %d %d %d" % ((k[0], k[1] - 1) + v) for k, v in dev.sfp_db.items())
+        elif cmd.startswith("mode slave_port") :
+            dev.mode = "slave"
+            dev.port = int(cmd[-1])
+            world.relock(dev)
+        elif cmd == "mode master" :
+            dev.mode = "master"
+        elif cmd in ("ptp start", "ptp stop") :
+            world.relock(dev)
+
+        return ret if output else ""
+
+    # ------------------------------------------------------------------------ #
+
+    def devread(self, bar, offset, width) :
+        '''
+        Method that interfaces with wb read, registers read as 0.
+        '''
+        self.world.count("serial", self.world.io_latency)
+        return 0
+
+    # ------------------------------------------------------------------------ #
+
+    def devwrite(self, bar, offset, width, datum, check=False) :
+        '''
+        Method that interfaces with wb write, writes are ignored.
+        '''
+        self.world.count("serial", self.world.io_latency)
+        return len("wb write 0x%X 0x%X\r" % (offset, datum))
+
+    # ------------------------------------------------------------------------ #
+
+    def close(self) :
+        '''
+        Method to close the simulated port.
+        '''
+        pass
@@ -142,6 +142,19 @@ class WR_Device() :
         Abstract method to retrieve status info from device.
         '''
 
+    def get_status(self) :
+        '''
+        Method to get the status of the device as a record.
+
+        Devices that don't implement it return None, and only the servo state
+        (in_trackphase) is used to know when the link is ready.
+
+        Returns:
+            A dict with the fields of the status by name (i.e. ss for the \
+            servo state, setp, cko, mu, crtt and asym, in ps) or None.
+        '''
+        return None
+
     @abc.abstractmethod
     def in_trackphase(self) :
         '''
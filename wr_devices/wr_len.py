@@ -29,16 +29,20 @@ Main program for running a WR device's calibration
 #-------------------------------------------------------------------------------
 
 # System modules
-import time
 import re
 
 # User modules
-from drivers.serial           import *
+from main                     import clock
+from main                     import io_trace
+from main                     import tracing
 from wr_devices.wr_device     import *
 from main.wrcexceptions       import *
 
 # This attribute permits dynamic loading inside wrcalibration class.
 __wrdevice__ = "WR_LEN"
+# Plugin metadata, read by main.registry without importing this module.
+__interfaces__ = ("usb",)
+__requires__ = ("serial",)
 
 class WR_LEN(WR_Device) :
     '''
@@ -66,8 +70,16 @@ class WR_LEN(WR_Device) :
 
         #TODO: Utilizar excepciones aquí
         #try :
-        self.bus = serial_drvr(rdtimeout=0.1, wrtimeout=0.1, interchartimeout=0.01)
-        self.bus.open(self.port)
+        def open_bus() :
+            # pyserial is only needed when a real device is opened
+            from drivers.serial import serial_drvr
+            bus = serial_drvr(rdtimeout=0.1, wrtimeout=0.1, interchartimeout=0.01)
+            bus.open(self.port)
+            return bus
+
+        # The bus is recorded or replayed when an I/O trace session is in progress
+        self.bus = io_trace.transport("ttyUSB%d" % port, open_bus, \
+        ("cmd_w", "devread", "devwrite", "close"))
 
         self.show_dbg = False
 
@@ -83,6 +95,7 @@ class WR_LEN(WR_Device) :
 
     # ------------------------------------------------------------------------ #
 
+    @tracing.traced("WR_LEN.write_sfp_config", "device")
     def write_sfp_config(self, sfp_sn, port, delta_tx = 0, delta_rx = 0, beta = 0) :
         '''
         Method to write the calibration configuration for a SFP
@@ -109,6 +122,7 @@ class WR_LEN(WR_Device) :
 
     # ------------------------------------------------------------------------ #
 
+    @tracing.traced("WR_LEN.erase_sfp_config", "device")
     def erase_sfp_config(self) :
         '''
         Method to erase the SFP config DB.
@@ -124,6 +138,7 @@ class WR_LEN(WR_Device) :
 
     # ------------------------------------------------------------------------ #
 
+    @tracing.traced("WR_LEN.load_sfp_config", "device")
     def load_sfp_config(self) :
         '''
         Method for matching the stored SFP config with the current parameters.
@@ -152,7 +167,7 @@ class WR_LEN(WR_Device) :
             if self.show_dbg :
                 print("%s << %s >> %s" % (self.name,cmd,ret))
 
-            time.sleep(self.DEF_TIMEOUT) # Give enough time to WR LEN for processing it!!
+            clock.sleep(self.DEF_TIMEOUT) # Give enough time to WR LEN for processing it!!
 
         count = sum(1 for _ in re.finditer(r'\b%s\b' % re.escape("matched"), ret))
 
@@ -167,7 +182,7 @@ class WR_LEN(WR_Device) :
         This is equivalent to "init erase"
         '''
         self.bus.cmd_w("init erase",False)
-        time.sleep(self.DEF_TIMEOUT)
+        clock.sleep(self.DEF_TIMEOUT)
 
         if self.show_dbg :
             print("%s << %s" % (self.name,"init erase"))
@@ -190,7 +205,7 @@ class WR_LEN(WR_Device) :
             if self.show_dbg :
                 print("%s << %s" % (self.name,cmd))
 
-            time.sleep(self.DEF_TIMEOUT) # Give enough time to WR LEN for processing it!!
+            clock.sleep(self.DEF_TIMEOUT) # Give enough time to WR LEN for processing it!!
 
     # ------------------------------------------------------------------------ #
 
@@ -241,6 +256,36 @@ class WR_LEN(WR_Device) :
 
     # ------------------------------------------------------------------------ #
 
+    @tracing.traced("WR_LEN.get_status", "device")
+    def get_status(self) :
+        '''
+        Method to get the status of the device as a record.
+
+        Each "name:value" field of the "stat" output is converted to int or
+        float when possible, quotes are removed from the rest.
+
+        Returns:
+            A dict with the fields of the status by name (i.e. ss for the servo
+            state, setp, cko, mu, crtt, asym and the PHY delays).
+        '''
+        status = {}
+        for i in self.raw_status().split(" ") :
+            if ":" not in i :
+                continue
+            name, value = i.split(":", 1)
+            try :
+                status[name] = int(value)
+            except ValueError :
+                try :
+                    status[name] = float(value)
+                except ValueError :
+                    status[name] = value.strip("'")
+
+        return status
+
+    # ------------------------------------------------------------------------ #
+
+    @tracing.traced("WR_LEN.in_trackphase", "device")
     def in_trackphase(self) :
         '''
         Method to ask a device if servo state is TRACK PHASE.
@@ -262,6 +307,7 @@ class WR_LEN(WR_Device) :
 
     # ------------------------------------------------------------------------ #
 
+    @tracing.traced("WR_LEN.get_rtt", "device")
     def get_rtt(self) :
         '''
         Method to ask the device for Round-trip time value (in ps).
@@ -279,6 +325,7 @@ class WR_LEN(WR_Device) :
 
     # ------------------------------------------------------------------------ #
 
+    @tracing.traced("WR_LEN.get_phy_delays", "device")
     def get_phy_delays(self) :
         '''
         Method to ask the device for PHY delays.
@@ -308,6 +355,7 @@ class WR_LEN(WR_Device) :
 
     # ------------------------------------------------------------------------ #
 
+    @tracing.traced("WR_LEN.set_slaveport", "device")
     def set_slaveport(self, port) :
         '''
         Method to set "port" to slave mode.
@@ -318,9 +366,9 @@ class WR_LEN(WR_Device) :
         if port < 1 and port > 2 :
             raise NotValidPort("WR LEN haven't got %d ports." % port)
         self.bus.cmd_w("mode slave_port%d" % port)
-        time.sleep(self.DEF_TIMEOUT)
+        clock.sleep(self.DEF_TIMEOUT)
         self.bus.cmd_w("ptp start")
-        time.sleep(self.DEF_TIMEOUT)
+        clock.sleep(self.DEF_TIMEOUT)
 
         if self.show_dbg :
             print("%s << %s" % (self.name,"mode slave_port%d"%port))
@@ -328,14 +376,15 @@ class WR_LEN(WR_Device) :
 
     # ------------------------------------------------------------------------ #
 
+    @tracing.traced("WR_LEN.set_master", "device")
     def set_master(self) :
         '''
         Abstract method to set device to master mode.
         '''
         self.bus.cmd_w("mode master")
-        time.sleep(self.DEF_TIMEOUT*2) # Looking PLL takes some time
+        clock.sleep(self.DEF_TIMEOUT*2) # Looking PLL takes some time
         self.bus.cmd_w("ptp start")
-        time.sleep(self.DEF_TIMEOUT)
+        clock.sleep(self.DEF_TIMEOUT)
 
         if self.show_dbg :
             print("%s << %s" % (self.name,"mode master"))